@@ -0,0 +1,54 @@
+#!/usr/bin/python3
+
+"""
+Time bucketing of a day of per-second events through bucket_table, against
+the same aggregation as a textquery SQL query (load into SQLite, GROUP BY
+strftime).
+
+Run from the py directory:  python -m bench.benchmarks.timebucket [-n COUNT]
+"""
+
+import argparse
+import random
+import sys
+import time
+
+from bench.data import DataTable, MdWriter
+from bench.textquery import InMemoryDb
+from bench.timebucket import bucket_table
+
+def main(args):
+    parser = argparse.ArgumentParser(description="Benchmark bucket_table against SQLite.")
+    parser.add_argument("-n", "--count", type=int, default=86400, help="Events, one per second (default: 86400)")
+    args = parser.parse_args(args)
+
+    rng = random.Random(0)
+    table = DataTable(['ts', 'host', 'bytes'])
+    start = 1717200000
+    for i in range(args.count):
+        table.append([start + i, rng.choice('abcd'), rng.randint(0, 1000)])
+
+    sql = ("select strftime('%Y-%m-%d %H:%M:00', ts - ts % 300, 'unixepoch') as bucket, host, "
+           "count(*) as count, sum(bytes) as \"sum(bytes)\" from t group by 1, 2 order by 1, 2")
+
+    def sqlite():
+        db = InMemoryDb({'t': table})
+        result = db.query(sql)
+        db.close()
+        return result
+
+    def native():
+        return bucket_table(table, 'ts', '5m', ['count', 'sum:bytes'], by=['host'])
+
+    writer = MdWriter(sys.stdout, ['engine', 'ms', 'rows/s'])
+    results = []
+    for name, run in [('sqlite', sqlite), ('bucket_table', native)]:
+        begin = time.perf_counter()
+        results.append(run())
+        elapsed = time.perf_counter() - begin
+        writer.write([name, round(elapsed * 1000, 1), int(args.count / elapsed)])
+    writer.close()
+    assert results[0].data() == results[1].data()
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,68 @@
+#!/usr/bin/python3
+
+"""
+Throughput of TimeParser on each input shape, against plain strptime trying
+the formats in order (how inputs were parsed before the fast path).
+
+Run from the py directory:  python -m bench.benchmarks.timeparser [-n COUNT]
+"""
+
+import argparse
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, List
+
+import pytz
+
+from bench.data import MdWriter
+from bench.timestamp import TimeParser
+
+SAMPLES = {
+    'date time': '2025-05-26 02:10:{:02d}',
+    'date time.micros': '2025-05-26 02:10:{:02d}.123456',
+    'iso': '2025-05-26T02:10:{:02d}',
+    'iso.micros': '2025-05-26T02:10:{:02d}.123',
+    'iso offset': '2025-05-26T02:10:{:02d}+05:30',
+    'date': '2025-05-{:02d}',
+    'epoch seconds': '17482506{:02d}',
+    'epoch ms': '17482506510{:02d}',
+}
+
+def strptime_parse(value: str) -> datetime:
+    """Reference: TimeParser.parse as it was, trying every format in order"""
+    try:
+        epoch = float(value)
+        if epoch >= TimeParser.MIN_VALID_EPOCH:
+            return datetime.fromtimestamp(epoch / TimeParser._epoch_divisor(epoch), tz=timezone.utc)
+    except ValueError:
+        pass
+    for fmt in TimeParser.DATETIME_INPUT_FORMATS + TimeParser.PARTIAL_DATE_FORMATS:
+        try:
+            dt = datetime.strptime(value, fmt)
+            return pytz.utc.localize(dt) if dt.tzinfo is None else dt
+        except ValueError:
+            continue
+    raise ValueError(value)
+
+def rate(parse: Callable[[str], datetime], values: List[str]) -> float:
+    start = time.perf_counter()
+    for value in values:
+        parse(value)
+    return len(values) / (time.perf_counter() - start)
+
+def main(args):
+    parser = argparse.ArgumentParser(description="Benchmark TimeParser against plain strptime.")
+    parser.add_argument("-n", "--count", type=int, default=50000, help="Values per input shape (default: 50000)")
+    args = parser.parse_args(args)
+
+    writer = MdWriter(sys.stdout, ['shape', 'strptime/s', 'TimeParser/s', 'speedup'])
+    for shape, pattern in SAMPLES.items():
+        values = [pattern.format(i % 28 + 1) for i in range(args.count)]
+        assert all(strptime_parse(v) == TimeParser.parse(v) for v in values[:28]), shape
+        slow, fast = rate(strptime_parse, values), rate(TimeParser.parse, values)
+        writer.write([shape, int(slow), int(fast), f'{fast / slow:.1f}x'])
+    writer.close()
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
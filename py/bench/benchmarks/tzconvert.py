@@ -0,0 +1,58 @@
+#!/usr/bin/python3
+
+"""
+Throughput of zone conversions through precomputed ZoneTables, against the
+pytz path TimeOutput takes (astimezone / localize per value).
+
+Run from the py directory:  python -m bench.benchmarks.tzconvert [-n COUNT]
+"""
+
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, List
+
+import pytz
+
+from bench.data import MdWriter
+from bench.timestamp import TimeOutput, TimeParser
+from bench.tztable import zone_table
+
+def rate(convert: Callable, values: List) -> float:
+    start = time.perf_counter()
+    for value in values:
+        convert(value)
+    return len(values) / (time.perf_counter() - start)
+
+def main(args):
+    parser = argparse.ArgumentParser(description="Benchmark ZoneTable against pytz conversions.")
+    parser.add_argument("-n", "--count", type=int, default=50000, help="Values per benchmark (default: 50000)")
+    args = parser.parse_args(args)
+
+    rng = random.Random(0)
+    # Instants and wall-clock times over 2000-2030, across many DST changes
+    instants = [datetime.fromtimestamp(rng.uniform(946684800, 1893456000), tz=timezone.utc)
+                for _ in range(args.count)]
+    locals_ = [dt.replace(tzinfo=None) for dt in instants]
+
+    writer = MdWriter(sys.stdout, ['zone', 'operation', 'pytz/s', 'table/s', 'speedup'])
+    for label in ['IST', 'PST']:
+        name = TimeParser.LABEL_TO_PYTZ[label]
+        tz, table = pytz.timezone(name), zone_table(name)
+        tz_map = {label: name}
+        cases = [
+            ('format iso', instants,
+             lambda dt: TimeOutput(dt, tz_map).format(label, 'iso'),
+             lambda dt: table.format(dt, 'iso')),
+            ('localize', locals_, tz.localize, table.localize),
+        ]
+        for operation, values, reference, fast in cases:
+            assert all(reference(v) == fast(v) for v in values[:1000]), (label, operation)
+            slow, quick = rate(reference, values), rate(fast, values)
+            writer.write([label, operation, int(slow), int(quick), f'{quick / slow:.1f}x'])
+    writer.close()
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -1,7 +1,7 @@
 from typing import List, Optional, Union
 from typing import TextIO, Callable
 import re
-import csv,io
+import io
 
 Primitive = Union[bool, int, float, str, type(None)]
 Row = Union[dict[str,Primitive], List[Primitive]]
@@ -17,6 +17,7 @@ class DataTable:
     #   _headers (list of headers)
     #   _header_index (dictionary from label to column index)
     #   _ncols
+    #   _version (incremented on every modification)
 
     def __init__(self, p: Union[int, List[Optional[str]]]):
         if isinstance(p, int):
@@ -41,6 +42,7 @@ class DataTable:
         self._ncols = len(self._headers)
         self._data: List[List[Primitive]] = []
         self._nrows = 0
+        self._version = 0
 
     def size(self) -> int:
         """Returns number of rows"""
@@ -53,6 +55,10 @@ class DataTable:
     def ncols(self):
         return self._ncols
 
+    def version(self) -> int:
+        """Returns a counter that changes whenever the table is modified"""
+        return self._version
+
     def _normalize_row(self, row: Row) -> List[Primitive]:
         if isinstance(row, dict):
             r = [None] * self._ncols
@@ -66,7 +72,9 @@ class DataTable:
             for item in row:
                 if not isinstance(item, (bool, int, float, str, type(None))):
                     raise TypeError(f"Unsupported data type: {type(item)}")
-            return row
+            # A copy: rows changed by the caller afterwards must not change
+            # the table behind `version()`
+            return list(row)
         else:
             raise ValueError("invalid argument for row")
 
@@ -75,6 +83,7 @@ class DataTable:
             raise ValueError("Invalid insert position")
         self._data.insert(pos, self._normalize_row(row)) 
         self._nrows += 1
+        self._version += 1
 
     def append(self, row: Row):
         self.insert(self.size(), row)
@@ -118,6 +127,7 @@ class DataTable:
             raise ValueError("Invalid index")
         del self._data[index]
         self._nrows -= 1
+        self._version += 1
 
     def get(self, index: int) -> dict[str, Primitive]:
         if index < 0 or index >= self.size():
@@ -139,6 +149,23 @@ class DataTable:
             res.append(self._data[i][index])
         return res
 
+    def add_col(self, name: str, values: List[Primitive]):
+        """Appends a column with one value per row"""
+        if not isinstance(name, str):
+            raise ValueError("Column name must be a string")
+        if name in self._header_index:
+            raise ValueError(f"Duplicate column {name}")
+        if len(values) != self.size():
+            raise ValueError(f"Column length {len(values)} does not match number of rows {self.size()}")
+        for item in values:
+            if not isinstance(item, (bool, int, float, str, type(None))):
+                raise TypeError(f"Unsupported data type: {type(item)}")
+        self._header_index[name] = self._ncols
+        self._headers.append(name)
+        self._ncols += 1
+        self._data = [row + [value] for row, value in zip(self._data, values)]
+        self._version += 1
+
     def restructure(self, col_map):
         """Returns new table based on column mapping"""
         t = DataTable(list(col_map.keys()))
@@ -188,6 +215,7 @@ class CsvFormat(DataFormat):
     def parse(content: str, **options) -> DataTable:
         parse_types = options.get('parse_types', False)
         trim_spaces = options.get('trim_spaces', False)
+        import csv
         reader = csv.reader(io.StringIO(content))
         header = next(reader)
         header = [f.strip() for f in header]
@@ -202,6 +230,7 @@ class CsvFormat(DataFormat):
 
     @staticmethod
     def render(table: DataTable, **options) -> str:
+        import csv
         output = io.StringIO()
         writer = csv.writer(output, quoting=csv.QUOTE_MINIMAL,lineterminator='\n')
         writer.writerow(table.cols())
@@ -321,6 +350,69 @@ class MdFormat(DataFormat):
 
         return [clean(cell) for cell in raw_cells]
 
+# Streaming counterparts of `CsvFormat.render` / `MdFormat.render`: rows
+# are written to `stream` as they come, without building a DataTable.
+# Call `close()` after the last row (it does not close the stream).
+class CsvWriter:
+    def __init__(self, stream: TextIO, cols: List[str]):
+        import csv
+        self._writer = csv.writer(stream, quoting=csv.QUOTE_MINIMAL, lineterminator='\n')
+        self._writer.writerow(cols)
+
+    def write(self, row: List[Primitive]):
+        self._writer.writerow([Parser._val_to_str(cell) for cell in row])
+
+    def write_rows(self, rows: List[List[Primitive]]):
+        to_str = Parser._val_to_str
+        self._writer.writerows([[to_str(cell) for cell in row] for row in rows])
+
+    def close(self):
+        pass
+
+# Column widths are taken from the header and the first `buffer_rows` rows;
+# longer values later on are written unpadded (still valid markdown).
+class MdWriter:
+    def __init__(self, stream: TextIO, cols: List[str], buffer_rows: int = 1000):
+        self._stream = stream
+        self._cols = list(cols)
+        self._buffer: Optional[List[List[str]]] = []
+        self._buffer_rows = buffer_rows
+        self._widths: List[int] = []
+
+    def write(self, row: List[Primitive]):
+        self.write_rows([row])
+
+    def write_rows(self, rows: List[List[Primitive]]):
+        str_rows = [[MdWriter._cell(cell) for cell in row] for row in rows]
+        if self._buffer is None:
+            self._write_lines(str_rows)
+            return
+        self._buffer.extend(str_rows)
+        if len(self._buffer) >= self._buffer_rows:
+            self._flush_buffer()
+
+    def close(self):
+        if self._buffer is not None:
+            self._flush_buffer()
+
+    def _flush_buffer(self):
+        self._widths = [max(3, len(c)) for c in self._cols]
+        for row in self._buffer:
+            for i, cell in enumerate(row):
+                self._widths[i] = max(self._widths[i], len(cell))
+        header = [self._cols, ['-' * w for w in self._widths]]
+        rows, self._buffer = self._buffer, None
+        self._write_lines(header + rows)
+
+    def _write_lines(self, rows: List[List[str]]):
+        widths = self._widths
+        self._stream.write(''.join(
+            '| ' + ' | '.join(cell.ljust(widths[i]) for i, cell in enumerate(row)) + ' |\n' for row in rows))
+
+    @staticmethod
+    def _cell(value: Primitive) -> str:
+        return Parser._val_to_str(value).replace('|', r'\|')
+
 class Parser:
     @staticmethod
     def parse_value(value: Optional[str], parse_types = True, null_str='') -> Primitive:
@@ -0,0 +1,136 @@
+#!/usr/bin/python3
+
+import hashlib
+import json
+import os
+import re
+from typing import Dict, List, Optional
+
+from bench.data import DataTable
+
+# Bump when the cached content or key layout changes
+CACHE_VERSION = 1
+
+# SQL whose result may change between runs on identical inputs. Date and
+# time functions without a time value (at most strftime's format) use 'now'.
+_NON_DETERMINISTIC = re.compile(
+    r"\b(random|randomblob|changes|total_changes|last_insert_rowid)\s*\("
+    r"|\bcurrent_(time|date|timestamp)\b"
+    r"|\b(date|time|datetime|julianday|unixepoch)\s*\(\s*\)"
+    r"|\bstrftime\s*\(\s*('(?:[^']|'')*'|[^,()']*)\s*\)"
+    r"|'now'",
+    re.IGNORECASE)
+
+# String literals and quoted identifiers, kept verbatim by normalize_sql
+_QUOTED = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`[^`]*`|\[[^\]]*\]")
+
+# Quoted text, or a comment outside of quotes (an unterminated /* runs to the end)
+_QUOTED_OR_COMMENT = re.compile(_QUOTED.pattern + r"|--[^\n]*|/\*.*?(?:\*/|\Z)", re.DOTALL)
+
+def normalize_sql(sql: str) -> str:
+    """
+    Drops comments, collapses whitespace outside of quotes and drops trailing
+    ';', so that reformatted copies of a query share a cache entry. Comments
+    are dropped first, as a newline ends a '--' comment.
+    """
+    sql = _QUOTED_OR_COMMENT.sub(lambda m: ' ' if m.group(0)[0] in '-/' else m.group(0), sql)
+    parts = []
+    pos = 0
+    for m in _QUOTED.finditer(sql):
+        parts.append(re.sub(r'\s+', ' ', sql[pos:m.start()]))
+        parts.append(m.group(0))
+        pos = m.end()
+    parts.append(re.sub(r'\s+', ' ', sql[pos:]))
+    return ''.join(parts).strip().rstrip(';').strip()
+
+def is_deterministic(sql: str) -> bool:
+    return _NON_DETERMINISTIC.search(sql) is None
+
+def file_fingerprint(path: str) -> str:
+    """Identity of a file's current content: path, inode, size and mtime"""
+    st = os.stat(path)
+    return f'file:{os.path.realpath(path)}:{st.st_dev}:{st.st_ino}:{st.st_size}:{st.st_mtime_ns}'
+
+def bytes_fingerprint(data: bytes) -> str:
+    return 'bytes:' + hashlib.sha256(data).hexdigest()
+
+def table_fingerprint(table: DataTable) -> str:
+    """Content hash of a DataTable (header, values and their types)"""
+    h = hashlib.sha256()
+    h.update(json.dumps(table.cols()).encode('utf-8'))
+    for row in table.data():
+        h.update(repr(row).encode('utf-8'))
+    return 'table:' + h.hexdigest()
+
+class ResultCache:
+    """
+    On-disk cache of rendered query results, bounded to `max_bytes` with
+    least-recently-used eviction (file mtimes are refreshed on each hit).
+
+    Entries are keyed by the normalized SQL, the fingerprints of all input
+    tables and any options that change the output.
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = 64 << 20):
+        if directory is None:
+            base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+            directory = os.path.join(base, 'textquery')
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def key(self, sql: str, fingerprints: Dict[str, str], **options) -> Optional[str]:
+        """Returns the cache key, or None if the query must not be cached"""
+        if not is_deterministic(sql):
+            return None
+        material = json.dumps({
+            'version': CACHE_VERSION,
+            'sql': normalize_sql(sql),
+            'tables': sorted(fingerprints.items()),
+            'options': sorted(options.items()),
+        })
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.out')
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                content = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)  # Mark as recently used
+        except FileNotFoundError:
+            pass
+        return content
+
+    def put(self, key: str, content: str):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp, path)
+        self.evict()
+
+    def entries(self) -> List[os.DirEntry]:
+        """Cache entries, least recently used first"""
+        try:
+            entries = [e for e in os.scandir(self.directory) if e.name.endswith('.out')]
+        except FileNotFoundError:
+            return []
+        return sorted(entries, key=lambda e: e.stat().st_mtime_ns)
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(e.stat().st_size for e in entries)
+        for entry in entries:
+            if total <= self.max_bytes:
+                break
+            total -= entry.stat().st_size
+            try:
+                os.unlink(entry.path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,481 @@
+#!/usr/bin/python3
+
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from bench.data import DataTable, Primitive
+from bench.sqlfunctions import SCALARS
+from bench.textquery import CsvIngest, InMemoryDb, QueryStats, load_udfs, plan_memory
+
+# Map-reduce execution of decomposable aggregate queries over CSV files.
+#
+# A query of the form
+#   SELECT <items> FROM <table> [WHERE ...] [GROUP BY ...] [ORDER BY ...] [LIMIT ...]
+# whose items are group-by expressions and expressions over
+# sum/count/min/max/avg/total aggregates is split into
+#   - a partial query, run by each worker over its shard of the rows:
+#       SELECT <group exprs> AS g0.., <partial aggregates> AS a0.. FROM ... WHERE ... GROUP BY ...
+#   - a merge query over the union of all partial results:
+#       SELECT <items rewritten over g/a columns> FROM partials GROUP BY g0.. ORDER BY ... LIMIT ...
+# avg(x) is computed from partial sum(x) and count(x). Anything else (joins,
+# subqueries, DISTINCT, HAVING, window functions, other aggregates, and calls
+# of functions not known to be scalar) is not decomposed, and `plan_query`
+# returns None.
+#
+# Shards are byte ranges of the input files, cut at line boundaries. Quoted
+# fields spanning several lines can therefore be split between shards; such
+# input needs single-process execution.
+
+_TOKEN = re.compile(r"""
+    (?P<ws>\s+|--[^\n]*|/\*.*?\*/)
+  | (?P<string>'(?:[^']|'')*')
+  | (?P<ident>"(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\])
+  | (?P<number>\d+(?:\.\d*)?(?:[eE][+-]?\d+)?|\.\d+(?:[eE][+-]?\d+)?)
+  | (?P<word>[A-Za-z_][A-Za-z0-9_$]*)
+  | (?P<op>\|\||<=|>=|<>|!=|==|<<|>>|.)
+""", re.VERBOSE | re.DOTALL)
+
+# Aggregate -> (partial aggregates, merge expression over their columns)
+_AGGREGATES = {
+    'sum': (['sum'], 'sum({0})'),
+    'total': (['total'], 'total({0})'),
+    'count': (['count'], 'sum({0})'),
+    'min': (['min'], 'min({0})'),
+    'max': (['max'], 'max({0})'),
+    'avg': (['sum', 'count'], '(sum({0}) * 1.0 / sum({1}))'),
+}
+
+# Functions that may be applied to grouped expressions or to aggregates in the
+# merge query: SQLite's core, date and math scalars, and those of
+# bench.sqlfunctions. Any other call (group_concat, json_group_array, median,
+# user functions, ...) may be an aggregate, which must not be re-applied to
+# partial results.
+_SCALAR_FUNCTIONS = {
+    'abs', 'char', 'coalesce', 'format', 'glob', 'hex', 'ifnull', 'iif', 'instr', 'length', 'like',
+    'likelihood', 'likely', 'lower', 'ltrim', 'nullif', 'printf', 'quote', 'replace', 'round', 'rtrim',
+    'sign', 'soundex', 'substr', 'substring', 'trim', 'typeof', 'unicode', 'unlikely', 'upper', 'zeroblob',
+    'date', 'time', 'datetime', 'julianday', 'unixepoch', 'strftime',
+    'acos', 'acosh', 'asin', 'asinh', 'atan', 'atan2', 'atanh', 'ceil', 'ceiling', 'cos', 'cosh', 'degrees',
+    'exp', 'floor', 'ln', 'log', 'log10', 'log2', 'mod', 'pi', 'pow', 'power', 'radians', 'sin', 'sinh',
+    'sqrt', 'tan', 'tanh', 'trunc',
+} | {name for name, _ in SCALARS}
+
+# Clause keywords at the top level of a decomposable query, in order
+_CLAUSES = ['select', 'from', 'where', 'group', 'order', 'limit']
+
+_UNSUPPORTED = {'distinct', 'having', 'window', 'over', 'join', 'union', 'intersect', 'except',
+                'with', 'values', 'filter', 'natural', 'using', 'on'}
+
+# Words that may appear outside aggregates in an item without referring to a column
+_KEYWORDS = {'and', 'or', 'not', 'is', 'null', 'true', 'false', 'case', 'when', 'then', 'else', 'end',
+             'cast', 'as', 'integer', 'real', 'text', 'numeric', 'blob', 'in', 'like', 'glob', 'between',
+             'collate', 'nocase', 'asc', 'desc'}
+
+class _Token:
+    def __init__(self, kind: str, text: str, depth: int, start: int):
+        self.kind = kind
+        self.text = text
+        self.lower = text.lower()
+        self.depth = depth
+        self.start = start
+
+    def __repr__(self):
+        return f'{self.kind}:{self.text}'
+
+class ShardPlan:
+    """
+    Partial and merge queries of a decomposable query over `table`.
+
+    Unaliased result columns that are a bare column reference are named by
+    SQLite after the table's declared column (`SELECT K ... GROUP BY K` gives
+    `k` for a column `k`), which is only known once the data is loaded:
+    `names_sql` then selects them from the table, and `merge_query` takes
+    the names it gives.
+    """
+
+    PARTIALS = 'partials'
+
+    def __init__(self, table: str, partial_sql: str, outputs: List[Tuple[str, str]], merge_clauses: str,
+                 column_refs: Optional[Dict[int, str]] = None, source: Optional[str] = None):
+        """
+        outputs: (expression over the partials, result column name) per item
+        merge_clauses: GROUP BY / ORDER BY / LIMIT of the merge query
+        column_refs: output index -> column reference, for bare column items
+        source: the FROM clause of the query
+        """
+        self.table = table
+        self.partial_sql = partial_sql
+        self.outputs = outputs
+        self.merge_clauses = merge_clauses
+        self.column_refs = column_refs or {}
+        self.names_sql = None
+        if self.column_refs:
+            self.names_sql = f'SELECT {", ".join(self.column_refs.values())} FROM {source} LIMIT 0'
+        self.merge_sql = self.merge_query()
+
+    def merge_query(self, names: Optional[List[str]] = None) -> str:
+        """The merge query, with `names` (from `names_sql`) for the bare column items"""
+        renamed = dict(zip(self.column_refs, names or []))
+        items = [f'{expr} AS {_quote(renamed.get(i, name))}' for i, (expr, name) in enumerate(self.outputs)]
+        return f'SELECT {", ".join(items)} FROM {ShardPlan.PARTIALS}{self.merge_clauses}'
+
+    def __repr__(self):
+        return f'ShardPlan({self.table!r}, {self.partial_sql!r}, {self.merge_sql!r})'
+
+class _NotDecomposable(Exception):
+    pass
+
+def _tokenize(sql: str) -> List[_Token]:
+    tokens = []
+    depth = 0
+    for m in _TOKEN.finditer(sql):
+        kind = m.lastgroup
+        if kind == 'ws':
+            continue
+        text = m.group(0)
+        if text == ')':
+            depth -= 1
+        tokens.append(_Token(kind, text, depth, m.start()))
+        if text == '(':
+            depth += 1
+    if depth != 0:
+        raise _NotDecomposable('unbalanced parentheses')
+    return tokens
+
+def _text(tokens: Sequence[_Token]) -> str:
+    return ' '.join(t.text for t in tokens)
+
+def _key(tokens: Sequence[_Token]) -> str:
+    # Comparable form of an expression (case of words ignored)
+    return ' '.join(t.text if t.kind in ('string', 'ident') else t.lower for t in tokens)
+
+def _split(tokens: List[_Token], depth: int) -> List[List[_Token]]:
+    """Splits on commas at `depth`"""
+    parts: List[List[_Token]] = [[]]
+    for t in tokens:
+        if t.text == ',' and t.depth == depth:
+            parts.append([])
+        else:
+            parts[-1].append(t)
+    return parts
+
+def _unquote(token: _Token) -> str:
+    if token.kind == 'ident':
+        if token.text[0] == '[':
+            return token.text[1:-1]
+        return token.text[1:-1].replace(token.text[0] * 2, token.text[0])
+    return token.text
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+class _Rewriter:
+    def __init__(self, group_exprs: List[List[_Token]]):
+        self.group_keys = {_key(expr): f'g{i}' for i, expr in enumerate(group_exprs)}
+        self.partials: List[str] = []
+
+    def expr(self, tokens: List[_Token]) -> str:
+        """Rewrites an expression of the final query over the partials' columns"""
+        if not tokens:
+            raise _NotDecomposable('empty expression')
+        name = self.group_keys.get(_key(tokens))
+        if name is not None:
+            return name
+        out = []
+        i = 0
+        while i < len(tokens):
+            t = tokens[i]
+            is_call = i + 1 < len(tokens) and tokens[i + 1].text == '('
+            if t.kind == 'word' and is_call and t.lower in _AGGREGATES:
+                end = _closing(tokens, i + 1)
+                out.append(self._aggregate(t.lower, tokens[i + 2:end]))
+                i = end + 1
+                continue
+            if is_call and not (t.kind == 'word' and (t.lower in _SCALAR_FUNCTIONS or t.lower in _KEYWORDS)):
+                raise _NotDecomposable(f'{t.text} may be an aggregate')
+            if t.kind in ('word', 'ident') and not is_call:
+                name = self.group_keys.get(_key([t]))
+                if name is not None:
+                    out.append(name)
+                elif t.kind == 'word' and t.lower in _KEYWORDS:
+                    out.append(t.text)
+                else:
+                    raise _NotDecomposable(f'{t.text} is neither grouped nor aggregated')
+            else:
+                out.append(t.text)
+            i += 1
+        return ' '.join(out)
+
+    def _aggregate(self, func: str, args: List[_Token]) -> str:
+        if not args or len(_split(args, args[0].depth)) != 1 or args[0].lower == 'distinct':
+            raise _NotDecomposable(f'{func} with these arguments')
+        if any(t.kind == 'word' and t.lower in _AGGREGATES for t in args):
+            raise _NotDecomposable('nested aggregate')
+        partials, merge = _AGGREGATES[func]
+        names = []
+        for partial in partials:
+            names.append(f'a{len(self.partials)}')
+            self.partials.append(f'{partial}({_text(args)}) AS {names[-1]}')
+        return merge.format(*names)
+
+def _closing(tokens: List[_Token], open_index: int) -> int:
+    depth = tokens[open_index].depth
+    for j in range(open_index + 1, len(tokens)):
+        if tokens[j].text == ')' and tokens[j].depth == depth:
+            return j
+    raise _NotDecomposable('unbalanced parentheses')
+
+def _split_alias(item: List[_Token]) -> Tuple[List[_Token], Optional[str]]:
+    if len(item) >= 3 and item[-2].lower == 'as' and item[-1].kind in ('word', 'ident', 'string'):
+        return item[:-2], _unquote(item[-1]) if item[-1].kind != 'string' else item[-1].text[1:-1]
+    # `expr alias`: an identifier right after the end of an operand
+    if (len(item) >= 2 and item[-1].kind in ('word', 'ident') and item[-1].lower not in _KEYWORDS
+            and (item[-2].text == ')' or item[-2].kind in ('word', 'ident', 'number', 'string'))
+            and (item[-2].lower not in _KEYWORDS or item[-2].lower in ('end', 'null', 'true', 'false'))):
+        return item[:-1], _unquote(item[-1])
+    return item, None
+
+def plan_query(sql: str) -> Optional[ShardPlan]:
+    """Splits `sql` into partial and merge queries, or returns None if it is not decomposable"""
+    try:
+        return _plan(sql)
+    except _NotDecomposable:
+        return None
+
+def _plan(sql: str) -> ShardPlan:
+    sql = sql.strip().rstrip(';')
+    tokens = _tokenize(sql)
+    for t in tokens:
+        if t.text == ';' or (t.kind == 'word' and t.lower in _UNSUPPORTED):
+            raise _NotDecomposable(t.text)
+        if t.kind == 'word' and t.lower == 'select' and t.depth > 0:
+            raise _NotDecomposable('subquery')
+
+    # Top-level clauses
+    clauses = {}
+    current = None
+    expected = list(_CLAUSES)
+    i = 0
+    while i < len(tokens):
+        t = tokens[i]
+        if t.depth == 0 and t.kind == 'word' and t.lower in expected:
+            expected = expected[expected.index(t.lower) + 1:]
+            current = t.lower
+            clauses[current] = []
+            if current in ('group', 'order'):
+                if i + 1 >= len(tokens) or tokens[i + 1].lower != 'by':
+                    raise _NotDecomposable(t.text)
+                i += 1
+        elif current is None or (t.depth == 0 and t.kind == 'word' and t.lower in _CLAUSES):
+            raise _NotDecomposable(t.text)  # Clause out of order or before SELECT
+        else:
+            clauses[current].append(t)
+        i += 1
+    if 'select' not in clauses or not tokens or tokens[0].lower != 'select' or 'from' not in clauses:
+        raise _NotDecomposable('not a simple select')
+
+    source = clauses['from']
+    if not source or source[0].kind not in ('word', 'ident') or len(source) > 3 or \
+            any(t.kind not in ('word', 'ident') for t in source):
+        raise _NotDecomposable('FROM must name one table')
+    table = _unquote(source[0])
+
+    items = [_split_alias(item) for item in _split(clauses['select'], 0)]
+    if any(t.text == '*' and len(expr) == 1 for expr, _ in items for t in expr):
+        raise _NotDecomposable('*')
+
+    # GROUP BY terms may be ordinals or aliases of select items
+    group_exprs = []
+    aliases = {alias.lower(): expr for expr, alias in items if alias is not None}
+    # The partial query does not have the select items' aliases
+    if any(t.kind in ('word', 'ident') and _unquote(t).lower() in aliases for t in clauses.get('where', [])):
+        raise _NotDecomposable('WHERE names a select alias')
+    for term in _split(clauses.get('group', []), 0) if 'group' in clauses else []:
+        if len(term) == 1 and term[0].kind == 'number' and term[0].text.isdigit():
+            index = int(term[0].text) - 1
+            if not 0 <= index < len(items):
+                raise _NotDecomposable('GROUP BY ordinal')
+            term = items[index][0]
+        elif len(term) == 1 and term[0].lower in aliases:
+            term = aliases[term[0].lower]
+        if not term:
+            raise _NotDecomposable('empty GROUP BY term')
+        group_exprs.append(term)
+
+    rewriter = _Rewriter(group_exprs)
+    outputs = []
+    column_refs = {}
+    for i, (expr, alias) in enumerate(items):
+        name = alias if alias is not None else _source_text(sql, expr)
+        outputs.append((rewriter.expr(expr), name))
+        if alias is None and len(expr) == 1 and expr[0].kind in ('word', 'ident'):
+            column_refs[i] = expr[0].text
+    if not rewriter.partials and not group_exprs:
+        raise _NotDecomposable('no aggregation')
+
+    order = []
+    output_names = {(alias or '').lower() for _, alias in items}
+    for term in _split(clauses.get('order', []), 0) if 'order' in clauses else []:
+        direction = ''
+        if term and term[-1].lower in ('asc', 'desc'):
+            direction = ' ' + term[-1].text
+            term = term[:-1]
+        if len(term) == 1 and (term[0].kind == 'number' or _unquote(term[0]).lower() in output_names):
+            order.append(term[0].text + direction)
+        else:
+            order.append(rewriter.expr(term) + direction)
+
+    partial_cols = [f'{_text(expr)} AS g{i}' for i, expr in enumerate(group_exprs)] + rewriter.partials
+    partial_sql = f'SELECT {", ".join(partial_cols)} FROM {_text(source)}'
+    if 'where' in clauses:
+        partial_sql += f' WHERE {_text(clauses["where"])}'
+    if group_exprs:
+        partial_sql += f' GROUP BY {", ".join(_text(expr) for expr in group_exprs)}'
+
+    merge_clauses = ''
+    if group_exprs:
+        merge_clauses += f' GROUP BY {", ".join(f"g{i}" for i in range(len(group_exprs)))}'
+    if order:
+        merge_clauses += f' ORDER BY {", ".join(order)}'
+    if 'limit' in clauses:
+        merge_clauses += f' LIMIT {_text(clauses["limit"])}'
+    return ShardPlan(table, partial_sql, outputs, merge_clauses, column_refs, _text(source))
+
+def _source_text(sql: str, expr: List[_Token]) -> str:
+    # SQLite names an unaliased result column by its text as written
+    return sql[expr[0].start:expr[-1].start + len(expr[-1].text)]
+
+class _RangeReader:
+    """Binary stream of `header` followed by the lines starting in [start, end) of a file"""
+
+    def __init__(self, path: str, start: int, end: int, header: bytes = b''):
+        self._f = open(path, 'rb')
+        self._header = header
+        self._pos = self._line_start(start)
+        self._end = self._line_start(end)
+
+    def _line_start(self, offset: int) -> int:
+        # First line start at or after `offset`
+        if offset == 0:
+            return 0
+        self._f.seek(offset - 1)
+        self._f.readline()
+        return self._f.tell()
+
+    def read(self, size: int = -1) -> bytes:
+        if self._header:
+            data, self._header = self._header, b''
+            return data
+        remaining = self._end - self._pos
+        if remaining <= 0:
+            return b''
+        size = remaining if size < 0 else min(size, remaining)
+        self._f.seek(self._pos)
+        data = self._f.read(size)
+        self._pos += len(data)
+        return data
+
+    def close(self):
+        self._f.close()
+
+# A shard: byte ranges (path, start, end) of data lines, possibly of several files
+Shard = List[Tuple[str, int, int]]
+
+def _header(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        return f.readline()
+
+def shard_files(paths: List[str], shards: int) -> List[Shard]:
+    """Splits the data lines (after the header) of `paths` into up to `shards` shards of similar size"""
+    ranges = []
+    for path in paths:
+        ranges.append((path, len(_header(path)), os.path.getsize(path)))
+    total = sum(end - start for _, start, end in ranges)
+    target = max(1, -(-total // max(1, shards)))
+    result: List[Shard] = [[]]
+    filled = 0
+    for path, start, end in ranges:
+        while start < end:
+            if filled >= target:
+                result.append([])
+                filled = 0
+            cut = min(end, start + target - filled)
+            result[-1].append((path, start, cut))
+            filled += cut - start
+            start = cut
+    return [shard for shard in result if shard]
+
+def _run_shard(table: str, shard: Shard, partial_sql: str, names_sql: Optional[str], udfs: List[str],
+               max_memory: Optional[int]) -> Tuple[List[str], List[Tuple[Primitive, ...]], List[str], QueryStats]:
+    # Worker: loads its ranges into a private db and runs the partial query,
+    # and `names_sql` for the names of bare column items. Values are loaded
+    # as text, like `--table` files.
+    size = sum(end - start for _, start, end in shard)
+    on_disk, _ = plan_memory(size, max_memory)
+    db = InMemoryDb({}, on_disk=on_disk, cache_bytes=max_memory // 2 if on_disk else None)
+    try:
+        load_udfs(db, udfs)
+        ingest = CsvIngest(db._conn, table, parse_types=False, stats=db.stats)
+        for i, (path, start, end) in enumerate(shard):
+            reader = _RangeReader(path, start, end, header=_header(path) if i == 0 else b'')
+            try:
+                if i == 0:
+                    ingest.load(reader)
+                else:
+                    ingest.append(reader)
+            finally:
+                reader.close()
+        start_time = time.perf_counter()
+        cursor = db._conn.execute(partial_sql)
+        cols = [desc[0] for desc in cursor.description]
+        rows = cursor.fetchall()
+        names = [desc[0] for desc in db._conn.execute(names_sql).description] if names_sql else []
+        db.stats.add('query', time.perf_counter() - start_time, rows=len(rows))
+        return cols, rows, names, db.stats
+    finally:
+        db.close()
+
+def run_sharded(plan: ShardPlan, paths: List[str], shards: int, udfs: Sequence[str] = (),
+                stats: Optional[QueryStats] = None, max_memory: Optional[int] = None) -> DataTable:
+    """
+    Runs `plan` over the CSV files `paths` (all with the same header) in up
+    to `shards` worker processes and merges their partial results. Worker
+    stage times are summed into `stats`.
+    """
+    stats = stats if stats is not None else QueryStats()
+    headers = {_header(path) for path in paths}
+    if len(headers) > 1:
+        raise ValueError(f"Files of table '{plan.table}' have different headers")
+    parts = shard_files(paths, shards)
+    if not parts:
+        parts = [[(paths[0], 0, 0)]]  # Header only: one empty shard for the result's shape
+    budget = max_memory // len(parts) if max_memory is not None else None
+
+    merge = InMemoryDb({})
+    try:
+        with ProcessPoolExecutor(max_workers=len(parts)) as pool:
+            futures = [pool.submit(_run_shard, plan.table, part, plan.partial_sql, plan.names_sql, list(udfs),
+                                   budget) for part in parts]
+            created = False
+            for future in futures:
+                cols, rows, names, shard_stats = future.result()
+                stats.merge(shard_stats)
+                if not created:
+                    # No declared types: partial values are kept exactly
+                    merge._conn.execute(f'CREATE TABLE {ShardPlan.PARTIALS} ({", ".join(_quote(c) for c in cols)});')
+                    created = True
+                placeholders = ', '.join('?' * len(cols))
+                merge._conn.executemany(f'INSERT INTO {ShardPlan.PARTIALS} VALUES ({placeholders});', rows)
+        return merge.query(plan.merge_query(names), stats=stats)
+    finally:
+        merge.close()
+
+def sharded_query(sql: str, paths: List[str], shards: int, **options) -> Optional[DataTable]:
+    """Runs `sql` with `run_sharded` if it is decomposable, else returns None"""
+    plan = plan_query(sql)
+    if plan is None:
+        return None
+    return run_sharded(plan, paths, shards, **options)
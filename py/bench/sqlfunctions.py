@@ -0,0 +1,154 @@
+#!/usr/bin/python3
+
+import hashlib
+import math
+from functools import lru_cache
+from typing import List, Optional
+
+from bench.data import Parser, Primitive
+
+# Library of SQL functions registered on every `InMemoryDb` connection.
+#
+# Scalars (deterministic, results memoized per process):
+#   ts_epoch(value [, tz])            epoch seconds of a timestamp / epoch value
+#   ts_epoch_ms(value [, tz])         same, in milliseconds
+#   ts_format(value, to_tz [, fmt [, tz]])
+#                                     value shown in zone `to_tz`, with fmt one of
+#                                     'standard' (default), 'micros', 'iso' or a
+#                                     strftime pattern
+# `value` accepts what `TimeParser.parse` accepts; `tz` is the zone label
+# assumed for naive strings (default UTC). Unparseable values give NULL.
+#
+# Aggregates:
+#   median(x), percentile(x, p)       p in [0, 100], linear interpolation;
+#                                     numeric text is included, NULLs ignored
+#   approx_count_distinct(x)          HyperLogLog estimate (~1.6% error)
+
+CACHE_SIZE = 1 << 16
+
+FORMATS = {
+    'standard': "%Y-%m-%d %H:%M:%S",
+    'micros': "%Y-%m-%d %H:%M:%S.%f",
+    'iso': "%Y-%m-%dT%H:%M:%S%z",
+}
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse(value: Primitive, tz: Optional[str]):
+    from bench.timestamp import TimeParser
+    if value is None:
+        return None
+    try:
+        return TimeParser.parse(str(value), tz)
+    except ValueError:
+        return None
+
+def _epoch(dt, scale: int) -> Optional[Primitive]:
+    if dt is None:
+        return None
+    ts = dt.timestamp() * scale
+    return int(ts) if ts == int(ts) else ts
+
+def ts_epoch(value, tz=None):
+    return _epoch(_parse(value, tz), 1)
+
+def ts_epoch_ms(value, tz=None):
+    return _epoch(_parse(value, tz), 1000)
+
+@lru_cache(maxsize=CACHE_SIZE)
+def ts_format(value, to_tz='UTC', fmt='standard', tz=None):
+    import pytz
+    from bench.timestamp import TimeParser
+    dt = _parse(value, tz)
+    if dt is None or to_tz not in TimeParser.LABEL_TO_PYTZ:
+        return None
+    dt = dt.astimezone(pytz.timezone(TimeParser.LABEL_TO_PYTZ[to_tz]))
+    return dt.strftime(FORMATS.get(fmt, fmt))
+
+class _Values:
+    def __init__(self):
+        self.values: List[float] = []
+
+    def _add(self, value):
+        # Numeric text counts too: tables loaded without type parsing are TEXT
+        if isinstance(value, str):
+            value = Parser.parse_value(value)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            self.values.append(value)
+
+def _percentile(values: List[float], p: float) -> Optional[float]:
+    if not values or p is None or not 0 <= p <= 100:
+        return None
+    values.sort()
+    k = (len(values) - 1) * p / 100
+    lo = math.floor(k)
+    hi = math.ceil(k)
+    if lo == hi:
+        return values[lo]
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+class Median(_Values):
+    def step(self, value):
+        self._add(value)
+
+    def finalize(self):
+        return _percentile(self.values, 50)
+
+class Percentile(_Values):
+    def __init__(self):
+        super().__init__()
+        self.p = None
+
+    def step(self, value, p):
+        self.p = p
+        self._add(value)
+
+    def finalize(self):
+        return _percentile(self.values, self.p)
+
+class ApproxCountDistinct:
+    # HyperLogLog with 2^P registers
+    P = 12
+    M = 1 << P
+
+    def __init__(self):
+        self.registers = bytearray(ApproxCountDistinct.M)
+
+    def step(self, value):
+        if value is None:
+            return
+        # Type-tagged so that 1 and '1' stay distinct, like in SQL
+        key = f'{type(value).__name__}:{value}'.encode('utf-8')
+        h = int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'big')
+        index = h >> (64 - ApproxCountDistinct.P)
+        rest = h & ((1 << (64 - ApproxCountDistinct.P)) - 1)
+        rank = (64 - ApproxCountDistinct.P) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def finalize(self):
+        m = ApproxCountDistinct.M
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  # small range correction
+        return int(round(estimate))
+
+SCALARS = [
+    ('ts_epoch', ts_epoch),
+    ('ts_epoch_ms', ts_epoch_ms),
+    ('ts_format', ts_format),
+]
+
+AGGREGATES = [
+    ('median', 1, Median),
+    ('percentile', 2, Percentile),
+    ('approx_count_distinct', 1, ApproxCountDistinct),
+]
+
+def register(db):
+    """Registers the library on an `InMemoryDb`"""
+    for name, fn in SCALARS:
+        db.register_function(name, fn)
+    for name, narg, cls in AGGREGATES:
+        db.register_aggregate(name, cls, narg)
@@ -1,47 +1,322 @@
 #!/usr/bin/python3
 
+import csv
+import glob
+import io
+import itertools
+import os
+import re
 import sqlite3
-from bench.data import DataTable
+import stat
+import threading
+import time
+import weakref
+from array import array
+from bench.data import DataTable, CsvFormat, MdFormat, Parser, Primitive
+from contextlib import contextmanager
 from enum import Enum
-from typing import List, Optional
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple, Union
 
-import sqlite3
-from typing import Dict, List
+# A column of `InMemoryDb.query_columns`: array('q'), array('d'), a list,
+# or a NumPy array
+Column = Union[array, list, Any]
+
+class StageStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.seconds = 0.0
+        self.rows = 0
+        self.nbytes = 0
+
+    def rows_per_sec(self) -> Optional[float]:
+        if self.rows == 0 or self.seconds <= 0:
+            return None
+        return self.rows / self.seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'stage': self.name,
+            'seconds': self.seconds,
+            'rows': self.rows,
+            'bytes': self.nbytes,
+            'rows_per_sec': self.rows_per_sec(),
+        }
+
+# Accumulated wall time per processing stage of a textquery run.
+# Stages are kept in a fixed pipeline order (read, parse, infer, insert,
+# query, render); unknown stage names are appended after those.
+# Times of stages run in worker processes are summed over the workers.
+class QueryStats:
+    STAGES = ['read', 'parse', 'infer', 'insert', 'query', 'render']
+
+    def __init__(self):
+        self._stages: Dict[str, StageStats] = {}
+
+    def add(self, stage: str, seconds: float, rows: int = 0, nbytes: int = 0):
+        s = self._stages.get(stage)
+        if s is None:
+            s = self._stages[stage] = StageStats(stage)
+        s.seconds += seconds
+        s.rows += rows
+        s.nbytes += nbytes
+
+    @contextmanager
+    def timed(self, stage: str, rows: int = 0, nbytes: int = 0):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start, rows, nbytes)
+
+    def merge(self, other: "QueryStats"):
+        for s in other.stages():
+            self.add(s.name, s.seconds, s.rows, s.nbytes)
+
+    def get(self, stage: str) -> Optional[StageStats]:
+        return self._stages.get(stage)
+
+    def stages(self) -> List[StageStats]:
+        order = {name: i for i, name in enumerate(QueryStats.STAGES)}
+        return sorted(self._stages.values(), key=lambda s: order.get(s.name, len(order)))
+
+    def total_seconds(self) -> float:
+        return sum(s.seconds for s in self._stages.values())
+
+    def to_table(self) -> DataTable:
+        table = DataTable(['Stage', 'Seconds', 'Rows', 'Bytes', 'Rows/sec'])
+        for s in self.stages():
+            rate = s.rows_per_sec()
+            table.append([s.name, round(s.seconds, 6), s.rows, s.nbytes, None if rate is None else int(rate)])
+        table.append(['total', round(self.total_seconds(), 6), None, None, None])
+        return table
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'stages': [s.to_dict() for s in self.stages()],
+            'total_seconds': self.total_seconds(),
+        }
+
+_shared_ids = itertools.count()
 
+# With `shared=True` the database is a named shared-cache in-memory database,
+# so that other connections (see `reader()`) can query it concurrently.
+# `cached_statements` sizes the connection's prepared statement cache
+# (keyed by SQL text), which makes repeated parameterized queries cheap.
+# The SQL function library of `bench.sqlfunctions` is registered on every
+# connection unless `functions=False`.
+# With `on_disk=True` the database lives in a temporary file instead (for
+# inputs larger than memory), using at most `cache_bytes` of page cache;
+# the file is removed by `close()` or at exit.
 class InMemoryDb:
-    def __init__(self, tables: Dict[str, DataTable]):
-        self._conn = sqlite3.connect(':memory:')
+    # Rough memory use of a loaded table per byte of CSV input
+    MEMORY_PER_INPUT_BYTE = 2
+
+    def __init__(self, tables: Dict[str, DataTable], shared: bool = False, cached_statements: int = 128,
+                 functions: bool = True, on_disk: bool = False, cache_bytes: Optional[int] = None):
+        self._tmpdir = None
+        if on_disk:
+            import atexit
+            import shutil
+            import tempfile
+            import urllib.parse
+            self._tmpdir = tempfile.mkdtemp(prefix='textquery-')
+            atexit.register(shutil.rmtree, self._tmpdir, True)
+            path = os.path.join(self._tmpdir, 'spill.db')
+            self._uri = f'file:{urllib.parse.quote(path)}'
+            self._conn = sqlite3.connect(self._uri, uri=True, check_same_thread=False,
+                                         cached_statements=cached_statements)
+            self._configure_spill(cache_bytes)
+        elif shared:
+            # A counter rather than id(self): ids are reused while readers of
+            # an earlier database may still keep it alive
+            self._uri = f'file:textquery-{os.getpid()}-{next(_shared_ids)}?mode=memory&cache=shared'
+            self._conn = sqlite3.connect(self._uri, uri=True, check_same_thread=False,
+                                         cached_statements=cached_statements)
+        else:
+            self._uri = None
+            self._conn = sqlite3.connect(':memory:', cached_statements=cached_statements)
         self._cursor = self._conn.cursor()
+        self.stats = QueryStats()
+        self._functions: List[Callable[[sqlite3.Connection], None]] = []
+        if functions:
+            from bench import sqlfunctions
+            sqlfunctions.register(self)
         self._create_tables(tables)
 
+    def reader(self) -> sqlite3.Connection:
+        """Opens an additional read-only connection (shared databases only)"""
+        if self._uri is None:
+            raise ValueError("Reader connections need a database created with shared=True")
+        uri = f'{self._uri}?mode=ro' if self._tmpdir else self._uri
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn.execute('PRAGMA query_only = ON;')
+        for install in self._functions:
+            install(conn)
+        return conn
+
+    def _configure_spill(self, cache_bytes: Optional[int]):
+        # The file is scratch space: no journal or syncing, since nothing
+        # needs to survive a crash. Sorts and temp b-trees spill to files too.
+        self._conn.execute('PRAGMA journal_mode = OFF;')
+        self._conn.execute('PRAGMA synchronous = OFF;')
+        self._conn.execute('PRAGMA temp_store = FILE;')
+        if cache_bytes:
+            # Negative cache_size is in KiB
+            self._conn.execute(f'PRAGMA cache_size = -{max(1, cache_bytes >> 10)};')
+
+    def register_function(self, name: str, fn: Callable, narg: int = -1, deterministic: bool = True):
+        """
+        Makes a Python function callable from SQL (on this db's connection and
+        readers opened later). Deterministic functions may be used by SQLite in
+        indexes and have repeated calls factored out.
+        """
+        def install(conn):
+            conn.create_function(name, narg, fn, deterministic=deterministic)
+        install(self._conn)
+        self._functions.append(install)
+
+    def register_aggregate(self, name: str, aggregate_class: type, narg: int = -1):
+        """Registers an aggregate: a class with step(*values) and finalize()"""
+        def install(conn):
+            conn.create_aggregate(name, narg, aggregate_class)
+        install(self._conn)
+        self._functions.append(install)
+
     def _create_tables(self, tables: Dict[str, DataTable]):
         for table_name, table in tables.items():
-            types = [t.name for t in TypeInferer.infer(table)]
-
-            columns = [f'"{name}" {col_type}' for name, col_type in zip(table.cols(), types)]
-            create_stmt = f'CREATE TABLE "{table_name}" ({", ".join(columns)});'
-            self._cursor.execute(create_stmt)
-
-            # Insert data
-            placeholders = ', '.join('?' * table.ncols())
-            insert_stmt = f'INSERT INTO "{table_name}" VALUES ({placeholders});'
-            for row in table.data():
-                self._cursor.execute(insert_stmt, row)
-        
+            self.add_table(table_name, table)
+
+    def add_table(self, table_name: str, table: DataTable, types: Optional[List["SQLiteType"]] = None):
+        """Creates and fills a table. `types` can be passed if already inferred."""
+        if types is None:
+            with self.stats.timed('infer', rows=table.size()):
+                types = TypeInferer.infer(table)
+        self.add_rows(table_name, table.cols(), table.data(), types)
+
+    def add_rows(self, table_name: str, cols: List[str], rows: List[List[Primitive]], types: List["SQLiteType"]):
+        """Creates and fills a table from already converted rows"""
+        with self.stats.timed('insert', rows=len(rows)):
+            _create_table(self._cursor, table_name, cols, types)
+            self._cursor.executemany(_insert_stmt(table_name, len(cols)), rows)
+            self._conn.commit()
+
+    def load_csv(self, table_name: str, stream: Union[BinaryIO, TextIO], **options) -> int:
+        """
+        Streams CSV content straight into a new table (see `CsvIngest`).
+        Returns the number of rows loaded.
+        """
+        return CsvIngest(self._conn, table_name, stats=self.stats, **options).load(stream)
+
+    def drop_table(self, table_name: str):
+        self._cursor.execute(f'DROP TABLE IF EXISTS "{table_name}";')
         self._conn.commit()
 
-    def query(self, sql: str) -> DataTable:
+    def query(self, sql: str, conn: Optional[sqlite3.Connection] = None,
+              stats: Optional[QueryStats] = None, params: Sequence = ()) -> DataTable:
+        """
+        Runs `sql` (with `?` / `:name` placeholders bound from `params`),
+        by default on the db's own connection and stats
+        """
+        cursor = self._cursor if conn is None else conn.cursor()
+        stats = self.stats if stats is None else stats
+        start = time.perf_counter()
+        cursor.execute(sql, params)
+        return _fetch_result(cursor, stats, start)
+
+    def execute(self, sql: str, stats: Optional[QueryStats] = None) -> Tuple[Optional[DataTable], int]:
+        """
+        Runs a statement of any kind on the db's own connection: returns
+        (result, -1) for one with a result set, like `query`, or (None, rows
+        changed) for one without (DDL, DML), which is committed. The count
+        is -1 for statements that change no rows (e.g. CREATE TABLE).
+        """
+        stats = self.stats if stats is None else stats
+        start = time.perf_counter()
         self._cursor.execute(sql)
-        headers = [desc[0] for desc in self._cursor.description]
-        rows = self._cursor.fetchall()
+        if self._cursor.description is not None:
+            return _fetch_result(self._cursor, stats, start), -1
+        self._conn.commit()
+        stats.add('query', time.perf_counter() - start, rows=0)
+        return None, self._cursor.rowcount
 
-        result = DataTable(headers)
-        for row in rows:
-            result.append(list(row))
+    def query_columns(self, sql: str, conn: Optional[sqlite3.Connection] = None,
+                      stats: Optional[QueryStats] = None, params: Sequence = (),
+                      numpy: Optional[bool] = None, batch_size: int = 10000) -> Dict[str, Column]:
+        """
+        Runs `sql` like `query`, but returns the result by column name:
+        int64 / float64 arrays for columns holding only integers / numbers,
+        lists for anything else (text, blobs, NULLs). Arrays are NumPy arrays
+        (sharing the `array` buffer) if `numpy` is True, or by default if
+        NumPy is installed; `array.array` otherwise.
+        """
+        cursor = self._cursor if conn is None else conn.cursor()
+        stats = self.stats if stats is None else stats
+        start = time.perf_counter()
+        cursor.execute(sql, params)
+        headers = [desc[0] for desc in cursor.description]
+        if len(set(headers)) != len(headers):
+            raise ValueError(f"Duplicate result columns (use aliases): {headers}")
+        columns: List[Column] = [array('q') for _ in headers]
+        nrows = 0
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            nrows += len(batch)
+            for i, values in enumerate(zip(*batch)):
+                columns[i] = _extend_column(columns[i], values)
+        if numpy is not False:
+            columns = _to_numpy(columns, required=numpy is True)
+        stats.add('query', time.perf_counter() - start, rows=nrows)
+        return dict(zip(headers, columns))
+
+    def query_many(self, queries: List[str], max_workers: int = 4) -> List[DataTable]:
+        """
+        Runs queries concurrently, each worker thread on its own read-only
+        connection (shared databases only). Results are in submission order.
+        """
+        if self._uri is None:
+            raise ValueError("Concurrent queries need a database created with shared=True")
+        local = threading.local()
+        readers = []
+        lock = threading.Lock()
+
+        def run(sql):
+            conn = getattr(local, 'conn', None)
+            if conn is None:
+                conn = local.conn = self.reader()
+                with lock:
+                    readers.append(conn)
+            stats = QueryStats()
+            return self.query(sql, conn=conn, stats=stats), stats
+
+        from concurrent.futures import ThreadPoolExecutor
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                results = list(pool.map(run, queries))
+        finally:
+            for conn in readers:
+                conn.close()
+        for _, stats in results:
+            self.stats.merge(stats)
+        return [result for result, _ in results]
+
+    def explain(self, sql: str, conn: Optional[sqlite3.Connection] = None) -> DataTable:
+        """Returns SQLite's query plan (EXPLAIN QUERY PLAN) for `sql`"""
+        cursor = self._cursor if conn is None else conn.cursor()
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        result = DataTable(['id', 'parent', 'detail'])
+        for row in cursor.fetchall():
+            result.append([row[0], row[1], row[3]])
         return result
 
     def close(self):
         self._conn.close()
+        tmpdir = getattr(self, '_tmpdir', None)
+        if tmpdir is not None:
+            import shutil
+            shutil.rmtree(tmpdir, ignore_errors=True)
+            self._tmpdir = None
 
     def __del__(self):
         try:
@@ -90,17 +365,759 @@ class TypeInferer:
 
     @classmethod
     def infer(cls, table) -> List[SQLiteType]:
-        inferred: List[Optional[SQLiteType]] = [None] * table.ncols()
+        return cls.infer_rows(table.data(), table.ncols())
+
+    @classmethod
+    def infer_rows(cls, rows: Iterable[List[Primitive]], ncols: int) -> List[SQLiteType]:
+        inferred: List[Optional[SQLiteType]] = [None] * ncols
 
-        for row in table.data():
+        for row in rows:
             for i, value in enumerate(row):
                 val_type = cls.value_to_type(value)
                 inferred[i] = cls.promote(inferred[i], val_type)
 
         return [t if t is not None else SQLiteType.TEXT for t in inferred]
 
+    # Date-bearing strings of the formats TimeParser accepts; bare years,
+    # year-months and epochs are left to the numeric and text rules
+    TIMESTAMP_SHAPE = re.compile(r'\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}:\d{2}(\.\d+)?([+-]\d{2}:?\d{2}|Z)?)?$')
+
+    @classmethod
+    def to_epoch(cls, value: Primitive) -> Optional[Primitive]:
+        """Epoch seconds of a timestamp string (naive ones in UTC), or None"""
+        if not isinstance(value, str) or not cls.TIMESTAMP_SHAPE.match(value):
+            return None
+        from bench.sqlfunctions import ts_epoch
+        return ts_epoch(value)
+
+    @classmethod
+    def timestamp_columns(cls, rows: Iterable[List[Primitive]], types: List[SQLiteType]) -> List[int]:
+        """Indices of TEXT columns whose non-empty values all are timestamps"""
+        candidates = {i for i, t in enumerate(types) if t is SQLiteType.TEXT}
+        seen = set()
+        for row in rows:
+            for i in list(candidates):
+                value = row[i]
+                if value is None or value == '':
+                    continue
+                if cls.to_epoch(value) is None:
+                    candidates.discard(i)
+                else:
+                    seen.add(i)
+        return sorted(candidates & seen)
+
+def _extend_column(column: Column, values: Sequence[Primitive]) -> Column:
+    # Columns start as int64 arrays and are demoted to float64 arrays, then
+    # to lists, by the first batch holding a value the current kind rejects.
+    # array.extend copies a tuple of ints / floats in one C loop.
+    if isinstance(column, array):
+        size = len(column)
+        try:
+            column.extend(values)
+            return column
+        except TypeError:
+            del column[size:]  # Values added before the failing one
+        if column.typecode == 'q' and all(isinstance(v, (int, float)) for v in values):
+            column = array('d', column)
+            column.extend(values)
+            return column
+        column = column.tolist()
+    column.extend(values)
+    return column
+
+def _to_numpy(columns: List[Column], required: bool) -> List[Column]:
+    try:
+        import numpy as np
+    except ImportError:
+        if required:
+            raise
+        return columns
+    dtypes = {'q': np.int64, 'd': np.float64}
+    return [np.frombuffer(c, dtype=dtypes[c.typecode]) if isinstance(c, array) else c for c in columns]
+
+def _fetch_result(cursor: sqlite3.Cursor, stats: QueryStats, start: float) -> DataTable:
+    """Fetches the result set of an executed query, adding its time since `start` to `stats`"""
+    headers = [desc[0] for desc in cursor.description]
+    rows = cursor.fetchall()
+
+    result = DataTable(headers)
+    for row in rows:
+        result.append(list(row))
+    stats.add('query', time.perf_counter() - start, rows=len(rows))
+    return result
+
+def _create_table(cursor: sqlite3.Cursor, table_name: str, cols: List[str], types: List[SQLiteType]):
+    columns = [f'"{name}" {t.name}' for name, t in zip(cols, types)]
+    cursor.execute(f'CREATE TABLE "{table_name}" ({", ".join(columns)});')
+
+def _insert_stmt(table_name: str, ncols: int) -> str:
+    placeholders = ', '.join('?' * ncols)
+    return f'INSERT INTO "{table_name}" VALUES ({placeholders});'
+
+def _iter_lines(stream: Union[BinaryIO, TextIO], chunk_size: int = 1 << 20,
+                stats: Optional[QueryStats] = None) -> Iterator[str]:
+    """
+    Yields newline-terminated lines from a binary (utf-8) or text stream,
+    reading it in large chunks. The last line may lack the terminator.
+    Read time and size are recorded as the 'read' stage in `stats`.
+    """
+    carry = None
+    while True:
+        start = time.perf_counter()
+        chunk = stream.read(chunk_size)
+        if stats is not None:
+            stats.add('read', time.perf_counter() - start, nbytes=len(chunk))
+        if not chunk:
+            break
+        if carry:
+            chunk = carry + chunk
+        binary = isinstance(chunk, bytes)
+        nl = b'\n' if binary else '\n'
+        lines = chunk.split(nl)
+        carry = lines.pop()
+        for line in lines:
+            yield (line.decode('utf-8') if binary else line) + '\n'
+    if carry:
+        yield carry.decode('utf-8') if isinstance(carry, bytes) else carry
+
+def _read_header(reader) -> List[str]:
+    header = next(reader, None)
+    if header is None:
+        raise ValueError("CSV input is empty, header expected")
+    cols = [f.strip() for f in header]
+    if len(set(cols)) != len(cols):
+        raise ValueError(f"Duplicate columns in header: {cols}")
+    return cols
+
+def _convert_records(records: Iterable[List[str]], cols: List[str],
+                     parse_types: bool, trim_spaces: bool) -> List[List[Primitive]]:
+    ncols = len(cols)
+    parse_value = Parser.parse_value
+    rows = []
+    for record in records:
+        if not record:
+            continue  # blank line
+        if len(record) != ncols:
+            raise ValueError(f"Row length of {record} does not match number of columns (headers: {cols}).")
+        if trim_spaces:
+            record = [field.strip() for field in record]
+        rows.append([parse_value(field, parse_types=parse_types) for field in record])
+    return rows
+
+def _timed_convert(records: Iterable[List[str]], cols: List[str], parse_types: bool,
+                   trim_spaces: bool, stats: QueryStats) -> List[List[Primitive]]:
+    # Reading is interleaved with parsing (records are pulled lazily),
+    # so the read time spent meanwhile is taken out of the 'parse' stage.
+    read = stats.get('read')
+    read_before = read.seconds if read else 0.0
+    start = time.perf_counter()
+    rows = _convert_records(records, cols, parse_types, trim_spaces)
+    read = stats.get('read')
+    read_during = (read.seconds if read else 0.0) - read_before
+    stats.add('parse', time.perf_counter() - start - read_during, rows=len(rows))
+    return rows
+
+class CsvIngest:
+    """
+    Streams CSV records into a new SQLite table without building a DataTable.
+
+    Column types are sniffed from the first `sample_size` records. Every
+    following batch is converted once and inserted with executemany. A value
+    that does not fit its column's type (by `TypeInferer` promotion rules)
+    widens the column in place, keeping the rows loaded so far.
+
+    Options:
+    - parse_types: parse values into int/float/bool/None (default: True)
+    - trim_spaces: strip spaces around fields
+    - sample_size, batch_size: number of records per step
+    - as_epoch: store columns whose sampled values all are timestamps (see
+      `TypeInferer.timestamp_columns`) as indexed epoch seconds, with the
+      original text in a `<column>_text` column next to it. Values that do
+      not parse get a NULL epoch.
+    - stats: QueryStats receiving read/parse/infer/insert timings
+    """
+
+    EPOCH_TEXT_SUFFIX = '_text'
+
+    def __init__(self, conn: sqlite3.Connection, table_name: str, parse_types: bool = True,
+                 trim_spaces: bool = False, sample_size: int = 1000, batch_size: int = 10000,
+                 as_epoch: bool = False, stats: Optional[QueryStats] = None):
+        self._conn = conn
+        self._cursor = conn.cursor()
+        self.table_name = table_name
+        self.parse_types = parse_types
+        self.trim_spaces = trim_spaces
+        self.sample_size = sample_size
+        self.batch_size = batch_size
+        self.as_epoch = as_epoch
+        self.source_cols: List[str] = []  # As in the CSV header
+        self.cols: List[str] = []  # As stored, with epoch companions
+        self.types: List[SQLiteType] = []
+        self.epoch_cols: List[int] = []  # Source indices stored as epochs
+        self.rows = 0
+        self.stats = stats if stats is not None else QueryStats()
+
+    def load(self, stream: Union[BinaryIO, TextIO]) -> int:
+        reader = csv.reader(_iter_lines(stream, stats=self.stats))
+        self.source_cols = _read_header(reader)
+
+        sample = _timed_convert(itertools.islice(reader, self.sample_size), self.source_cols,
+                                self.parse_types, self.trim_spaces, self.stats)
+        with self.stats.timed('infer', rows=len(sample)):
+            types = TypeInferer.infer_rows(sample, len(self.source_cols))
+        self._create(types, sample)
+        self._insert(self._with_epochs(sample))
+        self._load_batches(reader)
+        self._create_indexes()
+        return self.rows
+
+    def create(self, cols: List[str], types: List[SQLiteType], sample: Sequence[List[Primitive]] = ()):
+        """
+        Creates the table for rows converted elsewhere (see `add`); with
+        `as_epoch`, timestamp columns are detected in `sample`
+        """
+        self.source_cols = list(cols)
+        self._create(types, sample)
+        self._create_indexes()
+
+    def add(self, rows: List[List[Primitive]]) -> int:
+        """Inserts converted rows (in source column order), widening columns as needed"""
+        rows = self._with_epochs(rows)
+        with self.stats.timed('infer', rows=len(rows)):
+            self._check_types(rows)
+        self._insert(rows)
+        with self.stats.timed('insert'):
+            self._conn.commit()
+        return len(rows)
+
+    def _create(self, types: List[SQLiteType], sample: Sequence[List[Primitive]]):
+        self.epoch_cols = []
+        if self.as_epoch:
+            with self.stats.timed('infer', rows=len(sample)):
+                self.epoch_cols = TypeInferer.timestamp_columns(sample, types)
+        self.cols, self.types = [], []
+        for i, (col, col_type) in enumerate(zip(self.source_cols, types)):
+            if i in self.epoch_cols:
+                fractional = any(isinstance(TypeInferer.to_epoch(row[i]), float) for row in sample)
+                self.cols += [col, col + CsvIngest.EPOCH_TEXT_SUFFIX]
+                self.types += [SQLiteType.REAL if fractional else SQLiteType.INTEGER, SQLiteType.TEXT]
+            else:
+                self.cols.append(col)
+                self.types.append(col_type)
+        _create_table(self._cursor, self.table_name, self.cols, self.types)
+
+    def _with_epochs(self, rows: List[List[Primitive]]) -> List[List[Primitive]]:
+        # Source rows -> stored rows: each timestamp is preceded by its epoch
+        if not self.epoch_cols:
+            return rows
+        to_epoch = TypeInferer.to_epoch
+        epoch_cols = set(self.epoch_cols)
+        start = time.perf_counter()
+        result = []
+        for row in rows:
+            stored = []
+            for i, value in enumerate(row):
+                if i in epoch_cols:
+                    stored.append(to_epoch(value))
+                stored.append(value)
+            result.append(stored)
+        self.stats.add('parse', time.perf_counter() - start)
+        return result
+
+    def _epoch_positions(self) -> List[int]:
+        positions = []
+        stored = 0
+        for i in range(len(self.source_cols)):
+            if i in self.epoch_cols:
+                positions.append(stored)
+                stored += 1
+            stored += 1
+        return positions
+
+    def _create_indexes(self):
+        for pos in self._epoch_positions():
+            col = self.cols[pos]
+            self._cursor.execute(f'CREATE INDEX IF NOT EXISTS "{self.table_name}__{col}" '
+                                 f'ON "{self.table_name}" ("{col}");')
+
+    def append(self, stream: Union[BinaryIO, TextIO]) -> int:
+        """
+        Ingests more records (without header) into the table created by
+        `load`. Returns the number of rows added.
+        """
+        before = self.rows
+        self._load_batches(csv.reader(_iter_lines(stream, stats=self.stats)))
+        return self.rows - before
+
+    def _load_batches(self, reader):
+        while True:
+            batch = self._convert(itertools.islice(reader, self.batch_size))
+            if not batch:
+                break
+            with self.stats.timed('infer', rows=len(batch)):
+                self._check_types(batch)
+            self._insert(batch)
+
+        with self.stats.timed('insert'):
+            self._conn.commit()
+
+    def _convert(self, records: Iterable[List[str]]) -> List[List[Primitive]]:
+        rows = _timed_convert(records, self.source_cols, self.parse_types, self.trim_spaces, self.stats)
+        return self._with_epochs(rows)
+
+    def _insert(self, rows: List[List[Primitive]]):
+        with self.stats.timed('insert', rows=len(rows)):
+            self._cursor.executemany(_insert_stmt(self.table_name, len(self.cols)), rows)
+        self.rows += len(rows)
+
+    def _check_types(self, rows: List[List[Primitive]]):
+        widened = list(self.types)
+        epochs = set(self._epoch_positions())
+        for i, current in enumerate(self.types):
+            if current is SQLiteType.TEXT:
+                continue  # nothing wider
+            for row in rows:
+                if i in epochs and row[i] is None:
+                    continue  # NULL epoch of an unparsed value
+                widened[i] = TypeInferer.promote(widened[i], TypeInferer.value_to_type(row[i]))
+        if widened != self.types:
+            self._widen(widened)
+
+    def _widen(self, types: List[SQLiteType]):
+        # Rebuild the table with the wider declared types; SQLite applies the
+        # new column affinity to the copied values (e.g. 1 -> 1.0, 2.5 -> '2.5').
+        # rowids are kept so that row order (and ranges) survive.
+        old_name = f'{self.table_name}__widen'
+        cols = ', '.join(f'"{c}"' for c in self.cols)
+        self._cursor.execute(f'ALTER TABLE "{self.table_name}" RENAME TO "{old_name}";')
+        _create_table(self._cursor, self.table_name, self.cols, types)
+        self._cursor.execute(f'INSERT INTO "{self.table_name}" (rowid, {cols}) SELECT rowid, {cols} FROM "{old_name}";')
+        self._cursor.execute(f'DROP TABLE "{old_name}";')
+        self.types = types
+        self._create_indexes()  # Dropped with the old table
+
+def _read_csv_rows(path: str, parse_types: bool,
+                   trim_spaces: bool = False) -> Tuple[List[str], List[List[Primitive]], List[SQLiteType], QueryStats]:
+    # Worker side of `load_csv_files` and `CsvGlobSource`: same conversion
+    # as `CsvIngest`, with types inferred over the complete file.
+    stats = QueryStats()
+    with open(path, 'rb') as f:
+        reader = csv.reader(_iter_lines(f, stats=stats))
+        cols = _read_header(reader)
+        rows = _timed_convert(reader, cols, parse_types, trim_spaces, stats)
+    with stats.timed('infer', rows=len(rows)):
+        types = TypeInferer.infer_rows(rows, len(cols))
+    return cols, rows, types, stats
+
+def load_csv_files(db: InMemoryDb, paths: Dict[str, str], parse_types: bool = False,
+                   max_workers: Optional[int] = None, as_epoch: bool = False):
+    """
+    Loads CSV files into `db` without going through DataTable.
+    A single file (or max_workers=1) is streamed with `InMemoryDb.load_csv`;
+    otherwise files are parsed in a process pool and inserted as they finish.
+    `as_epoch` is passed on to `CsvIngest`.
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = min(max_workers, len(paths))
+    if max_workers <= 1:
+        for name, path in paths.items():
+            with open(path, 'rb') as f:
+                db.load_csv(name, f, parse_types=parse_types, as_epoch=as_epoch)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(_read_csv_rows, path, parse_types): name for name, path in paths.items()}
+        for future in as_completed(futures):
+            cols, rows, types, stats = future.result()
+            db.stats.merge(stats)
+            if as_epoch:
+                ingest = CsvIngest(db._conn, futures[future], parse_types=parse_types, as_epoch=True, stats=db.stats)
+                ingest.create(cols, types, rows[:ingest.sample_size])
+                ingest.add(rows)
+            else:
+                db.add_rows(futures[future], cols, rows, types)
+
+def input_size(paths: Iterable[str], stream: Optional[BinaryIO] = None) -> Optional[int]:
+    """Total bytes of the input files and `stream`, or None if unknown (a pipe)"""
+    total = sum(os.path.getsize(path) for path in paths)
+    if stream is None:
+        return total
+    if isinstance(stream, io.BytesIO):
+        return total + stream.getbuffer().nbytes
+    try:
+        st = os.fstat(stream.fileno())
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+    if not stat.S_ISREG(st.st_mode):
+        return None
+    return total + st.st_size - stream.tell()
+
+# Parsed rows held in worker results are much larger than their CSV text
+PARALLEL_MEMORY_PER_INPUT_BYTE = 10
+
+def plan_memory(input_bytes: Optional[int], max_memory: Optional[int]) -> Tuple[bool, bool]:
+    """
+    Decides how to load input of `input_bytes` (None: unknown) within a
+    budget of `max_memory` bytes. Returns (on_disk, parallel): whether to
+    spill the database to a temporary file, and whether files may be parsed
+    in a process pool rather than streamed one at a time.
+    """
+    if max_memory is None:
+        return False, True
+    if input_bytes is None or input_bytes * InMemoryDb.MEMORY_PER_INPUT_BYTE > max_memory:
+        return True, False
+    return False, input_bytes * PARALLEL_MEMORY_PER_INPUT_BYTE <= max_memory
+
+def open_db(input_bytes: Optional[int], max_memory: Optional[int], shared: bool = False) -> Tuple[InMemoryDb, bool]:
+    """Creates the database for `plan_memory`; returns it and whether parallel parsing fits"""
+    on_disk, parallel = plan_memory(input_bytes, max_memory)
+    # Half the budget for the page cache, the rest for Python and sorting
+    db = InMemoryDb({}, shared=shared, on_disk=on_disk, cache_bytes=max_memory // 2 if on_disk else None)
+    return db, parallel
+
+class CsvFileSource:
+    """
+    A CSV file loaded into a table of an InMemoryDb and kept in sync with it.
+
+    `refresh` ingests complete records appended since the last load. A
+    truncated, rotated (new inode) or rewritten file, or one whose last
+    loaded line was unterminated, is reloaded from scratch instead.
+    Options are passed on to `CsvIngest`.
+    """
+
+    # Bytes before the loaded offset that must be unchanged for an append
+    TAIL_SIZE = 64
+
+    def __init__(self, table_name: str, path: str, **options):
+        self.table_name = table_name
+        self.path = path
+        self.options = options
+        self.offset = 0
+        self._ident = None
+        self._mtime = None
+        self._tail = b''
+        self._ingest: Optional[CsvIngest] = None
+
+    def load(self, db: InMemoryDb) -> int:
+        db.drop_table(self.table_name)
+        with open(self.path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            ingest = CsvIngest(db._conn, self.table_name, stats=db.stats, **self.options)
+            rows = ingest.load(f)
+            self.offset = f.tell()
+        self._ident = (st.st_dev, st.st_ino)
+        self._mtime = st.st_mtime_ns
+        self._tail = self._read_tail()
+        self._ingest = ingest
+        return rows
+
+    def refresh(self, db: InMemoryDb) -> Optional[int]:
+        """Returns the number of rows (re)loaded, or None if nothing changed"""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None  # Mid-rotation, keep serving what is loaded
+        if (st.st_dev, st.st_ino) != self._ident or st.st_size < self.offset:
+            return self.load(db)
+        if st.st_size == self.offset and st.st_mtime_ns == self._mtime:
+            return None
+        if self._read_tail() != self._tail or not self._tail.endswith(b'\n'):
+            return self.load(db)
+
+        self._mtime = st.st_mtime_ns
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read(st.st_size - self.offset)
+        # Only complete records; a partial last line is picked up next time
+        end = data.rfind(b'\n') + 1
+        if end == 0:
+            return None
+        rows = self._ingest.append(io.BytesIO(data[:end]))
+        self.offset += end
+        self._tail = (self._tail + data[:end])[-CsvFileSource.TAIL_SIZE:]
+        return rows
+
+    def _read_tail(self) -> bytes:
+        start = max(0, self.offset - CsvFileSource.TAIL_SIZE)
+        with open(self.path, 'rb') as f:
+            f.seek(start)
+            return f.read(self.offset - start)
+
+def expand_csv_files(spec: str) -> List[str]:
+    """Files of a table spec: the CSV files of a directory, or a glob pattern's matches"""
+    if os.path.isdir(spec):
+        spec = os.path.join(spec, '*.csv')
+    return sorted(path for path in glob.glob(spec, recursive=True) if os.path.isfile(path))
+
+class CsvGlobSource:
+    """
+    The union of all CSV files matching a glob pattern (or in a directory),
+    loaded into one table of an InMemoryDb and kept in sync with them.
+
+    Files are parsed in parallel worker processes (`max_workers`, default:
+    CPU count) and inserted in path order as they become ready. All files
+    must have the columns of the first one, in any order. With
+    `source_column=True`, a `_source_file` column holds each row's path.
+
+    `refresh` only parses files that are new or whose fingerprint (inode,
+    size, mtime) changed; the rows of changed or removed files are deleted
+    by their rowid range. Other options are passed on to `CsvIngest`.
+    """
+
+    SOURCE_COLUMN = '_source_file'
+
+    def __init__(self, table_name: str, pattern: str, source_column: bool = False,
+                 max_workers: Optional[int] = None, **options):
+        self.table_name = table_name
+        self.pattern = pattern
+        self.source_column = source_column
+        self.max_workers = max_workers
+        self.options = options
+        # path -> (fingerprint, first rowid, last rowid)
+        self._loaded: Dict[str, Tuple[str, int, int]] = {}
+        self._ingest: Optional[CsvIngest] = None
+
+    def files(self) -> List[str]:
+        return expand_csv_files(self.pattern)
+
+    def load(self, db: InMemoryDb) -> int:
+        db.drop_table(self.table_name)
+        self._loaded = {}
+        self._ingest = None
+        rows = self.refresh(db)
+        if self._ingest is None:
+            raise ValueError(f"No CSV files match '{self.pattern}'")
+        return rows or 0
+
+    def refresh(self, db: InMemoryDb) -> Optional[int]:
+        """Returns the number of rows deleted and inserted, or None if nothing changed"""
+        from bench.resultcache import file_fingerprint
+
+        current = {}
+        for path in self.files():
+            try:
+                current[path] = file_fingerprint(path)
+            except FileNotFoundError:
+                continue
+        stale = [path for path, loaded in self._loaded.items() if current.get(path) != loaded[0]]
+        pending = [path for path in current if path not in self._loaded or path in stale]
+        if not stale and not pending:
+            return None
+
+        rows = 0
+        for path in stale:
+            _, first, last = self._loaded.pop(path)
+            cursor = db._conn.execute(f'DELETE FROM "{self.table_name}" WHERE rowid BETWEEN ? AND ?;',
+                                      (first, last))
+            rows += cursor.rowcount
+        db._conn.commit()
+        for path, (cols, file_rows, types, stats) in zip(pending, self._parse(pending)):
+            db.stats.merge(stats)
+            rows += self._add(db, path, current[path], cols, file_rows, types)
+        return rows
+
+    def _parse(self, paths: List[str]) -> Iterator[Tuple[List[str], List[List[Primitive]], List[SQLiteType], QueryStats]]:
+        parse_types = self.options.get('parse_types', True)
+        trim_spaces = self.options.get('trim_spaces', False)
+        max_workers = min(self.max_workers or os.cpu_count() or 1, len(paths))
+        if max_workers <= 1:
+            for path in paths:
+                yield _read_csv_rows(path, parse_types, trim_spaces)
+            return
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            # map() keeps path order while later files are still parsing
+            yield from pool.map(_read_csv_rows, paths, itertools.repeat(parse_types),
+                                itertools.repeat(trim_spaces))
+
+    def _add(self, db: InMemoryDb, path: str, fingerprint: str, cols: List[str],
+             rows: List[List[Primitive]], types: List[SQLiteType]) -> int:
+        if self.source_column:
+            cols = cols + [CsvGlobSource.SOURCE_COLUMN]
+            types = types + [SQLiteType.TEXT]
+            rows = [row + [path] for row in rows]
+        if self._ingest is None:
+            self._ingest = CsvIngest(db._conn, self.table_name, stats=db.stats, **self.options)
+            self._ingest.create(cols, types, rows[:self._ingest.sample_size])
+        elif cols != self._ingest.source_cols:
+            if sorted(cols) != sorted(self._ingest.source_cols):
+                raise ValueError(f"Columns of '{path}' {cols} do not match those of table "
+                                 f"'{self.table_name}' {self._ingest.source_cols}")
+            order = [cols.index(c) for c in self._ingest.source_cols]
+            rows = [[row[i] for i in order] for row in rows]
+        first = db._conn.execute(f'SELECT coalesce(max(rowid), 0) + 1 FROM "{self.table_name}";').fetchone()[0]
+        added = self._ingest.add(rows)
+        self._loaded[path] = (fingerprint, first, first + added - 1)
+        return added
+
+def csv_source(table_name: str, spec: str, source_column: bool = False, max_workers: Optional[int] = None,
+               **options) -> Union[CsvFileSource, CsvGlobSource]:
+    """`CsvFileSource` for a single file, else `CsvGlobSource` (pattern or directory)"""
+    if os.path.isfile(spec) and not source_column:
+        return CsvFileSource(table_name, spec, **options)
+    return CsvGlobSource(table_name, spec, source_column=source_column, max_workers=max_workers, **options)
+
+def follow(db: InMemoryDb, sources: List[Union[CsvFileSource, CsvGlobSource]], interval: float,
+           stop: Optional[threading.Event] = None) -> Iterator[int]:
+    """
+    Loads `sources` into `db` and then polls them every `interval` seconds,
+    yielding the number of rows loaded initially and after each change
+    (see `CsvFileSource.refresh` and `CsvGlobSource.refresh`). Runs until
+    `stop` is set.
+    """
+    stop = stop if stop is not None else threading.Event()
+    yield sum(source.load(db) for source in sources)
+    while not stop.wait(interval):
+        changes = [source.refresh(db) for source in sources]
+        if any(rows is not None for rows in changes):
+            yield sum(rows or 0 for rows in changes)
+
+def render_result(table: DataTable, csv: bool = False, stats: Optional[QueryStats] = None) -> str:
+    """Renders a query result as markdown (default) or CSV, timed as 'render'"""
+    stats = stats if stats is not None else QueryStats()
+    with stats.timed('render', rows=table.size()):
+        output = CsvFormat.render(table) if csv else MdFormat.render(table)
+    stats.add('render', 0, nbytes=len(output))
+    return output
+
+def render_diagnostics(stats: Optional[QueryStats], plan: Optional[DataTable], as_json: bool = False) -> Optional[str]:
+    """Renders profile (`stats`) and/or query plan; None if both are None"""
+    if stats is None and plan is None:
+        return None
+    if as_json:
+        report = {}
+        if stats is not None:
+            report['profile'] = stats.to_dict()
+        if plan is not None:
+            report['plan'] = [plan.get(i) for i in range(plan.size())]
+        import json
+        return json.dumps(report, indent=2)
+    parts = []
+    if stats is not None:
+        parts.append(MdFormat.render(stats.to_table()))
+    if plan is not None:
+        parts.append(MdFormat.render(plan))
+    return '\n'.join(parts)
+
+class QuerySession:
+    """
+    Keeps the database loaded for each queried DataTable, and reuses it
+    as long as the table is unmodified (same `DataTable.version()`; tables
+    copy the rows they are given, so only their own methods modify them).
+    Repeated queries then only cost the SQL execution; parameterized
+    queries also reuse the prepared statement.
+
+    Databases are dropped with their tables (weak references) and are
+    read-only. A session must only be used from one thread.
+    """
+
+    def __init__(self, table_name: str = 't', cached_statements: int = 256):
+        self.table_name = table_name
+        self.cached_statements = cached_statements
+        self._dbs: "weakref.WeakKeyDictionary[DataTable, Tuple[int, InMemoryDb]]" = weakref.WeakKeyDictionary()
+
+    def db(self, table: DataTable) -> InMemoryDb:
+        """Returns a database holding the current content of `table`"""
+        entry = self._dbs.get(table)
+        if entry is not None and entry[0] == table.version():
+            return entry[1]
+        if entry is not None:
+            entry[1].close()
+        db = InMemoryDb({self.table_name: table}, cached_statements=self.cached_statements)
+        db._conn.execute('PRAGMA query_only = ON;')
+        self._dbs[table] = (table.version(), db)
+        return db
+
+    def query(self, table: DataTable, query: str, params: Sequence = ()) -> DataTable:
+        return self.db(table).query(query, params=params)
+
+    def query_columns(self, table: DataTable, query: str, params: Sequence = (), **options) -> Dict[str, Column]:
+        """Columnar result, see `InMemoryDb.query_columns`"""
+        return self.db(table).query_columns(query, params=params, **options)
+
+    def clear(self):
+        for _, db in self._dbs.values():
+            db.close()
+        self._dbs.clear()
+
+_sessions = threading.local()
+
+def parse_size(value: str) -> int:
+    """Parses a byte size such as '512', '64K', '100M' or '4G' (powers of 1024)"""
+    units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+    text = value.strip().upper().rstrip('B')
+    factor = 1
+    if text and text[-1] in units:
+        factor = units[text[-1]]
+        text = text[:-1]
+    try:
+        size = float(text) * factor
+    except ValueError:
+        raise ValueError(f"Invalid size: '{value}'")
+    if size < 0:
+        raise ValueError(f"Invalid size: '{value}'")
+    return int(size)
+
+def parse_duration(value: str) -> float:
+    """Parses a duration in seconds such as '5', '5s', '500ms', '2m' or '1h'"""
+    units = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+    text = value.strip().lower()
+    factor = 1
+    for unit in ('ms', 's', 'm', 'h'):
+        if text.endswith(unit):
+            factor = units[unit]
+            text = text[:-len(unit)]
+            break
+    try:
+        seconds = float(text) * factor
+    except ValueError:
+        raise ValueError(f"Invalid duration: '{value}'")
+    if seconds < 0:
+        raise ValueError(f"Invalid duration: '{value}'")
+    return seconds
+
+def split_statements(text: str) -> List[str]:
+    """Splits a script into complete SQL statements (without the ';')"""
+    def has_code(statement):
+        return any(line.strip() and not line.strip().startswith('--') for line in statement.split('\n'))
+
+    statements = []
+    current = ''
+    for part in text.split(';'):
+        current += part + ';'
+        if sqlite3.complete_statement(current):
+            statement = current.strip()[:-1].strip()
+            if has_code(statement):
+                statements.append(statement)
+            current = ''
+    rest = current[:-1].strip()
+    if has_code(rest):
+        statements.append(rest)
+    return statements
+
+def load_udfs(db: InMemoryDb, module_names: List[str]):
+    """
+    Imports each module (dotted path, also searched in the current directory)
+    and calls its `register(db)` to add user-defined SQL functions.
+    """
+    import importlib
+    import sys
+    if module_names and os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
+    for name in module_names:
+        module = importlib.import_module(name)
+        if not hasattr(module, 'register'):
+            raise ValueError(f"UDF module '{name}' has no register(db) function")
+        module.register(db)
+
 # Convenience method for querying of a single DataTable
 # The table is referred by default name 't'
-def quick_query (table: DataTable, query: str) -> DataTable:
-    return InMemoryDb({'t': table}).query(query)
+# The loaded database is cached per thread until the table is modified.
+def quick_query (table: DataTable, query: str, params: Sequence = ()) -> DataTable:
+    session = getattr(_sessions, 'session', None)
+    if session is None:
+        session = _sessions.session = QuerySession()
+    return session.query(table, query, params)
 
@@ -0,0 +1,251 @@
+import math
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple, Union
+
+from bench.data import DataTable, Primitive
+from bench.timestamp import TimeFields, TimeParser, _epoch_column_divisor
+from bench.tztable import zone_table
+
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_SECOND = timedelta(seconds=1)
+_DAY = 86400
+
+# Fixed intervals: a number and one of these units
+_INTERVAL = re.compile(r'(\d+)(s|m|h|d)')
+_INTERVAL_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': _DAY}
+
+# Calendar units, in wall-clock time of the bucket zone
+CALENDAR_UNITS = {
+    'second': 1,
+    'minute': 60,
+    'hour': 3600,
+    'day': _DAY,
+    'week': None,
+    'month': None,
+    'year': None,
+}
+
+# A `Bucketing` maps wall-clock times (seconds since 1970-01-01 00:00 in the
+# bucket zone) to the start of their bucket and gives the start of the next
+# one. Fixed intervals are aligned to multiples of the interval since
+# 1970-01-01 00:00 local time, so that e.g. '15m' buckets start at :00, :15, ...
+class Bucketing:
+
+    def __init__(self, every: str):
+        """
+        every: a fixed interval (e.g. '30s', '5m', '1h', '7d') or a calendar
+               unit (one of CALENDAR_UNITS)
+
+        Raises:
+            ValueError: If `every` is neither.
+        """
+        self.every = every
+        m = _INTERVAL.fullmatch(every)
+        if m:
+            self.step = int(m.group(1)) * _INTERVAL_UNITS[m.group(2)]
+            if self.step <= 0:
+                raise ValueError(f"Invalid interval: '{every}'")
+        elif every in CALENDAR_UNITS:
+            self.step = CALENDAR_UNITS[every]
+        else:
+            raise ValueError(f"Invalid interval: '{every}'. Expected e.g. 30s, 5m, 1h, 7d "
+                             f"or one of {', '.join(CALENDAR_UNITS)}")
+
+    def start(self, wall: int) -> int:
+        if self.step is not None:
+            return wall - wall % self.step
+        if self.every == 'week':
+            # 1970-01-01 was a Thursday; weeks start on Monday
+            return wall - (wall + 3 * _DAY) % (7 * _DAY)
+        date = _EPOCH + timedelta(seconds=wall)
+        start = datetime(date.year, date.month if self.every == 'month' else 1, 1)
+        return (start - _EPOCH) // _SECOND
+
+    def next(self, start: int) -> int:
+        if self.step is not None:
+            return start + self.step
+        if self.every == 'week':
+            return start + 7 * _DAY
+        date = _EPOCH + timedelta(seconds=start)
+        if self.every == 'month':
+            following = datetime(date.year + date.month // 12, date.month % 12 + 1, 1)
+        else:
+            following = datetime(date.year + 1, 1, 1)
+        return (following - _EPOCH) // _SECOND
+
+# An aggregate over the rows of a bucket, from a spec 'count', or
+# '<function>:<column>' with function one of FUNCTIONS. Nulls are ignored as
+# in SQL ('count:<column>' counts the non-null values).
+class Aggregate:
+    FUNCTIONS = ('count', 'sum', 'avg', 'min', 'max')
+
+    def __init__(self, spec: str, cols: List[str]):
+        function, _, col = spec.partition(':')
+        if function not in Aggregate.FUNCTIONS or (not col and function != 'count'):
+            raise ValueError(f"Invalid aggregate: '{spec}'. Expected count or "
+                             f"<{'|'.join(Aggregate.FUNCTIONS)}>:<column>")
+        if col and col not in cols:
+            raise ValueError(f"Unknown column: {col}")
+        self.function = function
+        self.index = cols.index(col) if col else None
+        self.name = f'{function}({col})' if col else 'count'
+
+    def initial(self):
+        if self.function == 'count':
+            return 0
+        return [0, 0] if self.function == 'avg' else None
+
+    def update(self, state, row: List[Primitive]):
+        if self.index is None:
+            return state + 1
+        value = row[self.index]
+        if value is None:
+            return state
+        if self.function == 'count':
+            return state + 1
+        value = _number(value)
+        if self.function == 'sum':
+            return value if state is None else state + value
+        if self.function == 'avg':
+            state[0] += value
+            state[1] += 1
+            return state
+        if state is None:
+            return value
+        return min(state, value) if self.function == 'min' else max(state, value)
+
+    def result(self, state) -> Primitive:
+        if self.function == 'avg':
+            return state[0] / state[1] if state[1] else None
+        return state
+
+def _number(value: Primitive) -> Union[int, float]:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Non-numeric value: '{value}'")
+
+def bucket_table(table: DataTable, col: Union[int, str], every: str, aggregates: Optional[List[str]] = None,
+                 by: Optional[List[str]] = None, tz_label: Optional[str] = None,
+                 source_tz_label: Optional[str] = None, fill: bool = False,
+                 errors: Optional[List[Primitive]] = None) -> DataTable:
+    """
+    Groups the rows of `table` into time buckets of column `col` and aggregates
+    each bucket, in a single pass over the rows (timestamps are parsed once,
+    buckets are kept in a hash table).
+
+    Args:
+        table: The input table.
+        col: Name or 0-based index of the time column; epochs (in the
+             precision detected for the whole column) or any input
+             `parse_time` accepts.
+        every: Bucket size, see Bucketing.
+        aggregates: Aggregate specs, see Aggregate (default: ['count']).
+        by: Columns to group by within each bucket.
+        tz_label: Zone of the bucket boundaries and labels (default: UTC).
+        source_tz_label: The timezone label to assume for naive datetime
+                         strings (default: `tz_label`).
+        fill: Whether to add empty buckets, with a count of 0 and null
+              aggregates, so that every group has all buckets between the
+              first and the last one of the whole table.
+        errors: If given, unparseable time values are appended to it. Rows
+                with null or unparseable times are skipped.
+
+    Returns:
+        A table with the bucket start ('bucket', formatted 'YYYY-MM-DD HH:MM:SS'
+        in the bucket zone), the `by` columns and the aggregates, ordered by
+        bucket and group.
+
+    Raises:
+        ValueError: If a column, interval, aggregate or timezone label is
+                    invalid, or a value to sum, average, etc. is not numeric.
+    """
+    cols = table.cols()
+    if col not in cols and not (isinstance(col, int) and 0 <= col < len(cols)):
+        raise ValueError(f"Unknown column: {col}")
+    index = col if isinstance(col, int) else cols.index(col)
+    by = list(by or [])
+    for name in by:
+        if name not in cols:
+            raise ValueError(f"Unknown column: {name}")
+    by_indices = [cols.index(name) for name in by]
+    aggs = [Aggregate(spec, cols) for spec in (aggregates or ['count'])]
+    bucketing = Bucketing(every)
+    tz_label = tz_label or TimeParser.DEFAULT_TZ
+    if tz_label not in TimeParser.LABEL_TO_PYTZ:
+        raise ValueError(f"Unknown timezone label: '{tz_label}'.")
+    zone = zone_table(TimeParser.LABEL_TO_PYTZ[tz_label])
+    fields = TimeFields(['input'], source_tz_label or tz_label)
+
+    rows = table.data()
+    divisor = _epoch_column_divisor([row[index] for row in rows])
+    transitions, offsets = zone.transitions, zone.offsets
+
+    groups: Dict[Tuple, list] = {}
+    # The offset and bucket of the previous row are reused while rows stay
+    # within them, so time-ordered input only looks them up at zone
+    # transitions and bucket changes
+    lo, hi, offset = 0, -1, 0
+    start, end = 0, -1
+    for row in rows:
+        value = row[index]
+        if value is None:
+            continue
+        try:
+            if divisor is not None:
+                epoch = math.floor(float(value) / divisor)
+            else:
+                epoch = (fields.parse(str(value)) - _EPOCH_UTC) // _SECOND
+        except (ValueError, OverflowError):
+            if errors is not None:
+                errors.append(value)
+            continue
+        if not lo <= epoch < hi:
+            i = zone.index(epoch)
+            lo = transitions[i] if i > 0 else -math.inf
+            hi = transitions[i + 1] if i + 1 < len(transitions) else math.inf
+            offset = offsets[i]
+        wall = epoch + offset
+        if not start <= wall < end:
+            start = bucketing.start(wall)
+            end = bucketing.next(start)
+        key = (start, *[row[i] for i in by_indices]) if by_indices else (start,)
+        states = groups.get(key)
+        if states is None:
+            states = groups[key] = [agg.initial() for agg in aggs]
+        for j, agg in enumerate(aggs):
+            states[j] = agg.update(states[j], row)
+
+    if fill and groups:
+        _fill(groups, bucketing, aggs)
+
+    result = DataTable(['bucket'] + by + [agg.name for agg in aggs])
+    for key in sorted(groups, key=_sort_key):
+        states = groups[key]
+        label = (_EPOCH + timedelta(seconds=key[0])).strftime("%Y-%m-%d %H:%M:%S")
+        result.append([label, *key[1:], *[agg.result(state) for agg, state in zip(aggs, states)]])
+    return result
+
+def _fill(groups: Dict[Tuple, list], bucketing: Bucketing, aggs: List[Aggregate]):
+    """Adds to every group the missing buckets between the first and last bucket of all groups"""
+    first = min(key[0] for key in groups)
+    last = max(key[0] for key in groups)
+    for group in {key[1:] for key in groups}:
+        start = first
+        while start <= last:
+            key = (start, *group)
+            if key not in groups:
+                groups[key] = [agg.initial() for agg in aggs]
+            start = bucketing.next(start)
+
+def _sort_key(key: Tuple) -> Tuple:
+    # Group values may mix types and nulls: order by type name first
+    return (key[0], *[(value is not None, type(value).__name__, value) for value in key[1:]])
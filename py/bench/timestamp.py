@@ -1,43 +1,82 @@
+import os
 import pytz
-from datetime import datetime, timezone
-from typing import Dict, Tuple
+import re
+from collections.abc import Mapping, Sequence
+from datetime import datetime, timedelta, timezone
+from functools import cached_property
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple, Union
 from typing import Optional
 
-from bench.data import DataTable
+from bench.data import DataTable, Primitive
+from bench.tztable import zone_table
 
 class TimeOutput:
+    """
+    A point in time with its epoch values and its formatted times in the zones
+    of `tz_map`. Zone conversions and format strings are computed on first
+    access and kept, so printing a single value costs a single `strftime`.
+    """
+
+    FORMATS = {
+        'standard': "%Y-%m-%d %H:%M:%S",
+        'micros': "%Y-%m-%d %H:%M:%S.%f",
+        'iso': "%Y-%m-%dT%H:%M:%S%z",
+    }
+
     def __init__(self, dt: datetime, tz_map: Dict[str, str]):
         """
         dt: tz-aware datetime (ideally UTC)
-        tz_list: list of timezone labels to output, e.g. ['UTC', 'IST', 'PST']
         tz_map: dict mapping labels to pytz timezone names, e.g. {'IST': 'Asia/Kolkata'}
         """
         if dt.tzinfo is None or dt.tzinfo.utcoffset(dt) is None:
             raise ValueError("datetime object must be timezone-aware")
 
-        # Normalize to UTC
-        dt_utc = dt.astimezone(pytz.UTC)
+        self._dt = dt
+        self._tz_map = tz_map
+        self._zone_times: Dict[str, datetime] = {}
+        self._formatted: Dict[Tuple[str, str], str] = {}
+
+        self.num_fmt = len(TimeOutput.FORMATS)
+        self.fmt_names = list(TimeOutput.FORMATS)
+        self.tz_times = _TzTimes(self)
 
-        timestamp = dt_utc.timestamp()
-        self.epoch_seconds = int(timestamp)
-        self.epoch_millis = int(timestamp * 1_000)
-        self.epoch_micros = int(timestamp * 1_000_000)
+    @cached_property
+    def _timestamp(self) -> float:
+        return self._dt.timestamp()
 
-        self.tz_times: Dict[str, Tuple[str, str, str]] = {}
+    @property
+    def epoch_seconds(self) -> int:
+        return int(self._timestamp)
 
-        fmt_lambdas = [
-                lambda d: ('standard', d.strftime("%Y-%m-%d %H:%M:%S")),
-                lambda d: ('micros', d.strftime("%Y-%m-%d %H:%M:%S.%f")),
-                lambda d: ('iso', d.strftime("%Y-%m-%dT%H:%M:%S%z")),
-        ]
-        self.num_fmt = len(fmt_lambdas)
-        self.fmt_names = [f(dt_utc)[0] for f in fmt_lambdas]
+    @property
+    def epoch_millis(self) -> int:
+        return int(self._timestamp * 1_000)
 
-        for key, pytz_name in tz_map.items():
-            tz = pytz.timezone(pytz_name)
-            dt_tz = dt_utc.astimezone(tz)
+    @property
+    def epoch_micros(self) -> int:
+        return int(self._timestamp * 1_000_000)
 
-            self.tz_times[key] = [f(dt_tz)[1] for f in fmt_lambdas]
+    def labels(self) -> List[str]:
+        return list(self._tz_map)
+
+    def zone_time(self, label: str) -> datetime:
+        """The time converted to the zone of `label`"""
+        dt = self._zone_times.get(label)
+        if dt is None:
+            tz = pytz.timezone(self._tz_map[label])
+            dt = self._zone_times[label] = self._dt.astimezone(tz)
+        return dt
+
+    def format(self, label: str, fmt_name: str) -> str:
+        """
+        The time in the zone of `label`, formatted as one of `FORMATS`
+        (e.g. format('UTC', 'standard'))
+        """
+        key = (label, fmt_name)
+        value = self._formatted.get(key)
+        if value is None:
+            value = self._formatted[key] = self.zone_time(label).strftime(TimeOutput.FORMATS[fmt_name])
+        return value
 
     def __repr__(self):
         return (
@@ -56,6 +95,137 @@ class TimeOutput:
             self.tz_times == other.tz_times
         )
 
+class _TzTimes(Mapping):
+    """Read-only view of a TimeOutput as {label: [time in each format]}"""
+
+    def __init__(self, output: TimeOutput):
+        self._output = output
+
+    def __getitem__(self, label: str) -> '_ZoneFormats':
+        if label not in self._output._tz_map:
+            raise KeyError(label)
+        return _ZoneFormats(self._output, label)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._output._tz_map)
+
+    def __len__(self) -> int:
+        return len(self._output._tz_map)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+class _ZoneFormats(Sequence):
+    """The time in one zone, indexed like TimeOutput.fmt_names"""
+
+    def __init__(self, output: TimeOutput, label: str):
+        self._output = output
+        self._label = label
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return self._output.format(self._label, self._output.fmt_names[index])
+
+    def __len__(self) -> int:
+        return self._output.num_fmt
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return repr(list(self))
+
+class ZoneRegistry(Mapping):
+    """
+    Timezone labels (e.g. 'IST') and the IANA zones they stand for: the
+    defaults, overridden and extended by the entries of the config file, then
+    by those of the environment variable. Both are read on first use, and a
+    zone's data only when something is first converted to or from it.
+
+    Config file ($TIMESTAMP_ZONES_FILE, or timestamp/zones in $XDG_CONFIG_HOME
+    or ~/.config), one entry per line, '#' starting comments:
+        JST=Asia/Tokyo
+    Environment variable $TIMESTAMP_ZONES, comma-separated entries:
+        JST=Asia/Tokyo,CET=Europe/Berlin
+    """
+
+    ENV_VAR = 'TIMESTAMP_ZONES'
+    FILE_ENV_VAR = 'TIMESTAMP_ZONES_FILE'
+
+    def __init__(self, defaults: Dict[str, str], environ: Optional[Dict[str, str]] = None):
+        """
+        defaults: the built-in labels
+        environ: environment to read the config from (default: os.environ)
+        """
+        self._defaults = dict(defaults)
+        self._environ = environ
+        self._zones: Optional[Dict[str, str]] = None
+
+    def _load(self) -> Dict[str, str]:
+        if self._zones is None:
+            environ = self._environ if self._environ is not None else os.environ
+            zones = dict(self._defaults)
+            path = environ.get(ZoneRegistry.FILE_ENV_VAR) or ZoneRegistry.default_path(environ)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    for n, line in enumerate(f, 1):
+                        ZoneRegistry._add(zones, line.split('#', 1)[0], f'{path}:{n}')
+            except FileNotFoundError:
+                pass
+            for entry in environ.get(ZoneRegistry.ENV_VAR, '').split(','):
+                ZoneRegistry._add(zones, entry, f'${ZoneRegistry.ENV_VAR}')
+            self._zones = zones
+        return self._zones
+
+    @staticmethod
+    def default_path(environ) -> str:
+        base = environ.get('XDG_CONFIG_HOME') or os.path.join(os.path.expanduser('~'), '.config')
+        return os.path.join(base, 'timestamp', 'zones')
+
+    @staticmethod
+    def _add(zones: Dict[str, str], entry: str, source: str):
+        entry = entry.strip()
+        if not entry:
+            return
+        label, sep, name = (part.strip() for part in entry.partition('='))
+        if not sep or not label or not name:
+            raise ValueError(f"Invalid zone entry '{entry}' in {source}, expected LABEL=Zone/Name")
+        if name not in pytz.all_timezones_set:
+            raise ValueError(f"Unknown timezone '{name}' in {source}")
+        zones[label] = name
+
+    def reload(self):
+        """Reads the config again on next use"""
+        self._zones = None
+
+    def select(self, labels: Iterable[str]) -> Dict[str, str]:
+        """
+        The entries of `labels`, in that order.
+
+        Raises:
+            ValueError: If a label is unknown.
+        """
+        zones = self._load()
+        unknown = [label for label in labels if label not in zones]
+        if unknown:
+            raise ValueError(f"Unknown timezone label: '{unknown[0]}'. Known: {', '.join(zones)}")
+        return {label: zones[label] for label in labels}
+
+    def __getitem__(self, label: str) -> str:
+        return self._load()[label]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._load())
+
+    def __len__(self) -> int:
+        return len(self._load())
+
+    def __repr__(self):
+        return f'ZoneRegistry({self._load()})'
+
 class TimeParser:
     """
     A utility class for parsing various time string formats and epoch timestamps
@@ -65,12 +235,15 @@ class TimeParser:
     # Default timezone label to assume for naive inputs
     DEFAULT_TZ = 'UTC'
 
-    # Mapping of friendly labels to pytz timezone names
-    LABEL_TO_PYTZ = {
+    # Mapping of friendly labels to pytz timezone names, configurable (see
+    # ZoneRegistry)
+    LABEL_TO_PYTZ = ZoneRegistry({
         DEFAULT_TZ: DEFAULT_TZ,
         'IST': 'Asia/Kolkata',
         'PST': 'America/Los_Angeles'
-    }
+    })
+
+    MIN_VALID_EPOCH = 10000000 # Roughly corresponds to 1970-04-26
 
     # Acceptable input datetime string formats
     DATETIME_INPUT_FORMATS = [
@@ -81,6 +254,38 @@ class TimeParser:
         "%Y-%m-%dT%H:%M:%S%z", # Handles timezone information if present
     ]
 
+    # Partial dates, parsed to their first moment
+    PARTIAL_DATE_FORMATS = ["%Y-%m-%d", "%Y-%m", "%Y"]
+
+    # Canonical input shapes, each mapped to the one format that can parse it
+    # and to a constructor slicing its fixed-position fields, which gives the
+    # same result as strptime with that format at a fraction of the cost.
+    # Inputs of another shape (e.g. not zero-padded) try all formats in order.
+    INPUT_SHAPES = [
+        (re.compile(r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}'), "%Y-%m-%d %H:%M:%S",
+         lambda v: datetime(int(v[:4]), int(v[5:7]), int(v[8:10]), int(v[11:13]), int(v[14:16]), int(v[17:19]))),
+        (re.compile(r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d{1,6}'), "%Y-%m-%d %H:%M:%S.%f",
+         lambda v: datetime(int(v[:4]), int(v[5:7]), int(v[8:10]), int(v[11:13]), int(v[14:16]), int(v[17:19]),
+                            int(v[20:].ljust(6, '0')))),
+        (re.compile(r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}'), "%Y-%m-%dT%H:%M:%S",
+         lambda v: datetime(int(v[:4]), int(v[5:7]), int(v[8:10]), int(v[11:13]), int(v[14:16]), int(v[17:19]))),
+        (re.compile(r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}\.\d{1,6}'), "%Y-%m-%dT%H:%M:%S.%f",
+         lambda v: datetime(int(v[:4]), int(v[5:7]), int(v[8:10]), int(v[11:13]), int(v[14:16]), int(v[17:19]),
+                            int(v[20:].ljust(6, '0')))),
+        (re.compile(r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(?:Z|[+-]\d{2}:?[0-5]\d)'), "%Y-%m-%dT%H:%M:%S%z",
+         lambda v: datetime(int(v[:4]), int(v[5:7]), int(v[8:10]), int(v[11:13]), int(v[14:16]), int(v[17:19]),
+                            tzinfo=TimeParser._utc_offset(v[19:]))),
+        (re.compile(r'\d{4}-\d{2}-\d{2}'), "%Y-%m-%d",
+         lambda v: datetime(int(v[:4]), int(v[5:7]), int(v[8:10]))),
+        (re.compile(r'\d{4}-\d{2}'), "%Y-%m",
+         lambda v: datetime(int(v[:4]), int(v[5:7]), 1)),
+        (re.compile(r'\d{4}'), "%Y",
+         lambda v: datetime(int(v), 1, 1)),
+    ]
+
+    # Index into INPUT_SHAPES of the last parsed input, checked first
+    _last_shape = 0
+
     @staticmethod
     def _detect_epoch_precision(value: float) -> datetime:
         """
@@ -96,20 +301,52 @@ class TimeParser:
         Raises:
             ValueError: If the epoch timestamp is too small to be considered valid.
         """
-        MIN_VALID_EPOCH = 10000000 # Roughly corresponds to 1970-04-26
-
-        if value < MIN_VALID_EPOCH:
+        if value < TimeParser.MIN_VALID_EPOCH:
             raise ValueError("Epoch timestamp too small to be valid. Did you mean a year?")
 
+        return datetime.fromtimestamp(value / TimeParser._epoch_divisor(value), timezone.utc)
+
+    @staticmethod
+    def _parse_epoch(value: str) -> Optional[datetime]:
+        """
+        The UTC datetime of an epoch timestamp string, or None if `value` is
+        not one (e.g. a year or a date string).
+        """
+        # A failing float() is costly, and no valid epoch has a '-' there
+        if value[4:5] == '-':
+            return None
+        try:
+            epoch_value = float(value)
+            if epoch_value < 1e12:
+                # Seconds, the common case, need no division (the zone is
+                # passed positionally, which is cheaper than tz=)
+                if epoch_value < TimeParser.MIN_VALID_EPOCH:
+                    return None
+                return datetime.fromtimestamp(epoch_value, timezone.utc)
+            return datetime.fromtimestamp(epoch_value / TimeParser._epoch_divisor(epoch_value), timezone.utc)
+        except (ValueError, OverflowError, OSError):
+            return None  # Out of range epochs are left to the datetime shapes, which reject them
+
+    @staticmethod
+    def _epoch_divisor(value: float) -> float:
+        """Units per second of an epoch timestamp, judged by its magnitude"""
         if value < 1e12:
-            return datetime.fromtimestamp(value, tz=timezone.utc)  # seconds
+            return 1  # seconds
         elif value < 1e15:
-            return datetime.fromtimestamp(value / 1e3, tz=timezone.utc)  # milliseconds
+            return 1e3  # milliseconds
         elif value < 1e18:
-            return datetime.fromtimestamp(value / 1e6, tz=timezone.utc)  # microseconds
+            return 1e6  # microseconds
         else:
             # Fallback for nanoseconds if it's an extremely large number
-            return datetime.fromtimestamp(value / 1e9, tz=timezone.utc)  # nanoseconds
+            return 1e9  # nanoseconds
+
+    @staticmethod
+    def _utc_offset(value: str) -> timezone:
+        """Converts 'Z', '+HH:MM' or '+HHMM' to a fixed-offset timezone, as strptime's %z does"""
+        if value == 'Z':
+            return timezone.utc
+        minutes = int(value[1:3]) * 60 + int(value[-2:])
+        return timezone(timedelta(minutes=-minutes if value[0] == '-' else minutes))
 
     @staticmethod
     def parse_time_string(value: str) -> datetime:
@@ -127,34 +364,46 @@ class TimeParser:
         Raises:
             ValueError: If the datetime string cannot be parsed by any known format.
         """
-        # Try detailed datetime formats first (including those with %z for timezone)
-        for fmt in TimeParser.DATETIME_INPUT_FORMATS:
+        # Inputs of a batch mostly share one shape: try the last one first
+        shapes = TimeParser.INPUT_SHAPES
+        last = TimeParser._last_shape
+        index = last if shapes[last][0].fullmatch(value) else None
+        if index is None:
+            index = next((i for i, (shape, _, _) in enumerate(shapes) if shape.fullmatch(value)), None)
+        if index is not None:
             try:
-                dt = datetime.strptime(value, fmt)
+                dt = shapes[index][2](value)
+                TimeParser._last_shape = index
                 return dt
             except ValueError:
-                continue
+                pass  # e.g. month 13; no other format matches either
 
-        # Fallback for partial dates (e.g., "2023-10-27", "2023-10", "2023")
-        fallback_formats = [
-            ("%Y-%m-%d", "%Y-%m-%d 00:00:00"),
-            ("%Y-%m", "%Y-%m-01 00:00:00"),
-            ("%Y", "%Y-01-01 00:00:00"),
-        ]
-        for test_fmt, full_fmt_str in fallback_formats:
+        # Try detailed datetime formats first (including those with %z for timezone),
+        # then partial dates (e.g., "2023-10-27", "2023-10", "2023")
+        for fmt in TimeParser.DATETIME_INPUT_FORMATS + TimeParser.PARTIAL_DATE_FORMATS:
             try:
-                # Parse the partial string to get the base date
-                parsed_partial_dt = datetime.strptime(value, test_fmt)
-                # Format this base date into a full datetime string with default time
-                full_dt_str = parsed_partial_dt.strftime(full_fmt_str)
-                # Then parse the full datetime string
-                padded_dt = datetime.strptime(full_dt_str, "%Y-%m-%d %H:%M:%S")
-                return padded_dt
+                return datetime.strptime(value, fmt)
             except ValueError:
                 continue
 
         raise ValueError(f"Could not parse datetime input: '{value}'.")
 
+    @staticmethod
+    def parse_value(time_input: str) -> datetime:
+        """
+        Parses an epoch timestamp (to a UTC datetime) or a datetime string (to a
+        datetime that is naive unless the string has an offset).
+
+        Raises:
+            ValueError: If the input cannot be parsed.
+        """
+        dt = TimeParser._parse_epoch(time_input)
+        if dt is not None:
+            return dt
+
+        # Not an epoch: attempt to parse as a datetime string
+        return TimeParser.parse_time_string(time_input)
+
     @staticmethod
     def parse(time_input: Optional[str] = None, source_tz_label: Optional[str] = None) -> datetime:
         """
@@ -187,15 +436,10 @@ class TimeParser:
             except pytz.UnknownTimeZoneError:
                 raise ValueError(f"Invalid pytz timezone name derived from label '{resolved_tz_label}': '{pytz_tz_name}'.")
 
-        # Attempt to parse as epoch timestamp
-        try:
-            epoch_value = float(time_input)
-            return TimeParser._detect_epoch_precision(epoch_value) # This returns UTC aware datetime
-        except ValueError:
-            # Not an epoch, proceed to datetime string parsing
-            pass
-
-        # Attempt to parse as a datetime string
+        # Epochs are UTC already: no datetime shapes to try, nothing to localize
+        dt = TimeParser._parse_epoch(time_input)
+        if dt is not None:
+            return dt
         dt = TimeParser.parse_time_string(time_input)
 
         # If the parsed datetime is naive, localize it using source_tz_label
@@ -215,6 +459,97 @@ class TimeParser:
         return dt
 
 
+class TimeFields:
+    """
+    Converts many time inputs to rows of selected fields, resolving field
+    names and timezones once instead of per value. Zone conversions go through
+    the zones' `ZoneTable`s rather than pytz.
+
+    Field names:
+        input                               the input value as given
+        epoch_seconds, epoch_ms, epoch_micros
+        <LABEL>.<format>                    e.g. UTC.iso, with LABEL from
+                                            TimeParser.LABEL_TO_PYTZ and format
+                                            one of standard, micros, iso
+    """
+
+    EPOCH_FIELDS = {
+        'epoch_seconds': 1,
+        'epoch_ms': 1_000,
+        'epoch_micros': 1_000_000,
+    }
+
+    FORMATS = TimeOutput.FORMATS
+
+    def __init__(self, fields: List[str], source_tz_label: Optional[str] = None):
+        """
+        Args:
+            fields: Field names, see above.
+            source_tz_label: The timezone label to assume for naive datetime strings.
+
+        Raises:
+            ValueError: If a field name or timezone label is unknown.
+        """
+        if not fields:
+            raise ValueError("No fields selected")
+        if source_tz_label is not None and source_tz_label not in TimeParser.LABEL_TO_PYTZ:
+            raise ValueError(f"Unknown timezone label: '{source_tz_label}'.")
+        self.fields = list(fields)
+        self.source_tz_label = source_tz_label
+        self._source_zone = zone_table(TimeParser.LABEL_TO_PYTZ[source_tz_label or TimeParser.DEFAULT_TZ])
+        self._getters = [self._getter(field) for field in self.fields]
+
+    @staticmethod
+    def _getter(field: str) -> Callable[[str, datetime], Primitive]:
+        if field == 'input':
+            return lambda value, dt: value
+        if field in TimeFields.EPOCH_FIELDS:
+            scale = TimeFields.EPOCH_FIELDS[field]
+            return lambda value, dt: int(dt.timestamp() * scale)
+        label, _, fmt_name = field.partition('.')
+        if label not in TimeParser.LABEL_TO_PYTZ or fmt_name not in TimeFields.FORMATS:
+            raise ValueError(f"Unknown field: '{field}'. Expected input, {', '.join(TimeFields.EPOCH_FIELDS)} "
+                             f"or <{'|'.join(TimeParser.LABEL_TO_PYTZ)}>.<{'|'.join(TimeFields.FORMATS)}>")
+        zone = zone_table(TimeParser.LABEL_TO_PYTZ[label])
+        return lambda value, dt: zone.format(dt, fmt_name)
+
+    def row(self, value: str) -> List[Primitive]:
+        """
+        Returns the fields of one input.
+
+        Raises:
+            ValueError: If the input cannot be parsed.
+        """
+        dt = self.parse(value)
+        return [getter(value, dt) for getter in self._getters]
+
+    def parse(self, value: str) -> datetime:
+        """
+        Parses an input like `TimeParser.parse`, but localizes naive inputs
+        with the source zone's precomputed offsets (same results as pytz).
+
+        Raises:
+            ValueError: If the input cannot be parsed.
+        """
+        dt = TimeParser.parse_value(value)
+        if dt.tzinfo is None:
+            dt = self._source_zone.localize(dt)
+        return dt
+
+    def convert(self, values: Iterable[str], errors: Optional[List[str]] = None) -> Iterator[List[Primitive]]:
+        """
+        Yields the row of each value. Unparseable (or out of range) values
+        give a row with only `input` filled in, and are appended to `errors`
+        if given.
+        """
+        for value in values:
+            try:
+                yield self.row(value)
+            except (ValueError, OverflowError, OSError):
+                if errors is not None:
+                    errors.append(value)
+                yield [value if field == 'input' else None for field in self.fields]
+
 def convert_time_output_to_data_table(time_output: TimeOutput) -> DataTable:
     """
     Converts a TimeOutput object into a DataTable for structured display.
@@ -239,18 +574,16 @@ def convert_time_output_to_data_table(time_output: TimeOutput) -> DataTable:
     data_table.append(['epoch', 'micros', time_output.epoch_micros])
 
     # Add Timezone specific time rows
-    for label in time_output.tz_times.keys():
-        for i in range(time_output.num_fmt):
-            category = label
-            time_type = time_output.fmt_names[i]
-            value = time_output.tz_times[label][i]
-            data_table.append([category, time_type, value])
+    for label in time_output.labels():
+        for time_type in time_output.fmt_names:
+            data_table.append([label, time_type, time_output.format(label, time_type)])
             
     return data_table
 
 def parse_time (
     time_input: Optional[str] = None,
-    source_tz_label: Optional[str] = None
+    source_tz_label: Optional[str] = None,
+    zones: Optional[List[str]] = None
 ) -> TimeOutput:
     """
     Parses a time string or epoch timestamp and returns a TimeOutput object.
@@ -258,13 +591,128 @@ def parse_time (
     Args:
         time_input: The input string (epoch timestamp or datetime string).
         source_tz_label: The timezone label to assume for naive datetime strings.
+        zones: Labels of the zones to output (default: all of TimeParser.LABEL_TO_PYTZ).
 
     Returns:
         A TimeOutput object containing parsed time information in various formats.
 
     Raises:
-        ValueError: If the input cannot be parsed or the timezone label is unknown.
+        ValueError: If the input cannot be parsed or a timezone label is unknown.
     """
+    registry = TimeParser.LABEL_TO_PYTZ
+    tz_map = registry.select(registry if zones is None else zones)
     dt = TimeParser.parse(time_input, source_tz_label)
-    tz_map = TimeParser.LABEL_TO_PYTZ
     return TimeOutput(dt, tz_map)
+
+def convert_time_column(table: DataTable, col: Union[int, str], to: str = 'UTC.iso',
+                        dest: Optional[str] = None, source_tz_label: Optional[str] = None,
+                        errors: Optional[List[Primitive]] = None, numpy: Optional[bool] = None):
+    """
+    Converts every value of a column of time inputs, adding the results to
+    `table` as a new column.
+
+    A column of numbers (or numeric strings) that includes a valid epoch is
+    read as epochs, all in the precision (seconds, millis, micros, nanos)
+    detected from its largest value; with NumPy (used by default if installed,
+    and if `numpy` is not False) such columns are converted with `datetime64`
+    arithmetic and vectorized zone offset lookups. Any other column is parsed
+    value by value like `parse_time`.
+
+    Args:
+        table: The table to convert a column of.
+        col: Name or 0-based index of the column.
+        to: The output field, as for TimeFields (e.g. 'epoch_ms', 'IST.standard').
+        dest: Name of the new column (default: '<col>_<to>').
+        source_tz_label: The timezone label to assume for naive datetime strings.
+        errors: If given, unparseable values are appended to it.
+        numpy: True to require NumPy, False to not use it.
+
+    Raises:
+        ValueError: If the column, field or timezone label is unknown, or if
+                    `dest` already exists.
+    """
+    cols = table.cols()
+    if col not in cols and not (isinstance(col, int) and 0 <= col < len(cols)):
+        raise ValueError(f"Unknown column: {col}")
+    name = col if isinstance(col, str) else cols[col]
+    values = table.col(col)
+    dest = dest if dest is not None else f'{name}_{to}'
+    if dest in cols:
+        raise ValueError(f"Duplicate column {dest}")
+    fields = TimeFields([to], source_tz_label)
+    getter = fields._getters[0]
+
+    result = None
+    divisor = _epoch_column_divisor(values)
+    if divisor is not None and numpy is not False and None not in values and to != 'input':
+        np = _numpy(required=numpy is True)
+        if np is not None:
+            result = _convert_epochs_numpy(np, values, divisor, to)
+
+    if result is None:
+        utc = timezone.utc
+        result = []
+        for value in values:
+            if value is None:
+                result.append(None)
+                continue
+            try:
+                if divisor is None:
+                    dt = fields.parse(str(value))
+                else:
+                    dt = datetime.fromtimestamp(float(value) / divisor, tz=utc)
+                result.append(getter(value, dt))
+            except (ValueError, OverflowError, OSError):
+                if errors is not None:
+                    errors.append(value)
+                result.append(None)
+    table.add_col(dest, result)
+
+def _epoch_column_divisor(values: List[Primitive]) -> Optional[float]:
+    """The epoch divisor of a column, or None if it does not hold epochs"""
+    largest = None
+    for value in values:
+        if value is None:
+            continue
+        if isinstance(value, str) and value[4:5] == '-':
+            return None
+        try:
+            number = float(value)
+        except ValueError:
+            return None
+        if largest is None or number > largest:
+            largest = number
+    if largest is None or largest < TimeParser.MIN_VALID_EPOCH:
+        return None  # e.g. a column of years
+    return TimeParser._epoch_divisor(largest)
+
+def _numpy(required: bool):
+    try:
+        import numpy as np
+    except ImportError:
+        if required:
+            raise
+        return None
+    return np
+
+def _convert_epochs_numpy(np, values: List[Primitive], divisor: float, field: str) -> Optional[List[Primitive]]:
+    """Converts epochs with datetime64 arithmetic; None if not all are finite"""
+    seconds = np.array(values, dtype=np.float64) / divisor
+    if not np.isfinite(seconds).all():
+        return None
+    # Rounded like datetime.fromtimestamp: the fraction of each second to the
+    # microsecond, half to even (rounding seconds * 1e6 differs by 1 µs for
+    # many fractional inputs)
+    fraction, whole = np.modf(seconds)
+    micros = whole.astype(np.int64) * 1_000_000 + np.rint(fraction * 1e6).astype(np.int64)
+    if field in TimeFields.EPOCH_FIELDS:
+        scale = TimeFields.EPOCH_FIELDS[field]
+        return np.trunc(micros / 1e6 * scale).astype(np.int64).tolist()
+    label, _, fmt_name = field.partition('.')
+    zone = zone_table(TimeParser.LABEL_TO_PYTZ[label])
+    i = zone.lookup(np, np.floor_divide(micros, 1_000_000))
+    stamps = (micros + np.array(zone.offsets, dtype=np.int64)[i] * 1_000_000).astype('datetime64[us]')
+    if fmt_name == 'iso':
+        return np.char.add(np.datetime_as_string(stamps, unit='s'), np.array(zone.offset_strs)[i]).tolist()
+    unit = 'us' if fmt_name == 'micros' else 's'
+    return np.char.replace(np.datetime_as_string(stamps, unit=unit), 'T', ' ').tolist()
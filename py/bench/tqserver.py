@@ -0,0 +1,172 @@
+#!/usr/bin/python3
+
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from bench.textquery import CsvFileSource, InMemoryDb, QueryStats, render_diagnostics, render_result
+
+# Protocol: a client connects to the Unix socket, sends one JSON request
+# line and reads one JSON response line, then the connection is closed.
+#
+# Request:  {"query": str, "csv": bool, "profile": bool, "explain": bool, "stats_json": bool}
+# Response: {"ok": bool, "stdout": str, "stderr": str}
+
+class _RWLock:
+    """Readers-writer lock; waiting writers block new readers"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writing or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writing or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
+class QueryServer:
+    """
+    Keeps CSV tables loaded in a shared in-memory database and answers
+    queries over a Unix domain socket.
+
+    Queries run on a pool of read-only connections, one per concurrent
+    client. A watcher thread polls the source files every `interval`
+    seconds and applies changes (see `CsvFileSource.refresh`) while holding
+    the write side of a lock, so queries never observe half-loaded tables.
+    """
+
+    def __init__(self, sources: List[CsvFileSource], socket_path: str,
+                 pool_size: int = 4, interval: float = 1.0, db: Optional[InMemoryDb] = None):
+        self.sources = sources
+        self.socket_path = socket_path
+        self.interval = interval
+        # A db (created with shared=True) may be passed to add UDFs first
+        self.db = db if db is not None else InMemoryDb({}, shared=True)
+        self._lock = _RWLock()
+        self._stop = threading.Event()
+        for source in sources:
+            source.load(self.db)
+        self._pool: "queue.Queue" = queue.Queue()
+        for _ in range(pool_size):
+            self._pool.put(self.db.reader())
+        self._server = None
+
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        conn = self._pool.get()
+        try:
+            with self._lock.read():
+                stats = QueryStats()
+                query = request['query']
+                plan = self.db.explain(query, conn=conn) if request.get('explain') else None
+                result = self.db.query(query, conn=conn, stats=stats)
+            stdout = render_result(result, csv=request.get('csv', False), stats=stats)
+            stderr = render_diagnostics(stats if request.get('profile') else None, plan,
+                                        as_json=request.get('stats_json', False))
+            return {'ok': True, 'stdout': stdout, 'stderr': stderr or ''}
+        except Exception as e:
+            return {'ok': False, 'stdout': '', 'stderr': f'Error: {e}'}
+        finally:
+            self._pool.put(conn)
+
+    def refresh(self):
+        """Applies pending changes of all source files"""
+        with self._lock.write():
+            for source in self.sources:
+                source.refresh(self.db)
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                # Keep serving the previously loaded data
+                print(f"Reload failed: {e}", flush=True)
+
+    def serve_forever(self):
+        _remove_stale_socket(self.socket_path)
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                line = self.rfile.readline()
+                if not line:
+                    return
+                try:
+                    response = server.handle(json.loads(line))
+                except ValueError as e:
+                    response = {'ok': False, 'stdout': '', 'stderr': f'Error: invalid request: {e}'}
+                self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+
+        watcher = threading.Thread(target=self._watch, daemon=True)
+        watcher.start()
+        self._server = socketserver.ThreadingUnixStreamServer(self.socket_path, Handler)
+        self._server.daemon_threads = True
+        try:
+            self._server.serve_forever()
+        finally:
+            self._stop.set()
+            self._server.server_close()
+            try:
+                os.unlink(self.socket_path)
+            except FileNotFoundError:
+                pass
+
+    def shutdown(self):
+        if self._server is not None:
+            self._server.shutdown()
+
+def _remove_stale_socket(path: str):
+    if not os.path.exists(path):
+        return
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.connect(path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        os.unlink(path)
+        return
+    raise ValueError(f"A server is already listening on '{path}'")
+
+def send_request(socket_path: str, request: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+    """Sends one request to a running QueryServer and returns its response"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        s.connect(socket_path)
+        s.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        s.shutdown(socket.SHUT_WR)
+        chunks = []
+        while True:
+            chunk = s.recv(1 << 16)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    return json.loads(b''.join(chunks))
@@ -0,0 +1,169 @@
+#!/usr/bin/python3
+
+import os
+import sqlite3
+import sys
+import time
+from typing import Optional, TextIO
+
+from bench.textquery import CsvGlobSource, InMemoryDb, QueryStats, render_result
+
+HELP = """\
+Enter SQL terminated by ';' (may span lines), or a command:
+  .load NAME PATH    load CSV file PATH (or all files of a directory or
+                     glob pattern) as table NAME
+  .drop NAME         drop table NAME
+  .tables            list tables
+  .schema [NAME]     show columns and types of all tables or of NAME
+  .mode md|csv       output format
+  .timer on|off      print query and render time after each query
+  .help              show this help
+  .quit              exit (also Ctrl-D)"""
+
+HISTORY_FILE = os.path.join(os.path.expanduser('~'), '.textquery_history')
+
+class Shell:
+    """
+    Interactive SQL prompt over a loaded `InMemoryDb`: tables are parsed
+    once and stay in memory while queries are iterated on.
+
+    Reads from the terminal with line editing and persistent history (if the
+    `readline` module is available), or plainly from any other `stdin`.
+    """
+
+    PROMPT = 'tq> '
+    CONTINUATION = '... '
+
+    def __init__(self, db: InMemoryDb, csv: bool = False, parse_types: bool = False,
+                 stdin: Optional[TextIO] = None, stdout: Optional[TextIO] = None):
+        self.db = db
+        self.csv = csv
+        self.parse_types = parse_types
+        self.timer = False
+        self.stdin = stdin if stdin is not None else sys.stdin
+        self.stdout = stdout if stdout is not None else sys.stdout
+        self.interactive = self.stdin is sys.stdin and sys.stdin.isatty()
+
+    def run(self):
+        readline = self._setup_history() if self.interactive else None
+        if self.interactive:
+            self._print('Type .help for commands')
+        buffer = ''
+        try:
+            while True:
+                try:
+                    line = self._read_line(self.CONTINUATION if buffer else self.PROMPT)
+                except KeyboardInterrupt:
+                    # Discard the statement being typed, like other shells
+                    self._print('')
+                    buffer = ''
+                    continue
+                if line is None:
+                    break
+                if not buffer and line.strip().startswith('.'):
+                    if not self.command(line.strip()):
+                        break
+                    continue
+                buffer += line + '\n'
+                if sqlite3.complete_statement(buffer):
+                    self.execute(buffer)
+                    buffer = ''
+            if buffer.strip():
+                self.execute(buffer)
+        finally:
+            if readline is not None:
+                try:
+                    readline.write_history_file(HISTORY_FILE)
+                except OSError:
+                    pass
+
+    def execute(self, sql: str):
+        sql = sql.strip().rstrip(';').strip()
+        if not sql:
+            return
+        stats = QueryStats()
+        try:
+            result, changed = self.db.execute(sql, stats=stats)
+        except (sqlite3.Error, ValueError) as e:
+            self._print(f'Error: {e}')
+            return
+        if result is None:
+            # DDL or DML: no result set to render
+            self._print(f'{changed} rows changed' if changed >= 0 else 'OK')
+            if self.timer:
+                self._print(f'Time: query {stats.get("query").seconds:.6f}s')
+            return
+        self._print(render_result(result, csv=self.csv, stats=stats))
+        if self.timer:
+            query, render = stats.get('query'), stats.get('render')
+            self._print(f'Time: query {query.seconds:.6f}s, render {render.seconds:.6f}s, {result.size()} rows')
+
+    def command(self, line: str) -> bool:
+        """Runs a '.' command; returns False to leave the shell"""
+        parts = line.split()
+        name, params = parts[0], parts[1:]
+        try:
+            if name in ('.quit', '.exit'):
+                return False
+            elif name == '.help':
+                self._print(HELP)
+            elif name == '.load' and len(params) == 2:
+                self._load(*params)
+            elif name == '.drop' and len(params) == 1:
+                self.db.drop_table(params[0])
+            elif name == '.tables' and not params:
+                self.execute("select name from sqlite_master where type = 'table' order by name")
+            elif name == '.schema' and len(params) <= 1:
+                self._schema(params[0] if params else None)
+            elif name == '.mode' and len(params) == 1 and params[0] in ('md', 'csv'):
+                self.csv = params[0] == 'csv'
+            elif name == '.timer' and len(params) == 1 and params[0] in ('on', 'off'):
+                self.timer = params[0] == 'on'
+            else:
+                self._print(f'Invalid command: {line} (see .help)')
+        except (OSError, sqlite3.Error, ValueError) as e:
+            self._print(f'Error: {e}')
+        return True
+
+    def _load(self, name: str, path: str):
+        start = time.perf_counter()
+        if os.path.isfile(path):
+            with open(path, 'rb') as f:
+                rows = self.db.load_csv(name, f, parse_types=self.parse_types)
+        else:
+            rows = CsvGlobSource(name, path, parse_types=self.parse_types).load(self.db)
+        self._print(f'Loaded {rows} rows into {name} ({time.perf_counter() - start:.3f}s)')
+
+    def _schema(self, name: Optional[str]):
+        if name is None:
+            sql = ("select m.name as tbl, p.name, p.type from sqlite_master m, pragma_table_info(m.name) p "
+                   "where m.type = 'table' order by m.name, p.cid")
+            self.execute(sql)
+        else:
+            self.execute(f"select name, type from pragma_table_info('{name}')")
+
+    def _read_line(self, prompt: str) -> Optional[str]:
+        if self.interactive:
+            try:
+                return input(prompt)
+            except EOFError:
+                self._print('')
+                return None
+        line = self.stdin.readline()
+        return line.rstrip('\n') if line else None
+
+    def _print(self, text: str):
+        print(text, file=self.stdout, flush=True)
+
+    @staticmethod
+    def _setup_history():
+        try:
+            import readline
+        except ImportError:
+            return None
+        try:
+            readline.read_history_file(HISTORY_FILE)
+        except OSError:
+            pass
+        readline.set_history_length(1000)
+        return readline
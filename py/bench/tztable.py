@@ -0,0 +1,122 @@
+from bisect import bisect_right
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import List
+
+import pytz
+
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_SECOND = timedelta(seconds=1)
+
+# Format names as in TimeOutput.FORMATS, without the offset of 'iso', which
+# comes from the table
+_LOCAL_FORMATS = {
+    'standard': "%Y-%m-%d %H:%M:%S",
+    'micros': "%Y-%m-%d %H:%M:%S.%f",
+    'iso': "%Y-%m-%dT%H:%M:%S",
+}
+
+# A `ZoneTable` holds the UTC offset history of a pytz zone as sorted arrays:
+# the UTC epoch second each offset starts at, and the offset in seconds.
+# Converting an instant is then a binary search and an integer addition,
+# instead of pytz's per-value tzinfo lookup, and arrays of epochs can be
+# converted at once with NumPy. Results are the same as pytz's, including
+# for ambiguous and nonexistent local times (see `localize`).
+class ZoneTable:
+
+    # Members:
+    #   name
+    #   transitions (UTC epoch seconds, the first being -inf in effect)
+    #   offsets (seconds east of UTC, per transition)
+    #   dst (whether each offset is daylight saving time)
+    #   offset_strs (offsets as strftime's %z formats them, e.g. '-0700')
+
+    def __init__(self, name: str):
+        self.name = name
+        tz = pytz.timezone(name)
+        if hasattr(tz, '_utc_transition_times'):
+            starts = tz._utc_transition_times
+            infos = tz._transition_info
+        else:
+            # Fixed-offset zones such as UTC
+            starts = [datetime.min]
+            infos = [(tz.utcoffset(None), timedelta(0), tz.tzname(None))]
+        self.transitions: List[int] = [(start - _EPOCH) // _SECOND for start in starts]
+        self.offsets: List[int] = [offset // _SECOND for offset, _, _ in infos]
+        self.dst: List[bool] = [bool(dst) for _, dst, _ in infos]
+        self.offset_strs: List[str] = [ZoneTable._offset_str(offset) for offset in self.offsets]
+
+    @staticmethod
+    def _offset_str(offset: int) -> str:
+        sign = '-' if offset < 0 else '+'
+        minutes, seconds = divmod(abs(offset), 60)
+        hours, minutes = divmod(minutes, 60)
+        return f'{sign}{hours:02d}{minutes:02d}' + (f'{seconds:02d}' if seconds else '')
+
+    def index(self, epoch: int) -> int:
+        """Index of the offset in effect at UTC epoch second `epoch`"""
+        return max(0, bisect_right(self.transitions, epoch) - 1)
+
+    def utcoffset(self, dt: datetime) -> int:
+        """Offset in seconds of the zone at the instant of aware datetime `dt`"""
+        return self.offsets[self.index((dt - _EPOCH_UTC) // _SECOND)]
+
+    def local(self, dt: datetime) -> datetime:
+        """Naive wall-clock time of the zone at the instant of aware datetime `dt`"""
+        epoch = (dt - _EPOCH_UTC) // _SECOND
+        return _EPOCH + timedelta(seconds=epoch + self.offsets[self.index(epoch)], microseconds=dt.microsecond)
+
+    def format(self, dt: datetime, fmt_name: str) -> str:
+        """
+        The instant of aware datetime `dt` in this zone, formatted as TimeOutput
+        does (fmt_name one of 'standard', 'micros', 'iso')
+        """
+        epoch = (dt - _EPOCH_UTC) // _SECOND
+        i = self.index(epoch)
+        local = _EPOCH + timedelta(seconds=epoch + self.offsets[i], microseconds=dt.microsecond)
+        text = local.strftime(_LOCAL_FORMATS[fmt_name])
+        return text + self.offset_strs[i] if fmt_name == 'iso' else text
+
+    def localize(self, local: datetime) -> datetime:
+        """
+        The UTC instant of naive wall-clock time `local` in this zone, resolved
+        exactly as pytz's `localize(local)` (i.e. with is_dst=False): the
+        standard time side of ambiguous times, and the pre-transition offset
+        for nonexistent times.
+        """
+        # Offsets change on whole seconds, so the microseconds of `local`
+        # never affect which offset applies
+        wall = (local - _EPOCH) // _SECOND
+        epoch = self._localize(wall)
+        return _EPOCH_UTC + timedelta(seconds=epoch, microseconds=local.microsecond)
+
+    def _localize(self, wall: int) -> int:
+        # Mirrors pytz.tzinfo.DstTzInfo.localize: candidate offsets are those
+        # in effect a day before and after `wall` (looked up as if it was
+        # UTC), kept if converting back gives the same wall-clock time
+        candidates = {}
+        for delta in (-86400, 86400):
+            offset = self.offsets[self.index(wall + delta)]
+            i = self.index(wall - offset)
+            if self.offsets[i] == offset:
+                candidates[wall - offset] = self.dst[i]
+        if not candidates:
+            # A nonexistent time, in the gap of a forward transition
+            return self._localize(wall - 6 * 3600) + 6 * 3600
+        standard = [epoch for epoch, dst in candidates.items() if not dst]
+        return max(standard or candidates)
+
+    def lookup(self, np, epochs):
+        """
+        Vectorized `index` over a NumPy array of UTC epoch seconds (may be
+        fractional)
+        """
+        transitions = np.array(self.transitions, dtype=np.int64)
+        i = np.searchsorted(transitions, np.floor(epochs), side='right') - 1
+        return np.maximum(i, 0)
+
+@lru_cache(maxsize=None)
+def zone_table(name: str) -> ZoneTable:
+    """The ZoneTable of pytz zone `name`, built once per process"""
+    return ZoneTable(name)
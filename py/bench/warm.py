@@ -0,0 +1,387 @@
+#!/usr/bin/python3
+
+"""
+A resident helper that keeps the command line tools imported (with the bench
+modules and timezone data they use), and runs each invocation forwarded to it
+in a forked worker, skipping the interpreter's import work.
+
+Start it from the py directory (opt-in, it serves until interrupted):
+
+    python3 -m bench.warm [--socket PATH] &
+
+The tools forward to it when it is running (see `forward`) and otherwise run
+in-process as usual.
+"""
+
+# This module is imported at the start of every tool, so the client side
+# sticks to modules the interpreter has loaded already, and the C modules
+# _socket and _signal (socket and signal pull in enum, selectors, ...).
+# For the same reason annotations are not evaluated, and typing is only
+# imported by type checkers.
+from __future__ import annotations
+
+import os
+import stat
+import sys
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Dict, List, Optional, Tuple
+
+# Protocol: messages are a decimal length and a newline, then that many bytes
+# of NUL-separated fields (NUL being the one byte that argv, environment and
+# paths cannot contain). A client connects to the Unix socket and sends
+#
+#   run, tool, cwd, argc, *argv, *environ ('NAME=value')
+#
+# with its stdin, stdout and stderr attached (SCM_RIGHTS). The server forks a
+# worker, which answers with
+#
+#   pid, <worker pid>          once it has started, then either
+#   exit, <status>             the tool's exit status, or
+#   exec, file, *args          a program for the client to exec in its place
+#                              (see `execvp`)
+#
+# A connection closed before the pid message means the request was not run
+# (unknown tool, or a server restarting on changed sources), and the client
+# runs it in-process.
+#
+# Invocations attached to a terminal always run in-process: a worker is not
+# in the terminal's foreground process group, so reading it (or writing, with
+# `stty tostop`) would stop the worker.
+
+SOCKET_ENV_VAR = 'BENCH_WARM_SOCKET'
+DISABLE_ENV_VAR = 'BENCH_WARM'
+
+# Tool name -> module of the script in the py directory, with a main()
+# reading sys.argv
+TOOLS = {
+    'dfx': 'dfx',
+    'textquery': 'textquery',
+    'timestamp': 'timestamp',
+    'tb': 'tmpbuf',
+}
+
+# Imported ahead of requests, besides the tools
+WARM_MODULES = ['bench.data', 'bench.timestamp', 'bench.timebucket', 'bench.textquery', 'bench.tztable']
+
+SCRIPT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_STDIO = (0, 1, 2)
+_INT_SIZE = 4
+
+# Seconds a client has to send its request, before the helper serves others
+REQUEST_TIMEOUT = 2
+
+# The client channel of this process, when it is a worker
+_worker_channel = None
+
+class _Channel:
+    """Sends and receives the messages of the protocol over a connected socket"""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self._buffer = b''
+
+    def send(self, fields: List[bytes], fds: Tuple[int, ...] = ()):
+        import _socket
+        payload = b'\0'.join(fields)
+        data = b'%d\n' % len(payload) + payload
+        sent = 0
+        if fds:
+            rights = b''.join(fd.to_bytes(_INT_SIZE, sys.byteorder) for fd in fds)
+            sent = self.sock.sendmsg([data], [(_socket.SOL_SOCKET, _socket.SCM_RIGHTS, rights)])
+        self.sock.sendall(data[sent:])
+
+    def recv(self) -> Optional[List[bytes]]:
+        """The fields of the next message, None if the connection was closed"""
+        while b'\n' not in self._buffer:
+            if not self._read():
+                return None
+        size, _, rest = self._buffer.partition(b'\n')
+        size = int(size)
+        while len(rest) < size:
+            if not self._read():
+                return None
+            rest = self._buffer.partition(b'\n')[2]
+        self._buffer = rest[size:]
+        return rest[:size].split(b'\0')
+
+    def recv_fds(self, count: int) -> List[int]:
+        """Receives the first bytes of a message with the descriptors attached to them"""
+        import _socket
+        data, ancillary, _, _ = self.sock.recvmsg(1 << 16, _socket.CMSG_SPACE(count * _INT_SIZE))
+        self._buffer += data
+        fds = []
+        for level, kind, rights in ancillary:
+            if level == _socket.SOL_SOCKET and kind == _socket.SCM_RIGHTS:
+                fds += [int.from_bytes(rights[i:i + _INT_SIZE], sys.byteorder)
+                        for i in range(0, len(rights) - len(rights) % _INT_SIZE, _INT_SIZE)]
+        return fds
+
+    def _read(self) -> bool:
+        chunk = self.sock.recv(1 << 16)
+        self._buffer += chunk
+        return bool(chunk)
+
+def socket_path(environ=None) -> str:
+    """$BENCH_WARM_SOCKET, or a per-user socket in $XDG_RUNTIME_DIR (or /tmp)"""
+    environ = os.environ if environ is None else environ
+    if environ.get(SOCKET_ENV_VAR):
+        return environ[SOCKET_ENV_VAR]
+    return os.path.join(environ.get('XDG_RUNTIME_DIR') or '/tmp', f'bench-warm-{os.getuid()}.sock')
+
+def forward(tool: str):
+    """
+    Runs this invocation of `tool` (sys.argv, stdio, environment and working
+    directory) in a worker of the running helper, and exits with its status.
+    Returns without running anything if no helper of this user is listening,
+    $BENCH_WARM is 0 or stdio is a terminal, for the caller to run in-process.
+    """
+    if os.environ.get(DISABLE_ENV_VAR) == '0':
+        return
+    if any(os.isatty(fd) for fd in _STDIO):
+        return
+    path = socket_path()
+    try:
+        st = os.stat(path)
+    except OSError:
+        return
+    if not stat.S_ISSOCK(st.st_mode) or st.st_uid != os.getuid():
+        return
+
+    import _signal
+    import _socket
+
+    try:
+        request = [b'run', tool.encode(), os.fsencode(os.getcwd()), b'%d' % len(sys.argv)]
+        request += [os.fsencode(arg) for arg in sys.argv]
+        request += [name + b'=' + value for name, value in os.environb.items()]
+        sock = _socket.socket(_socket.AF_UNIX, _socket.SOCK_STREAM)
+        sock.connect(path)
+        channel = _Channel(sock)
+        channel.send(request, _STDIO)
+        response = channel.recv()
+    except OSError:
+        return
+    if response is None:
+        return
+    pid = int(response[1])
+
+    def relay(signum, frame):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    for signum in (_signal.SIGINT, _signal.SIGTERM, _signal.SIGHUP):
+        _signal.signal(signum, relay)
+    response = channel.recv()
+    if response is None:
+        print("Error: the warm worker exited unexpectedly", file=sys.stderr)
+        sys.exit(1)
+    if response[0] == b'exec':
+        os.execvp(response[1], response[2:])
+    sys.exit(int(response[1]))
+
+def execvp(file: str, args: List[str]):
+    """
+    os.execvp for the tools: in a worker, the client process execs the
+    program instead, so that it runs in the user's terminal session.
+    """
+    if _worker_channel is None:
+        os.execvp(file, args)
+    _worker_channel.send([b'exec', os.fsencode(file)] + [os.fsencode(arg) for arg in args])
+    os._exit(0)
+
+def _mtime(path: str) -> Optional[float]:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+class WarmServer:
+    """
+    Serves tool invocations on a Unix socket, forking a worker per request
+    from this process, where the tools and WARM_MODULES are already imported.
+    Only connections of the same user are served.
+
+    The server re-executes itself, without serving the request, once a
+    source file of the py directory loaded by `warm` has changed, so that
+    workers never run outdated code.
+    """
+
+    def __init__(self, socket_path: str, tools: Optional[Dict[str, str]] = None):
+        self.socket_path = socket_path
+        self.tools = dict(TOOLS if tools is None else tools)
+        self.modules = {}
+        self._mtimes: Dict[str, Optional[float]] = {}
+
+    def warm(self):
+        """Imports the tools and WARM_MODULES, and loads the configured zones"""
+        import importlib
+        if SCRIPT_DIR not in sys.path:
+            sys.path.insert(0, SCRIPT_DIR)
+        self.modules = {tool: importlib.import_module(name) for tool, name in self.tools.items()}
+        for name in WARM_MODULES:
+            importlib.import_module(name)
+
+        from bench.timestamp import TimeParser
+        from bench.tztable import zone_table
+        try:
+            for name in TimeParser.LABEL_TO_PYTZ.values():
+                zone_table(name)
+        except ValueError:
+            pass  # An invalid zone config, reported by the tools
+        paths = [getattr(module, '__file__', None) for module in list(sys.modules.values())]
+        self._mtimes = {path: _mtime(path) for path in paths
+                        if path and os.path.abspath(path).startswith(SCRIPT_DIR + os.sep)}
+
+    def stale(self) -> bool:
+        """Whether a source file of the py directory loaded by `warm` changed since"""
+        return any(_mtime(path) != mtime for path, mtime in self._mtimes.items())
+
+    def serve_forever(self):
+        import signal
+        import socket
+        from bench.tqserver import _remove_stale_socket
+
+        if not self.modules:
+            self.warm()
+        _remove_stale_socket(self.socket_path)
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(0o077)
+        try:
+            listener.bind(self.socket_path)
+        finally:
+            os.umask(umask)
+        listener.listen(16)
+        # Workers are reaped by the kernel
+        signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+        try:
+            while True:
+                conn, _ = listener.accept()
+                with conn:
+                    if self.stale():
+                        # The client runs the request in-process meanwhile
+                        conn.close()
+                        listener.close()
+                        os.unlink(self.socket_path)
+                        os.execv(sys.executable, [sys.executable, '-m', __name__] + sys.argv[1:])
+                    self._accept(conn, listener)
+        finally:
+            listener.close()
+            try:
+                os.unlink(self.socket_path)
+            except FileNotFoundError:
+                pass
+
+    def _accept(self, conn, listener):
+        import socket
+        import struct
+
+        if hasattr(socket, 'SO_PEERCRED'):
+            creds = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+            if struct.unpack('3i', creds)[1] != os.getuid():
+                return
+        channel = _Channel(conn)
+        fds = []
+        try:
+            # A client that sends nothing only holds up the others this long
+            conn.settimeout(REQUEST_TIMEOUT)
+            fds = channel.recv_fds(len(_STDIO))
+            request = channel.recv()
+            if request is None or request[0] != b'run' or len(fds) != len(_STDIO):
+                return
+            tool = request[1].decode()
+            if tool not in self.modules:
+                return
+            conn.settimeout(None)
+            if os.fork() == 0:
+                listener.close()
+                self._work(channel, tool, request[2:], fds)
+        except (OSError, ValueError):
+            pass
+        finally:
+            for fd in fds:
+                os.close(fd)
+
+    def _work(self, channel: _Channel, tool: str, fields: List[bytes], fds: List[int]):
+        """Runs the request in this forked worker; never returns"""
+        global _worker_channel
+        import signal
+        import traceback
+
+        code = 1
+        try:
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            # Out of the helper's process group (and its terminal, if any), so
+            # that job control signals to the worker never stop the helper
+            os.setsid()
+            channel.send([b'pid', b'%d' % os.getpid()])
+            for target, fd in zip(_STDIO, fds):
+                os.dup2(fd, target)
+                os.close(fd)
+            sys.stdin = open(0, 'r', encoding=sys.stdin.encoding, errors=sys.stdin.errors, closefd=False)
+            sys.stdout = open(1, 'w', encoding=sys.stdout.encoding, errors=sys.stdout.errors, closefd=False)
+            sys.stderr = open(2, 'w', encoding=sys.stderr.encoding, errors='backslashreplace',
+                              buffering=1, closefd=False)
+            cwd, argc = fields[0], int(fields[1])
+            os.chdir(cwd)
+            sys.argv = [os.fsdecode(arg) for arg in fields[2:2 + argc]]
+            os.environ.clear()
+            for entry in fields[2 + argc:]:
+                name, _, value = entry.partition(b'=')
+                os.environb[name] = value
+            from bench.timestamp import TimeParser
+            TimeParser.LABEL_TO_PYTZ.reload()
+            _worker_channel = channel
+
+            try:
+                self.modules[tool].main()
+                code = 0
+            except SystemExit as e:
+                if e.code is None or isinstance(e.code, int):
+                    code = e.code or 0
+                else:
+                    print(e.code, file=sys.stderr)
+                    code = 1
+            except KeyboardInterrupt:
+                traceback.print_exc()
+                code = 130
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            for stream in (sys.stdout, sys.stderr):
+                try:
+                    stream.flush()
+                except OSError:
+                    code = code or 120
+            channel.send([b'exit', b'%d' % code])
+        finally:
+            os._exit(code)
+
+def main(args):
+    import argparse
+    parser = argparse.ArgumentParser(description="Serve the bench command line tools from a warm process.")
+    parser.add_argument('--socket', default=None,
+                        help=f'Unix socket to listen on (default: ${SOCKET_ENV_VAR}, or '
+                             f'bench-warm-<uid>.sock in $XDG_RUNTIME_DIR or /tmp)')
+    args = parser.parse_args(args)
+
+    server = WarmServer(args.socket or socket_path())
+    server.warm()
+    print(f"Serving {', '.join(server.tools)} on {server.socket_path}", flush=True)
+    try:
+        server.serve_forever()
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    # Serves from the bench.warm module rather than __main__, as that is the
+    # one whose `execvp` the tools call
+    from bench.warm import main
+    main(sys.argv[1:])
@@ -1,8 +1,12 @@
 #!/usr/bin/python3
 
+if __name__ == "__main__":
+    # Runs in the warm helper instead, if started (see bench.warm), before the imports below
+    from bench.warm import forward
+    forward('dfx')
+
 import sys
 import argparse
-from bench.data import CsvFormat, MdFormat
 
 def main():
     parser = argparse.ArgumentParser(description="Convert CSV to markdown")
@@ -44,6 +48,59 @@ def main():
         help="Comma sep list of 1-indexed cols to toggle backtick on"
     )
 
+    parser.add_argument(
+        '--tf-timestamp',
+        dest='transform_timestamp',
+        action='append',
+        default=[],
+        metavar='COL[:FIELD]',
+        help="Add a column with the time values of column COL (1-indexed or name) converted to FIELD, "
+             "e.g. epoch_ms or IST.standard (default: UTC.iso). May be repeated"
+    )
+
+    parser.add_argument(
+        '--tf-bucket',
+        dest='transform_bucket',
+        type=str,
+        default=None,
+        metavar='COL:EVERY',
+        help="Replace the table with time buckets of column COL (1-indexed or name), EVERY being "
+             "an interval (e.g. 30s, 5m, 1h, 7d) or a calendar unit (second, minute, hour, day, week, month, year)"
+    )
+
+    parser.add_argument(
+        '--bucket-agg',
+        dest='bucket_agg',
+        type=str,
+        default='count',
+        help="Comma sep list of aggregates per bucket: count or <count|sum|avg|min|max>:<column name> "
+             "(default: count)"
+    )
+
+    parser.add_argument(
+        '--bucket-by',
+        dest='bucket_by',
+        type=str,
+        default=None,
+        help="Comma sep list of column names to group by within each bucket"
+    )
+
+    parser.add_argument(
+        '--bucket-tz',
+        dest='bucket_tz',
+        type=str,
+        default=None,
+        help="Timezone label of the bucket boundaries, also assumed for naive time values (default: UTC)"
+    )
+
+    parser.add_argument(
+        '--bucket-fill',
+        dest='bucket_fill',
+        action='store_true',
+        help="Whether to add empty buckets, giving every group all buckets between the first and the last one "
+             "of the input"
+    )
+
     # Additional transforms while conversion
     parser.add_argument(
         '--md-colors',
@@ -77,6 +134,9 @@ Rules are applied in the given order
     )
 
     args = parser.parse_args()
+    # Imported once the arguments are valid: --help and usage errors need neither
+    from bench.data import CsvFormat, MdFormat
+
     content=args.input_file.read()
     if args.from_format == 'csv':
       table = CsvFormat.parse(content, parse_types=args.parse_types, trim_spaces=(not args.csv_preserve_spaces))
@@ -101,6 +161,39 @@ Rules are applied in the given order
               res = f'`{val}`'
             table[i][c] = res
 
+    if args.transform_timestamp:
+      from bench.timestamp import convert_time_column
+    for spec in args.transform_timestamp:
+      col, _, field = spec.partition(':')
+      cols = table.cols()
+      if col.isdigit() and 0 < int(col) <= len(cols):
+        col = cols[int(col) - 1]
+      errors = []
+      try:
+        convert_time_column(table, col, to=field or 'UTC.iso', errors=errors)
+      except ValueError as e:
+        print(f"Error: --tf-timestamp {spec}: {e}", file=sys.stderr)
+        sys.exit(1)
+      if errors:
+        print(f"Could not parse {len(errors)} value(s) of column {col}, e.g. '{errors[0]}'", file=sys.stderr)
+
+    if args.transform_bucket:
+      from bench.timebucket import bucket_table
+      col, _, every = args.transform_bucket.partition(':')
+      cols = table.cols()
+      if col.isdigit() and 0 < int(col) <= len(cols):
+        col = cols[int(col) - 1]
+      errors = []
+      try:
+        table = bucket_table(table, col, every, aggregates=args.bucket_agg.split(','),
+                             by=args.bucket_by.split(',') if args.bucket_by else None,
+                             tz_label=args.bucket_tz, fill=args.bucket_fill, errors=errors)
+      except ValueError as e:
+        print(f"Error: --tf-bucket {args.transform_bucket}: {e}", file=sys.stderr)
+        sys.exit(1)
+      if errors:
+        print(f"Skipped {len(errors)} row(s) with unparseable column {col}, e.g. '{errors[0]}'", file=sys.stderr)
+
     color_table=None
     if args.md_colors:
         color_table = parse_and_generate_color_table(args.md_colors, table.size(), table.ncols())
@@ -1,5 +1,6 @@
 import unittest
-from bench.data import CsvFormat
+import io
+from bench.data import CsvFormat, CsvWriter
 
 class TestCsvParsing(unittest.TestCase):
 
@@ -148,6 +149,17 @@ class TestCsvFormatting(unittest.TestCase):
             '40,-3.66667,1e-16'
         )
 
+class TestCsvWriter(unittest.TestCase):
+
+    def test_matches_render(self):
+        table = CsvFormat.parse("a,b\n1,\"x, y\"\n,true\n", parse_types=True)
+        out = io.StringIO()
+        writer = CsvWriter(out, table.cols())
+        writer.write(table.data()[0])
+        writer.write_rows(table.data()[1:])
+        writer.close()
+        self.assertEqual(out.getvalue(), CsvFormat.render(table) + '\n')
+
 if __name__ == "__main__":
     unittest.main()
 
@@ -123,6 +123,44 @@ class TestDataTable(unittest.TestCase):
         self.assertEqual(table.size(), 2)
         self.assertEqual(table.col(0), ["a","c"])
 
+    def test_version(self):
+        table = DataTable(1)
+        v0 = table.version()
+        table.append(["a"])
+        table.insert(0, ["b"])
+        v1 = table.version()
+        self.assertNotEqual(v0, v1)
+        table.get(0)
+        table.data()
+        self.assertEqual(table.version(), v1)
+        table.delete(0)
+        self.assertNotEqual(table.version(), v1)
+
+    def test_rows_copied(self):
+        # Changing an appended row does not change the table
+        table = DataTable(["a"])
+        row = ["x"]
+        table.append(row)
+        table.insert(0, row)
+        row[0] = "y"
+        self.assertEqual(table.data(), [["x"], ["x"]])
+
+    def test_add_col(self):
+        table = DataTable(["a"])
+        table.append([1])
+        table.append([2])
+        version = table.version()
+        table.add_col("b", ["x", None])
+        self.assertEqual(table.cols(), ["a", "b"])
+        self.assertEqual(table.data(), [[1, "x"], [2, None]])
+        self.assertEqual(table.get(1), {"a": 2, "b": None})
+        self.assertNotEqual(table.version(), version)
+        table.append([3, "y"])
+        with self.assertRaises(ValueError):
+            table.add_col("a", [1, 2, 3])
+        with self.assertRaises(ValueError):
+            table.add_col("c", [1])
+
     def test_restructure(self):
         table = DataTable(3)
         table.append(["a",1,True])
@@ -1,5 +1,6 @@
 import unittest
-from bench.data import MdFormat
+import io
+from bench.data import DataTable, MdFormat, MdWriter
 
 class TestMdParsing(unittest.TestCase):
 
@@ -129,5 +130,26 @@ class TestMdFormatting(unittest.TestCase):
             '| 40   | -3.66667 | 1e-16 |'
         )
 
+class TestMdWriter(unittest.TestCase):
+
+    def test_matches_render(self):
+        table = DataTable(['a', 'long name'])
+        table.append([1, 'x|y'])
+        table.append([None, 2.5])
+        out = io.StringIO()
+        writer = MdWriter(out, table.cols())
+        writer.write_rows(table.data())
+        writer.close()
+        self.assertEqual(out.getvalue(), MdFormat.render(table) + '\n')
+
+    def test_streams_after_buffer(self):
+        out = io.StringIO()
+        writer = MdWriter(out, ['v'], buffer_rows=1)
+        writer.write(['a'])
+        self.assertEqual(out.getvalue(), '| v   |\n| --- |\n| a   |\n')
+        writer.write(['longer'])
+        writer.close()
+        self.assertTrue(out.getvalue().endswith('| longer |\n'))
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,100 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+from bench.data import DataTable
+from bench.resultcache import ResultCache, file_fingerprint, is_deterministic, normalize_sql, table_fingerprint
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = ResultCache(os.path.join(self.tmpdir.name, 'cache'), max_bytes=100)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_normalize_sql(self):
+        self.assertEqual(normalize_sql("  select a,\n\t b  from t ;\n"), "select a, b from t")
+        self.assertEqual(normalize_sql("select 'x   y' from \"my  t\""), "select 'x   y' from \"my  t\"")
+        self.assertEqual(normalize_sql("select 1 -- x\n, 2 /* y\n */ from t"), "select 1 , 2 from t")
+        self.assertEqual(normalize_sql("select 1 -- x , 2"), "select 1")
+        self.assertEqual(normalize_sql("select '--x', \"/*\" from t -- ;"), "select '--x', \"/*\" from t")
+
+    def test_non_deterministic(self):
+        self.assertFalse(is_deterministic("select random() from t"))
+        self.assertFalse(is_deterministic("select datetime('now')"))
+        self.assertFalse(is_deterministic("select CURRENT_TIMESTAMP"))
+        self.assertTrue(is_deterministic("select randomness from t"))
+        for sql in ["select date()", "select TIME ( )", "select datetime()", "select julianday()",
+                    "select unixepoch()", "select strftime('%Y, %m')", "select strftime(fmt) from t"]:
+            self.assertFalse(is_deterministic(sql), sql)
+        for sql in ["select date(ts) from t", "select strftime('%Y', ts) from t", "select unixepoch('2025-01-01')"]:
+            self.assertTrue(is_deterministic(sql), sql)
+        self.assertIsNone(self.cache.key("select random()", {}))
+
+    def test_key(self):
+        key = self.cache.key("select * from t", {'t': 'fp1'}, csv=False)
+        self.assertEqual(key, self.cache.key("select *  from t;", {'t': 'fp1'}, csv=False))
+        self.assertNotEqual(key, self.cache.key("select * from t", {'t': 'fp2'}, csv=False))
+        self.assertNotEqual(key, self.cache.key("select * from t", {'t': 'fp1'}, csv=True))
+
+    def test_get_put(self):
+        self.assertIsNone(self.cache.get('k'))
+        self.cache.put('k', 'result')
+        self.assertEqual(self.cache.get('k'), 'result')
+
+    def test_lru_eviction(self):
+        self.cache.put('a', 'x' * 40)
+        self.cache.put('b', 'x' * 40)
+        past = time.time() - 100
+        os.utime(self.cache._path('a'), (past, past))
+        os.utime(self.cache._path('b'), (past + 1, past + 1))
+        self.cache.get('a')  # now most recently used
+        self.cache.put('c', 'x' * 40)
+        self.assertIsNotNone(self.cache.get('a'))
+        self.assertIsNone(self.cache.get('b'))
+        self.assertIsNotNone(self.cache.get('c'))
+
+    def test_fingerprints(self):
+        path = os.path.join(self.tmpdir.name, 'a.csv')
+        with open(path, 'w') as f:
+            f.write('a\n1\n')
+        before = file_fingerprint(path)
+        self.assertEqual(before, file_fingerprint(path))
+        with open(path, 'a') as f:
+            f.write('2\n')
+        self.assertNotEqual(before, file_fingerprint(path))
+
+        t1, t2 = DataTable(['a']), DataTable(['a'])
+        t1.append([1])
+        t2.append(['1'])
+        self.assertNotEqual(table_fingerprint(t1), table_fingerprint(t2))
+        t2.delete(0)
+        t2.append([1])
+        self.assertEqual(table_fingerprint(t1), table_fingerprint(t2))
+
+    def test_loader_options(self):
+        # Options changing how tables are loaded are part of the key
+        path = os.path.join(self.tmpdir.name, 't.csv')
+        with open(path, 'w') as f:
+            f.write('ts,v\n2025-01-01 00:00:00,1\n')
+        outputs = []
+        for options in ([], ['--as-epoch'], []):
+            result = subprocess.run([sys.executable, 'textquery.py', '--cache', '--cache-dir', self.tmpdir.name,
+                                     '--csv', f'--table=t:{path}'] + options + ['select * from t'],
+                                    cwd=ROOT, env=dict(os.environ, BENCH_WARM='0'), capture_output=True,
+                                    text=True, timeout=60)
+            self.assertEqual(result.returncode, 0, result.stderr)
+            outputs.append(result.stdout)
+        self.assertEqual(outputs[0], outputs[2])
+        self.assertNotEqual(outputs[0], outputs[1])
+        self.assertIn('ts_text', outputs[1])
+
+if __name__ == '__main__':
+    unittest.main()
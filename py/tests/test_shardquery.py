@@ -0,0 +1,124 @@
+import os
+import tempfile
+import unittest
+from bench.shardquery import plan_query, run_sharded, shard_files, sharded_query, _RangeReader
+from bench.textquery import CsvGlobSource, InMemoryDb, QueryStats
+
+class TestPlanQuery(unittest.TestCase):
+
+    def test_group_by(self):
+        plan = plan_query("select name, sum(v), avg(v) as m from t where v > 1 group by name order by 2 desc limit 3;")
+        self.assertEqual(plan.table, 't')
+        self.assertEqual(plan.partial_sql,
+                         'SELECT name AS g0, sum(v) AS a0, sum(v) AS a1, count(v) AS a2 FROM t WHERE v > 1 GROUP BY name')
+        self.assertEqual(plan.merge_sql,
+                         'SELECT g0 AS "name", sum(a0) AS "sum(v)", (sum(a1) * 1.0 / sum(a2)) AS "m" '
+                         'FROM partials GROUP BY g0 ORDER BY 2 desc LIMIT 3')
+
+    def test_expressions(self):
+        plan = plan_query("select upper(name) u, round(sum(v) * 1.0 / count(*), 2) from t group by u")
+        self.assertEqual(plan.partial_sql,
+                         'SELECT upper ( name ) AS g0, sum(v) AS a0, count(*) AS a1 FROM t GROUP BY upper ( name )')
+        self.assertEqual(plan.merge_sql, 'SELECT g0 AS "u", round ( sum(a0) * 1.0 / sum(a1) , 2 ) '
+                                         'AS "round(sum(v) * 1.0 / count(*), 2)" FROM partials GROUP BY g0')
+
+    def test_not_decomposable(self):
+        for sql in ["select * from t",
+                    "select a from t",
+                    "select a, b, count(*) from t group by a",
+                    "select a, count(distinct b) from t group by a",
+                    "select a, count(*) from t group by a having count(*) > 1",
+                    "select a, sum(x) from t join u using (id) group by a",
+                    "select a, sum(x) from (select * from t) group by a",
+                    "select sum(x) from t where a in (select a from u)",
+                    "select max(a, b) from t",
+                    "select k, group_concat(k) from t group by k",
+                    "select k, json_group_array(k) from t group by k",
+                    "select k, median(k), percentile(k, 50) from t group by k",
+                    "select k, approx_count_distinct(k) from t group by k",
+                    "select k, my_udf(k) from t group by k",
+                    "select v * 2 as d, count(*) from t where d > 90 group by d",
+                    'select k as "Key", sum(v) from t where "key" > 1 group by 1',
+                    "select sum(x) over () from t",
+                    "select group_concat(a) from t",
+                    "select count(*) from t; select 1"]:
+            self.assertIsNone(plan_query(sql), sql)
+
+class TestRunSharded(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.paths = []
+        for i in range(2):
+            path = os.path.join(self.tmpdir.name, f'part-{i}.csv')
+            with open(path, 'w') as f:
+                f.write('name,v\n')
+                for j in range(50):
+                    f.write(f'{"abc"[(i + j) % 3]},{i * 100 + j}\n')
+            self.paths.append(path)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _single(self, sql):
+        db = InMemoryDb({})
+        CsvGlobSource('t', os.path.join(self.tmpdir.name, '*.csv'), parse_types=False).load(db)
+        result = db.query(sql)
+        db.close()
+        return result
+
+    def test_shard_files(self):
+        shards = shard_files(self.paths, 3)
+        self.assertEqual(len(shards), 3)
+        lines = []
+        for shard in shards:
+            for path, start, end in shard:
+                reader = _RangeReader(path, start, end)
+                lines.extend(reader.read().decode().splitlines())
+                reader.close()
+        self.assertEqual(len(lines), 100)
+        self.assertEqual(len(set(lines)), 100)
+
+    def test_matches_single_process(self):
+        for sql in ["select name, sum(v), count(*), avg(v) a, min(v), max(v) from t where v > 3 group by name order by 1",
+                    "select count(*), total(v) from t",
+                    "select name, count(*) from t group by 1 order by count(*) desc, name limit 2"]:
+            stats = QueryStats()
+            result = run_sharded(plan_query(sql), self.paths, 3, stats=stats)
+            expected = self._single(sql)
+            self.assertEqual(result.cols(), expected.cols())
+            self.assertEqual(result.data(), expected.data())
+            self.assertEqual(stats.get('parse').rows, 100)
+
+    def test_other_aggregates(self):
+        # Aggregates outside the decomposed set are not re-applied to partial results
+        sql = "select name, group_concat(name) from t group by name"
+        self.assertIsNone(sharded_query(sql, self.paths, 3))
+
+    def test_where_alias(self):
+        # Select aliases in WHERE only exist in the full query: run in one process
+        sql = "select v * 2 as d, count(*) as n from t where d > 90 group by d order by d"
+        self.assertIsNone(sharded_query(sql, self.paths, 4))
+        self.assertGreater(self._single(sql).size(), 0)
+        sql = "select v * 2 as d, count(*) as n from t where v * 2 > 90 group by d order by d"
+        result = sharded_query(sql, self.paths, 4)
+        self.assertEqual(result.data(), self._single(sql).data())
+
+    def test_column_names(self):
+        # Unaliased bare columns are named as declared, like SQLite does
+        for sql in ["select NAME, count(*) from t group by NAME order by 1",
+                    'select "Name", sum(v) from t group by 1 order by 1']:
+            result = run_sharded(plan_query(sql), self.paths, 3)
+            expected = self._single(sql)
+            self.assertEqual(result.cols(), expected.cols())
+            self.assertEqual(result.cols()[0], 'name')
+            self.assertEqual(result.data(), expected.data())
+
+    def test_different_headers(self):
+        with open(self.paths[1], 'w') as f:
+            f.write('v,name\n1,a\n')
+        with self.assertRaises(ValueError):
+            run_sharded(plan_query("select count(*) from t"), self.paths, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+from bench.data import DataTable
+from bench.textquery import InMemoryDb
+
+class TestSqlFunctions(unittest.TestCase):
+
+    def setUp(self):
+        table = DataTable(["ts", "v", "w"])
+        table.append(["2025-01-01 00:00:00", 1, "1"])
+        table.append(["1735689612987", 2, None])
+        table.append(["2025-05-26 02:10:51", 3, "x"])
+        table.append(["not a time", 4, "4.5"])
+        self.db = InMemoryDb({"t": table}, shared=True)
+
+    def tearDown(self):
+        self.db.close()
+
+    def _col(self, sql):
+        return self.db.query(sql).col(0)
+
+    def test_ts_epoch(self):
+        self.assertEqual(self._col("select ts_epoch(ts) from t"), [1735689600, 1735689612.987, 1748225451, None])
+        self.assertEqual(self._col("select ts_epoch_ms(ts, 'PST') from t limit 1"), [1735718400000])
+        self.assertEqual(self._col("select ts_epoch(null)"), [None])
+        self.assertEqual(self.db.query("select ts_epoch('1e300'), ts_epoch(-1e20)").data(), [[None, None]])
+
+    def test_ts_format(self):
+        self.assertEqual(self._col("select ts_format(ts, 'IST') from t limit 1"), ['2025-01-01 05:30:00'])
+        self.assertEqual(self._col("select ts_format(ts, 'PST', 'iso') from t where rowid = 3"), ['2025-05-25T19:10:51-0700'])
+        self.assertEqual(self._col("select ts_format(ts, 'UTC', '%Y/%m') from t limit 1"), ['2025/01'])
+        self.assertEqual(self._col("select ts_format(ts, 'XYZ') from t limit 1"), [None])
+
+    def test_deterministic_in_index(self):
+        # Only deterministic functions are allowed in index expressions
+        conn = self.db._conn
+        conn.execute("create table e (ts text)")
+        conn.execute("create index e_epoch on e (ts_epoch(ts))")
+
+    def test_median_percentile(self):
+        self.assertEqual(self._col("select median(v) from t"), [2.5])
+        self.assertEqual(self._col("select percentile(v, 75) from t"), [3.25])
+        self.assertEqual(self._col("select percentile(v, 0) from t"), [1])
+        self.assertEqual(self._col("select median(v) from t where v > 100"), [None])
+        # Numeric text is used, NULLs and other text ignored
+        self.assertEqual(self._col("select median(w) from t"), [2.75])
+
+    def test_approx_count_distinct(self):
+        db = InMemoryDb({})
+        db._conn.execute("create table n (x)")
+        db._conn.executemany("insert into n values (?)", [(i % 20000,) for i in range(40000)])
+        estimate = db.query("select approx_count_distinct(x) from n").col(0)[0]
+        self.assertLess(abs(estimate - 20000) / 20000, 0.05)
+        self.assertEqual(db.query("select approx_count_distinct(x) from n where x < 10").col(0), [10])
+
+    def test_available_on_readers(self):
+        reader = self.db.reader()
+        self.assertEqual(self.db.query("select median(v) from t", conn=reader).col(0), [2.5])
+
+    def test_user_function(self):
+        self.db.register_function("double", lambda x: x * 2, 1)
+        self.assertEqual(self._col("select double(v) from t limit 1"), [2])
+        self.assertEqual(self.db.query("select double(v) from t limit 1", conn=self.db.reader()).col(0), [2])
+
+if __name__ == '__main__':
+    unittest.main()
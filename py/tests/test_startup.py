@@ -0,0 +1,66 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from importlib.resources import files
+from typing import Dict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def import_times(argv, stdin='', env=None) -> Dict[str, int]:
+    """Self time in microseconds of each module imported by running `argv` (python -X importtime)"""
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + argv, cwd=ROOT, input=stdin, env=env,
+                            capture_output=True, text=True, timeout=60)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = (part.strip() for part in line[len('import time:'):].split('|'))
+        times[name] = int(self_us)
+    return times
+
+class TestStartup(unittest.TestCase):
+    """
+    Keeps the startup of the command line tools within the budgets of
+    resources/startup_budget.json: modules that must not be imported, and
+    the number and total import time of modules beyond the interpreter's own.
+    """
+
+    RUNS = 3
+
+    @classmethod
+    def setUpClass(cls):
+        cls.budgets = json.loads(files('tests.resources').joinpath('startup_budget.json').read_text())
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        # Measure with bytecode cached, as installed tools run, without
+        # writing to the source tree
+        # In-process, even if a warm helper (bench.warm) is running
+        cls.env = dict(os.environ, tb=cls.tmpdir.name, BENCH_WARM='0')
+        cls.env.pop('PYTHONDONTWRITEBYTECODE', None)
+        cls.prefix = ['-X', f'pycache_prefix={os.path.join(cls.tmpdir.name, "pycache")}']
+        cls.baseline = set(import_times(cls.prefix + ['-c', 'pass'], env=cls.env))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmpdir.cleanup()
+
+    def test_budgets(self):
+        for name, budget in self.budgets.items():
+            with self.subTest(name):
+                argv = self.prefix + budget['argv']
+                stdin = budget.get('stdin', '')
+                import_times(argv, stdin, self.env)  # Warm up the bytecode cache
+                runs = []
+                for _ in range(self.RUNS):
+                    times = import_times(argv, stdin, self.env)
+                    runs.append({module: t for module, t in times.items() if module not in self.baseline})
+                modules = runs[0]
+                self.assertEqual(sorted(set(budget['forbidden']) & set(modules)), [])
+                self.assertLessEqual(len(modules), budget['max_modules'], sorted(modules))
+                # The fastest run, the others being slowed down by noise
+                self.assertLessEqual(min(sum(run.values()) for run in runs) / 1000, budget['max_ms'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,11 @@
+import io
+import os
+import tempfile
+import threading
 import unittest
-from bench.data import DataTable
-from bench.textquery import InMemoryDb, TypeInferer, SQLiteType, quick_query
+from array import array
+from bench.data import DataTable, CsvFormat
+from bench.textquery import InMemoryDb, TypeInferer, SQLiteType, quick_query, load_csv_files, CsvIngest, QueryStats, CsvFileSource, QuerySession, split_statements, parse_size, input_size, plan_memory, open_db, follow, parse_duration, CsvGlobSource, csv_source
 
 class TestInMemoryDb(unittest.TestCase):
 
@@ -101,6 +106,72 @@ class TestInMemoryDb(unittest.TestCase):
         self.assertEqual(actual_rows, expected_rows)
 
 
+class TestQueryColumns(unittest.TestCase):
+
+    def setUp(self):
+        self.db = InMemoryDb({})
+        self.db.load_csv('t', io.BytesIO(b'i,f,s,n\n1,1,a,1\n2,2.5,b,\n3,3,c,3\n'))
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_column_kinds(self):
+        result = self.db.query_columns('select i, f, s, n from t order by i', numpy=False, batch_size=1)
+        self.assertEqual(list(result), ['i', 'f', 's', 'n'])
+        self.assertEqual(result['i'], array('q', [1, 2, 3]))
+        self.assertEqual(result['f'], array('d', [1.0, 2.5, 3.0]))
+        self.assertEqual(result['s'], ['a', 'b', 'c'])
+        self.assertEqual(result['n'], ['1', None, '3'])  # NULLs make the column TEXT
+        self.assertEqual(self.db.stats.get('query').rows, 3)
+
+    def test_mixed_batches(self):
+        sql = "select column1 as v from (values (1), (2), (2.5), ('x'))"
+        self.assertEqual(self.db.query_columns(sql, numpy=False, batch_size=2)['v'], [1, 2, 2.5, 'x'])
+        sql = "select column1 as v from (values (1), (2.5), (3))"
+        self.assertEqual(self.db.query_columns(sql, numpy=False, batch_size=1)['v'], array('d', [1, 2.5, 3]))
+
+    def test_duplicate_columns(self):
+        with self.assertRaises(ValueError):
+            self.db.query_columns('select i, i from t')
+
+    def test_numpy(self):
+        try:
+            import numpy as np
+        except ImportError:
+            self.skipTest('numpy not installed')
+        result = self.db.query_columns('select i, f, s from t order by i')
+        self.assertEqual(result['i'].dtype, np.int64)
+        self.assertEqual(result['f'].tolist(), [1.0, 2.5, 3.0])
+        self.assertEqual(result['s'], ['a', 'b', 'c'])
+
+class TestQueryMany(unittest.TestCase):
+
+    def test_results_in_order(self):
+        table = DataTable(["n"])
+        for i in range(1000):
+            table.append([i])
+        db = InMemoryDb({"t": table}, shared=True)
+        queries = [f"select count(*) from t where n >= {i}" for i in range(0, 1000, 50)]
+        results = db.query_many(queries, max_workers=4)
+        self.assertEqual([r.data() for r in results], [[[1000 - i]] for i in range(0, 1000, 50)])
+        self.assertEqual(db.stats.get('query').rows, len(queries))
+
+    def test_needs_shared_db(self):
+        with self.assertRaises(ValueError):
+            InMemoryDb({}).query_many(["select 1"])
+
+    def test_read_only(self):
+        db = InMemoryDb({"t": DataTable(["n"])}, shared=True)
+        with self.assertRaises(Exception):
+            db.query_many(["insert into t values (1)"])
+
+class TestSplitStatements(unittest.TestCase):
+
+    def test_split_statements(self):
+        script = "select 1;\nselect ';' as x\n;\n-- lead\nselect 2; select 3;\n-- only a comment"
+        self.assertEqual(split_statements(script),
+                         ["select 1", "select ';' as x", "-- lead\nselect 2", "select 3"])
+
 class TestTypeInferer(unittest.TestCase):
     def test_all_integer(self):
         table = DataTable(["ID", "Age"])
@@ -136,6 +207,224 @@ class TestTypeInferer(unittest.TestCase):
         table.append(["Bob", 25, False])
         self.assertEqual(TypeInferer.infer(table), [SQLiteType.TEXT, SQLiteType.INTEGER, SQLiteType.INTEGER])
 
+    def test_timestamp_columns(self):
+        rows = [['2025-06-11 19:53:31', '2025-06-11', '2025', 'x', '2025-06-11T19:53:31+0530', None],
+                ['', '2025-13-01', '2026', '2025-06-11 19:53:31', '2025-06-11T19:53:31.5', None]]
+        types = [SQLiteType.TEXT] * 6
+        self.assertEqual(TypeInferer.timestamp_columns(rows, types), [0, 4])
+        self.assertEqual(TypeInferer.to_epoch('2025-06-11 19:53:31'), 1749671611)
+        self.assertEqual(TypeInferer.to_epoch('2025-06-11T19:53:31+0530'), 1749651811)
+        self.assertIsNone(TypeInferer.to_epoch(1749671611))
+
+class TestQueryStats(unittest.TestCase):
+
+    def test_stages_recorded(self):
+        db = InMemoryDb({})
+        content = b'a,b\n1,x\n2,y\n3,z\n'
+        db.load_csv('t', io.BytesIO(content))
+        db.query('select * from t where a > 1')
+        stats = {s.name: s for s in db.stats.stages()}
+        self.assertEqual([s.name for s in db.stats.stages()], ['read', 'parse', 'infer', 'insert', 'query'])
+        self.assertEqual(stats['read'].nbytes, len(content))
+        self.assertEqual(stats['parse'].rows, 3)
+        self.assertEqual(stats['insert'].rows, 3)
+        self.assertEqual(stats['query'].rows, 2)
+        self.assertAlmostEqual(db.stats.total_seconds(), sum(s.seconds for s in stats.values()))
+
+    def test_merge_and_render(self):
+        a, b = QueryStats(), QueryStats()
+        a.add('render', 0.5, rows=10)
+        b.add('render', 0.5, rows=10, nbytes=7)
+        b.add('custom', 1.0)
+        a.merge(b)
+        self.assertEqual(a.get('render').rows_per_sec(), 20.0)
+        table = a.to_table()
+        self.assertEqual(table.col('Stage'), ['render', 'custom', 'total'])
+        self.assertEqual(a.to_dict()['stages'][0]['bytes'], 7)
+
+    def test_explain(self):
+        db = InMemoryDb({'t': DataTable(['a'])})
+        plan = db.explain('select * from t')
+        self.assertEqual(plan.cols(), ['id', 'parent', 'detail'])
+        self.assertIn('SCAN t', plan.col('detail'))
+
+class TestCsvFileSource(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'log.csv')
+        self._write('a,b\n1,x\n2,y\n')
+        self.db = InMemoryDb({})
+        self.source = CsvFileSource('t', self.path)
+        self.assertEqual(self.source.load(self.db), 2)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _write(self, content, mode='w'):
+        with open(self.path, mode) as f:
+            f.write(content)
+
+    def _rows(self):
+        return self.db.query('select * from t').data()
+
+    def test_unchanged(self):
+        self.assertIsNone(self.source.refresh(self.db))
+
+    def test_append_complete_records_only(self):
+        self._write('3,z\n4,', mode='a')
+        self.assertEqual(self.source.refresh(self.db), 1)
+        self.assertEqual(self._rows(), [[1, 'x'], [2, 'y'], [3, 'z']])
+        self._write('w\n', mode='a')
+        self.assertEqual(self.source.refresh(self.db), 1)
+        self.assertEqual(self._rows()[-1], [4, 'w'])
+
+    def test_append_widens(self):
+        self._write('2.5,z\n', mode='a')
+        self.source.refresh(self.db)
+        self.assertEqual(self._rows(), [[1.0, 'x'], [2.0, 'y'], [2.5, 'z']])
+
+    def test_truncate_and_rewrite_reload(self):
+        self._write('a,b\n9,q\n')
+        self.assertEqual(self.source.refresh(self.db), 1)
+        self.assertEqual(self._rows(), [[9, 'q']])
+        # Same size prefix rewritten, then grown
+        self._write('a,b\n8,q\n7,r\n')
+        self.source.refresh(self.db)
+        self.assertEqual(self._rows(), [[8, 'q'], [7, 'r']])
+
+    def test_rotation_reload(self):
+        os.rename(self.path, self.path + '.1')
+        self.assertIsNone(self.source.refresh(self.db))
+        self._write('c\nnew\n')
+        self.source.refresh(self.db)
+        self.assertEqual(self.db.query('select * from t').cols(), ['c'])
+
+    def test_follow(self):
+        stop = threading.Event()
+        db = InMemoryDb({})
+        updates = follow(db, [CsvFileSource('t', self.path)], 0, stop)
+        self.assertEqual(next(updates), 2)
+        self._write('3,z\n', mode='a')
+        self.assertEqual(next(updates), 1)
+        self.assertEqual(db.query('select count(*) from t').data(), [[3]])
+        stop.set()
+        self.assertEqual(list(updates), [])
+
+    def test_parse_duration(self):
+        self.assertEqual(parse_duration('5'), 5)
+        self.assertEqual(parse_duration('5s'), 5)
+        self.assertEqual(parse_duration('500ms'), 0.5)
+        self.assertEqual(parse_duration('2m'), 120)
+        self.assertEqual(parse_duration('1.5h'), 5400)
+        for value in ('', 'x', '5d', '-1s'):
+            with self.assertRaises(ValueError):
+                parse_duration(value)
+
+class TestCsvGlobSource(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self._write('d1/part-1.csv', 'a,b\n1,x\n2,y\n')
+        self._write('d2/part-1.csv', 'b,a\nz,3\n')
+        self.pattern = os.path.join(self.tmpdir.name, '*', 'part-*.csv')
+        self.db = InMemoryDb({})
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _write(self, name, content):
+        path = os.path.join(self.tmpdir.name, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def _rows(self):
+        return self.db.query('select * from t order by a').data()
+
+    def test_union(self):
+        source = CsvGlobSource('t', self.pattern)
+        self.assertEqual(source.load(self.db), 3)
+        self.assertEqual(self._rows(), [[1, 'x'], [2, 'y'], [3, 'z']])
+
+    def test_parallel_source_column(self):
+        source = CsvGlobSource('t', self.pattern, source_column=True, max_workers=2)
+        source.load(self.db)
+        rows = self.db.query('select a, _source_file from t order by a').data()
+        self.assertEqual([os.path.relpath(r[1], self.tmpdir.name) for r in rows],
+                         ['d1/part-1.csv', 'd1/part-1.csv', 'd2/part-1.csv'])
+
+    def test_directory(self):
+        source = csv_source('t', os.path.join(self.tmpdir.name, 'd1'))
+        self.assertIsInstance(source, CsvGlobSource)
+        self.assertEqual(source.load(self.db), 2)
+
+    def test_header_mismatch(self):
+        self._write('d3/part-1.csv', 'a,c\n1,2\n')
+        with self.assertRaises(ValueError):
+            CsvGlobSource('t', self.pattern).load(self.db)
+        with self.assertRaises(ValueError):
+            CsvGlobSource('t', os.path.join(self.tmpdir.name, 'none', '*.csv')).load(self.db)
+
+    def test_refresh_only_changed_files(self):
+        source = CsvGlobSource('t', self.pattern)
+        source.load(self.db)
+        self.assertIsNone(source.refresh(self.db))
+        self._write('d3/part-1.csv', 'a,b\n4.5,w\n')
+        self.assertEqual(source.refresh(self.db), 1)
+        self.assertEqual(self._rows(), [[1.0, 'x'], [2.0, 'y'], [3.0, 'z'], [4.5, 'w']])
+        # Rewritten file: its 2 rows replaced by 1
+        path = self._write('d1/part-1.csv', 'a,b\n0,v\n')
+        os.utime(path, ns=(0, 0))
+        self.assertEqual(source.refresh(self.db), 3)
+        self.assertEqual(self._rows(), [[0.0, 'v'], [3.0, 'z'], [4.5, 'w']])
+        os.unlink(path)
+        self.assertEqual(source.refresh(self.db), 1)
+        self.assertEqual(self._rows(), [[3.0, 'z'], [4.5, 'w']])
+
+class TestSpill(unittest.TestCase):
+
+    def test_parse_size(self):
+        self.assertEqual(parse_size('512'), 512)
+        self.assertEqual(parse_size('64K'), 64 << 10)
+        self.assertEqual(parse_size('1.5g'), 3 << 29)
+        self.assertEqual(parse_size('4GB'), 4 << 30)
+        with self.assertRaises(ValueError):
+            parse_size('lots')
+
+    def test_plan_memory(self):
+        self.assertEqual(plan_memory(10 << 20, None), (False, True))
+        self.assertEqual(plan_memory(None, None), (False, True))
+        self.assertEqual(plan_memory(None, 1 << 30), (True, False))
+        self.assertEqual(plan_memory(1 << 30, 1 << 30), (True, False))
+        self.assertEqual(plan_memory(1 << 20, 1 << 30), (False, True))
+        self.assertEqual(plan_memory(200 << 20, 1 << 30), (False, False))
+
+    def test_input_size(self):
+        with tempfile.NamedTemporaryFile('wb', suffix='.csv') as f:
+            f.write(b'a,b\n1,2\n')
+            f.flush()
+            self.assertEqual(input_size([f.name]), 8)
+            self.assertEqual(input_size([f.name], io.BytesIO(b'abc')), 11)
+            with open(f.name, 'rb') as g:
+                self.assertEqual(input_size([], g), 8)
+        r, w = os.pipe()
+        with os.fdopen(r, 'rb') as pipe, os.fdopen(w, 'wb'):
+            self.assertIsNone(input_size([], pipe))
+
+    def test_on_disk_db(self):
+        db, parallel = open_db(None, 1 << 20, shared=True)
+        self.assertFalse(parallel)
+        tmpdir = db._tmpdir
+        self.assertTrue(os.path.isdir(tmpdir))
+        db.load_csv('t', io.BytesIO(b'a,b\n1,x\n2,y\n3,z\n'), batch_size=2)
+        self.assertEqual(db.query('select sum(a), max(b) from t').data(), [[6, 'z']])
+        self.assertEqual(db.query('pragma temp_store').data(), [[1]])
+        self.assertEqual(db.query_many(['select count(*) from t'])[0].data(), [[3]])
+        db.close()
+        self.assertFalse(os.path.exists(tmpdir))
+
 class TestQuickQuery(unittest.TestCase):
 
     def test_quick_query_works(self):
@@ -148,5 +437,153 @@ class TestQuickQuery(unittest.TestCase):
         self.assertEqual(result.cols(), ["a"])
         self.assertEqual(result.data(), [[30],[25]])
 
+    def test_quick_query_params(self):
+        table = DataTable(["Name", "Age"])
+        table.append(["Alice", 30])
+        table.append(["Bob", 25])
+        self.assertEqual(quick_query(table, "select Name from t where Age > ?", (26,)).data(), [["Alice"]])
+        self.assertEqual(quick_query(table, "select Name from t where Age < :age", {"age": 26}).data(), [["Bob"]])
+
+class TestQuerySession(unittest.TestCase):
+
+    def setUp(self):
+        self.session = QuerySession()
+        self.table = DataTable(["k", "v"])
+        self.table.append(["a", 1])
+        self.table.append(["b", 2])
+
+    def test_reuses_db_until_modified(self):
+        db = self.session.db(self.table)
+        self.assertIs(self.session.db(self.table), db)
+        self.assertEqual(self.session.query(self.table, "select sum(v) from t").data(), [[3]])
+
+        self.table.append(["c", 3])
+        self.assertIsNot(self.session.db(self.table), db)
+        self.assertEqual(self.session.query(self.table, "select sum(v) from t").data(), [[6]])
+        self.table.delete(0)
+        self.assertEqual(self.session.query(self.table, "select sum(v) from t").data(), [[5]])
+
+    def test_rows_changed_after_append(self):
+        # Appended rows are copied, so changing them leaves the table and its db as they are
+        row = ["d", 4]
+        self.table.append(row)
+        self.assertEqual(self.session.query(self.table, "select sum(v) from t").data(), [[7]])
+        row[1] = 40
+        self.assertEqual(self.session.query(self.table, "select sum(v) from t").data(), [[7]])
+        self.assertEqual(self.table.col("v"), [1, 2, 4])
+
+    def test_separate_tables(self):
+        other = DataTable(["k", "v"])
+        other.append(["z", 10])
+        self.assertEqual(self.session.query(self.table, "select count(*) from t").data(), [[2]])
+        self.assertEqual(self.session.query(other, "select count(*) from t").data(), [[1]])
+
+    def test_read_only(self):
+        with self.assertRaises(Exception):
+            self.session.query(self.table, "delete from t")
+        self.assertEqual(self.session.query(self.table, "select count(*) from t").data(), [[2]])
+
+class TestLoadCsvFiles(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.paths = {}
+        for name, content in [('a', 'k,v\na,1\nb,2\n'), ('b', 'k,w\na,x\n'), ('c', 'z\n1.5\n')]:
+            path = os.path.join(self.tmpdir.name, f'{name}.csv')
+            with open(path, 'w') as f:
+                f.write(content)
+            self.paths[name] = path
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _load(self, **kwargs):
+        db = InMemoryDb({})
+        load_csv_files(db, self.paths, **kwargs)
+        return db
+
+    def test_parallel_matches_serial(self):
+        serial = self._load(parse_types=True, max_workers=1)
+        parallel = self._load(parse_types=True, max_workers=3)
+        for name in self.paths:
+            sql = f'select * from {name}'
+            self.assertEqual(serial.query(sql).data(), parallel.query(sql).data())
+        result = parallel.query('select a.k, v, w from a join b using(k)')
+        self.assertEqual(result.data(), [['a', 1, 'x']])
+
+    def test_types_inferred_in_worker(self):
+        db = self._load(parse_types=True, max_workers=2)
+        self.assertEqual(db.query('select type from pragma_table_info("a")').data(), [['TEXT'], ['INTEGER']])
+        self.assertEqual(db.query('select type from pragma_table_info("c")').data(), [['REAL']])
+
+class TestCsvIngest(unittest.TestCase):
+
+    def _load(self, content, **options):
+        db = InMemoryDb({})
+        rows = db.load_csv('t', io.BytesIO(content.encode('utf-8')), **options)
+        return db, rows
+
+    def _types(self, db):
+        return [r[0] for r in db.query('select type from pragma_table_info("t")').data()]
+
+    def test_matches_datatable_path(self):
+        content = 'a,b,c,d\n1,2.5,x,true\n2,3,"y, z",false\n'
+        db, rows = self._load(content)
+        self.assertEqual(rows, 2)
+        reference = InMemoryDb({'t': CsvFormat.parse(content, parse_types=True)})
+        self.assertEqual(db.query('select * from t').data(), reference.query('select * from t').data())
+        self.assertEqual(self._types(db), self._types(reference))
+
+    def test_widening_after_sample(self):
+        content = 'a,b\n' + '1,1\n' * 5 + '2.5,x\n' + '3,4\n'
+        db, _ = self._load(content, sample_size=2, batch_size=2)
+        self.assertEqual(self._types(db), ['REAL', 'TEXT'])
+        self.assertEqual(db.query('select * from t').data(),
+                         [[1.0, '1']] * 5 + [[2.5, 'x'], [3.0, '4']])
+
+    def test_text_stream_without_parsing(self):
+        db = InMemoryDb({})
+        db.load_csv('t', io.StringIO('a,b\n1, 2\n\n'), parse_types=False, trim_spaces=True)
+        self.assertEqual(self._types(db), ['TEXT', 'TEXT'])
+        self.assertEqual(db.query('select * from t').data(), [['1', '2']])
+
+    def test_small_chunks(self):
+        # Records and multi-byte characters split across read chunks
+        from bench.textquery import _iter_lines
+        content = 'k,v\nä,"multi\nline"\nb,2'.encode('utf-8')
+        lines = list(_iter_lines(io.BytesIO(content), chunk_size=3))
+        self.assertEqual(''.join(lines), content.decode('utf-8'))
+
+    def test_as_epoch(self):
+        content = 'ts,v\n2025-06-11 19:53:31,1\n2025-06-11 19:54:31.5,2\nsoon,3\n'
+        db, _ = self._load(content, as_epoch=True, sample_size=2, batch_size=1)
+        self.assertEqual(db.query('select ts, ts_text, v from t').data(),
+                         [[1749671611.0, '2025-06-11 19:53:31', 1], [1749671671.5, '2025-06-11 19:54:31.5', 2],
+                          [None, 'soon', 3]])
+        self.assertEqual(self._types(db), ['REAL', 'TEXT', 'INTEGER'])
+        self.assertIn('USING INDEX t__ts', db.explain('select v from t where ts > 1749671611').data()[0][2])
+        db, _ = self._load('ts\n2025-06-11\nlater\n', as_epoch=True, sample_size=1)
+        self.assertEqual(self._types(db), ['INTEGER', 'TEXT'])
+
+    def test_as_epoch_parallel(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            paths = {}
+            for name in ('a', 'b'):
+                paths[name] = os.path.join(tmpdir, f'{name}.csv')
+                with open(paths[name], 'w') as f:
+                    f.write('ts,v\n2025-06-11 19:53:31,1\n')
+            db = InMemoryDb({})
+            load_csv_files(db, paths, max_workers=2, as_epoch=True)
+            self.assertEqual(db.query('select a.ts, b.ts_text, b.v from a join b using (ts)').data(),
+                             [[1749671611, '2025-06-11 19:53:31', '1']])
+
+    def test_invalid_input(self):
+        with self.assertRaises(ValueError):
+            self._load('')
+        with self.assertRaises(ValueError):
+            self._load('a,a\n1,2\n')
+        with self.assertRaises(ValueError):
+            self._load('a,b\n1\n')
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,119 @@
+import unittest
+
+from bench.data import DataTable
+from bench.timebucket import Bucketing, bucket_table
+
+class TestBucketing(unittest.TestCase):
+
+    def test_fixed(self):
+        bucketing = Bucketing('15m')
+        self.assertEqual(bucketing.start(3600 + 20 * 60 + 7), 3600 + 15 * 60)
+        self.assertEqual(bucketing.next(3600), 3600 + 15 * 60)
+
+    def test_calendar(self):
+        # 2024-02-29 12:00:00 (a Thursday)
+        wall = 1709208000
+        self.assertEqual(Bucketing('week').start(wall), 1708905600)  # Monday 2024-02-26
+        self.assertEqual(Bucketing('month').start(wall), 1706745600)  # 2024-02-01
+        self.assertEqual(Bucketing('month').next(1701388800), 1704067200)  # December -> January
+        self.assertEqual(Bucketing('year').next(1704067200), 1735689600)
+
+    def test_invalid(self):
+        for every in ['', '0m', '5', '1w', 'days', '1.5h']:
+            with self.assertRaises(ValueError, msg=every):
+                Bucketing(every)
+
+class TestBucketTable(unittest.TestCase):
+
+    def _table(self, rows):
+        table = DataTable(['ts', 'host', 'bytes'])
+        for row in rows:
+            table.append(row)
+        return table
+
+    def test_aggregates(self):
+        table = self._table([['2024-06-01 00:00:05', 'a', '10'],
+                             ['2024-06-01 00:00:50', 'b', None],
+                             ['2024-06-01 00:01:10', 'a', '2.5'],
+                             ['2024-06-01 00:00:30', 'a', '4']])
+        result = bucket_table(table, 'ts', '1m', ['count', 'count:bytes', 'sum:bytes', 'avg:bytes',
+                                                  'min:bytes', 'max:bytes'])
+        self.assertEqual(result.cols(), ['bucket', 'count', 'count(bytes)', 'sum(bytes)', 'avg(bytes)',
+                                         'min(bytes)', 'max(bytes)'])
+        self.assertEqual(result.data(), [['2024-06-01 00:00:00', 3, 2, 14, 7.0, 4, 10],
+                                         ['2024-06-01 00:01:00', 1, 1, 2.5, 2.5, 2.5, 2.5]])
+
+    def test_group_by_and_fill(self):
+        table = self._table([['2024-06-01 00:00:05', 'a', 1],
+                             ['2024-06-01 00:30:00', 'b', 2],
+                             ['2024-06-01 00:45:00', None, 3]])
+        result = bucket_table(table, 0, '15m', ['count', 'sum:bytes'], by=['host'], fill=True)
+        self.assertEqual(result.cols(), ['bucket', 'host', 'count', 'sum(bytes)'])
+        self.assertEqual(result.data(), [['2024-06-01 00:00:00', None, 0, None],
+                                         ['2024-06-01 00:00:00', 'a', 1, 1],
+                                         ['2024-06-01 00:00:00', 'b', 0, None],
+                                         ['2024-06-01 00:15:00', None, 0, None],
+                                         ['2024-06-01 00:15:00', 'a', 0, None],
+                                         ['2024-06-01 00:15:00', 'b', 0, None],
+                                         ['2024-06-01 00:30:00', None, 0, None],
+                                         ['2024-06-01 00:30:00', 'a', 0, None],
+                                         ['2024-06-01 00:30:00', 'b', 1, 2],
+                                         ['2024-06-01 00:45:00', None, 1, 3],
+                                         ['2024-06-01 00:45:00', 'a', 0, None],
+                                         ['2024-06-01 00:45:00', 'b', 0, None]])
+
+    def test_fill_range(self):
+        # Groups with disjoint ranges are both filled over the range of the whole table
+        table = self._table([['2024-06-01 00:00:00', 'a', 1],
+                             ['2024-06-01 00:10:00', 'a', 1],
+                             ['2024-06-01 00:20:00', 'b', 1],
+                             ['2024-06-01 00:30:00', 'b', 1]])
+        result = bucket_table(table, 'ts', '10m', by=['host'], fill=True)
+        self.assertEqual([row[1:] for row in result.data()],
+                         [['a', 1], ['b', 0], ['a', 1], ['b', 0], ['a', 0], ['b', 1], ['a', 0], ['b', 1]])
+
+    def test_zone(self):
+        # Epoch millis around the DST start of 2024-03-10 in PST; days are
+        # bucketed in local time, naive strings read as local time
+        table = self._table([[1710061200000, 'a', 1],   # 2024-03-10 01:00 PST
+                             [1710064800000, 'a', 1],   # 2024-03-10 03:00 PDT
+                             [1710054000000, 'a', 1]])  # 2024-03-09 23:00 PST
+        self.assertEqual(bucket_table(table, 'ts', 'day', tz_label='PST').data(),
+                         [['2024-03-09 00:00:00', 1], ['2024-03-10 00:00:00', 2]])
+        self.assertEqual(bucket_table(table, 'ts', '1h', tz_label='PST').data(),
+                         [['2024-03-09 23:00:00', 1], ['2024-03-10 01:00:00', 1], ['2024-03-10 03:00:00', 1]])
+        self.assertEqual(bucket_table(table, 'ts', 'day').data(),
+                         [['2024-03-10 00:00:00', 3]])
+        table = self._table([['2024-03-10 23:30:00', 'a', 1]])
+        self.assertEqual(bucket_table(table, 'ts', 'day', tz_label='PST').data(), [['2024-03-10 00:00:00', 1]])
+        self.assertEqual(bucket_table(table, 'ts', 'day', tz_label='IST', source_tz_label='PST').data(),
+                         [['2024-03-11 00:00:00', 1]])
+
+    def test_errors(self):
+        errors = []
+        table = self._table([['2024-06-01', 'a', 1], ['nope', 'a', 1], [None, 'a', 1]])
+        self.assertEqual(bucket_table(table, 'ts', 'month', errors=errors).data(), [['2024-06-01 00:00:00', 1]])
+        self.assertEqual(errors, ['nope'])
+        for col, every, aggregates, by, tz_label in (('x', '1h', None, None, None),
+                                                     ('ts', '1x', None, None, None),
+                                                     ('ts', '1h', ['sum'], None, None),
+                                                     ('ts', '1h', ['median:bytes'], None, None),
+                                                     ('ts', '1h', ['sum:x'], None, None),
+                                                     ('ts', '1h', None, ['x'], None),
+                                                     ('ts', '1h', None, None, 'XYZ'),
+                                                     ('ts', '1h', ['sum:host'], None, None)):
+            with self.assertRaises(ValueError):
+                bucket_table(table, col, every, aggregates, by, tz_label)
+
+    def test_day_of_seconds(self):
+        table = DataTable(['ts', 'v'])
+        start = 1717200000  # 2024-06-01 00:00:00 UTC
+        for i in range(86400):
+            table.append([start + i, i % 10])
+        result = bucket_table(table, 'ts', '5m', ['count', 'sum:v'])
+        self.assertEqual(result.size(), 288)
+        self.assertEqual(result.data()[0], ['2024-06-01 00:00:00', 300, 1350])
+        self.assertEqual(result.data()[-1], ['2024-06-01 23:55:00', 300, 1350])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,12 @@
+import os
+import random
+import tempfile
 import unittest
 import time
+from datetime import datetime, timedelta, timezone
 
-from bench.timestamp import TimeOutput, TimeParser, convert_time_output_to_data_table, parse_time
+from bench.data import DataTable
+from bench.timestamp import TimeFields, TimeOutput, TimeParser, ZoneRegistry, convert_time_column, convert_time_output_to_data_table, parse_time
 
 class TestTimestampParsing(unittest.TestCase):
     def test_day_parse(self):
@@ -129,6 +134,209 @@ class TestTimestampParsing(unittest.TestCase):
              ['PST', 'iso', '2025-05-26T02:10:51-0700']]
         )
 
+    def test_lazy_formatting(self):
+        output = parse_time('2025-05-26 02:10:51', 'PST')
+        self.assertEqual(output._formatted, {})
+        self.assertEqual(output.format('IST', 'iso'), '2025-05-26T14:40:51+0530')
+        self.assertEqual(list(output._formatted), [('IST', 'iso')])
+        self.assertEqual(list(output._zone_times), ['IST'])
+        self.assertEqual(output.tz_times['IST'][2], '2025-05-26T14:40:51+0530')
+        self.assertEqual(output.tz_times['UTC'][:2], ['2025-05-26 09:10:51', '2025-05-26 09:10:51.000000'])
+        self.assertEqual(list(output.tz_times), ['UTC', 'IST', 'PST'])
+        with self.assertRaises(KeyError):
+            output.tz_times['JST']
+
+class TestZoneRegistry(unittest.TestCase):
+    DEFAULTS = {'UTC': 'UTC', 'IST': 'Asia/Kolkata'}
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'zones')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _registry(self, content=None, env=''):
+        if content is not None:
+            with open(self.path, 'w') as f:
+                f.write(content)
+        return ZoneRegistry(self.DEFAULTS, {ZoneRegistry.FILE_ENV_VAR: self.path, ZoneRegistry.ENV_VAR: env})
+
+    def test_defaults(self):
+        self.assertEqual(dict(self._registry()), self.DEFAULTS)
+
+    def test_file_and_env(self):
+        registry = self._registry('# team zones\nJST = Asia/Tokyo\n\nIST=Asia/Calcutta  # old name\n',
+                                  'CET=Europe/Berlin, JST=Japan')
+        self.assertEqual(dict(registry), {'UTC': 'UTC', 'IST': 'Asia/Calcutta', 'JST': 'Japan',
+                                          'CET': 'Europe/Berlin'})
+        self.assertEqual(registry.select(['JST', 'UTC']), {'JST': 'Japan', 'UTC': 'UTC'})
+        with self.assertRaises(ValueError):
+            registry.select(['UTC', 'XYZ'])
+
+    def test_lazy(self):
+        registry = self._registry()
+        with open(self.path, 'w') as f:
+            f.write('JST=Asia/Tokyo\n')
+        self.assertIn('JST', registry)  # Read on first use, not on creation
+        os.unlink(self.path)
+        self.assertIn('JST', registry)
+        registry.reload()
+        self.assertNotIn('JST', registry)
+
+    def test_invalid(self):
+        for content, env in (('JST\n', ''), ('=Asia/Tokyo\n', ''), ('JST=Asia/Nowhere\n', ''), ('', 'JST')):
+            with self.assertRaises(ValueError):
+                len(self._registry(content, env))
+
+    def test_parse_time_zones(self):
+        output = parse_time('2025-05-26 02:10:51', 'PST', zones=['IST', 'UTC'])
+        self.assertEqual(list(output.tz_times), ['IST', 'UTC'])
+        self.assertEqual(output.format('IST', 'standard'), '2025-05-26 14:40:51')
+        with self.assertRaises(ValueError):
+            parse_time('2025', zones=['XYZ'])
+
+class TestParseTimeString(unittest.TestCase):
+    def _sequential(self, value):
+        """Reference: every format tried in order, without shape dispatch"""
+        for fmt in TimeParser.DATETIME_INPUT_FORMATS + TimeParser.PARTIAL_DATE_FORMATS:
+            try:
+                return datetime.strptime(value, fmt)
+            except ValueError:
+                continue
+        return None
+
+    def test_matches_sequential(self):
+        values = ['2025-05-26 02:10:51', '2025-05-26 02:10:51.25', '2025-05-26T02:10:51',
+                  '2025-05-26T02:10:51.123456', '2025-05-26T02:10:51Z', '2025-05-26T02:10:51+05:30',
+                  '2025-05-26T02:10:51-0700', '2025-05-26T02:10:51-00:30', '2025-05-26T02:10:51+0000',
+                  '2025-05-26 02:10:51.1', '2025-05-26T23:59:59.999999', '2025-05-26', '2025-05', '2025',
+                  # Not canonical: handled by the sequential fallback
+                  '2025-5-6 2:10:51', '2025-05-26T02:10:51+05:30:15', '2025-5']
+        # Alternate shapes, so that the remembered shape both hits and misses
+        for value in values + values[::-1]:
+            self.assertEqual(TimeParser.parse_time_string(value), self._sequential(value), value)
+
+    def test_invalid(self):
+        for value in ['2025-13-01', '2025-02-30 00:00:00', '2025-05-26 02:10', '2025-05-26 24:00:00',
+                      '2025-05-26T02:10:51+05:60', '2025-05-26T02:10:51+24:00', '0000', 'abc', '']:
+            with self.assertRaises(ValueError):
+                TimeParser.parse_time_string(value)
+
+    def test_epoch_and_year(self):
+        self.assertEqual(TimeParser.parse('1748250651').timestamp(), 1748250651)
+        self.assertEqual(TimeParser.parse('1748250651123').timestamp(), 1748250651.123)
+        self.assertEqual(TimeParser.parse('2025').year, 2025)
+
+    def test_epochs(self):
+        # The epoch fast path gives what fromtimestamp gives, in every precision
+        utc = timezone.utc
+        for value, seconds in [('1748250651', 1748250651), ('1748250651.4853065', 1748250651.4853065),
+                               ('1748250651123', 1748250651.123), ('1748250651123456', 1748250651.123456),
+                               ('1748250651123456789', 1748250651.123456789), ('1e9', 1e9), (' 10000000 ', 1e7)]:
+            expected = datetime.fromtimestamp(seconds, tz=utc)
+            self.assertEqual(TimeParser.parse(value, 'PST'), expected, value)
+            self.assertEqual(TimeParser.parse_value(value), expected, value)
+            self.assertEqual(TimeParser.parse(value).utcoffset(), timedelta(0), value)
+        for value in ['9999999', '-1748250651', 'nan', '999999999999', '1e300', '-1e20', 'inf']:
+            with self.assertRaises(ValueError, msg=value):
+                TimeParser.parse(value)
+
+    def test_remembers_shape(self):
+        TimeParser.parse_time_string('2025-05-26T02:10:51Z')
+        self.assertEqual(TimeParser.INPUT_SHAPES[TimeParser._last_shape][1], "%Y-%m-%dT%H:%M:%S%z")
+        TimeParser.parse_time_string('2025-05')
+        self.assertEqual(TimeParser.INPUT_SHAPES[TimeParser._last_shape][1], "%Y-%m")
+
+class TestTimeFields(unittest.TestCase):
+    def test_fields(self):
+        fields = TimeFields(['input', 'epoch_seconds', 'epoch_ms', 'epoch_micros', 'UTC.iso', 'IST.standard', 'PST.micros'])
+        self.assertEqual(fields.row('1735689612987654'),
+            ['1735689612987654', 1735689612, 1735689612987, 1735689612987654,
+             '2025-01-01T00:00:12+0000', '2025-01-01 05:30:12', '2024-12-31 16:00:12.987654'])
+
+    def test_matches_time_output(self):
+        output = parse_time('2025-05-26 02:10:51', 'PST')
+        fields = TimeFields(['epoch_ms', 'IST.iso'], 'PST')
+        self.assertEqual(fields.row('2025-05-26 02:10:51'), [output.epoch_millis, output.tz_times['IST'][2]])
+
+    def test_convert_errors(self):
+        errors = []
+        rows = list(TimeFields(['input', 'epoch_seconds']).convert(['2025', 'nope', '1e300', 'inf'], errors))
+        self.assertEqual(rows, [['2025', 1735689600], ['nope', None], ['1e300', None], ['inf', None]])
+        self.assertEqual(errors, ['nope', '1e300', 'inf'])
+
+    def test_unknown(self):
+        for fields, tz in ((['XYZ.iso'], None), (['UTC.short'], None), (['epoch'], None), ([], None),
+                           (['input'], 'XYZ')):
+            with self.assertRaises(ValueError):
+                TimeFields(fields, tz)
+
+class TestConvertTimeColumn(unittest.TestCase):
+    def _table(self, values):
+        table = DataTable(['id', 'ts'])
+        for i, value in enumerate(values):
+            table.append([i, value])
+        return table
+
+    def test_epoch_column(self):
+        # Precision is detected once: 1748250651 is read as millis like the rest
+        table = self._table([1748250651000, '1748250652500', None, 1748250651])
+        convert_time_column(table, 'ts', 'UTC.micros', numpy=False)
+        self.assertEqual(table.cols(), ['id', 'ts', 'ts_UTC.micros'])
+        self.assertEqual(table.col(2), ['2025-05-26 09:10:51.000000', '2025-05-26 09:10:52.500000',
+                                        None, '1970-01-21 05:37:30.651000'])
+
+    def test_matches_parse_time(self):
+        values = ['1748250651', '1748250651123', '1748250651123456', '1748250651123456789']
+        for to in ['epoch_seconds', 'epoch_ms', 'epoch_micros', 'UTC.standard', 'UTC.iso', 'PST.micros']:
+            for value in values:
+                table = self._table([value])
+                convert_time_column(table, 1, to, dest='out', numpy=False)
+                self.assertEqual(table.col('out'), next(TimeFields([to]).convert([value])), (to, value))
+
+    def test_strings(self):
+        errors = []
+        table = self._table(['2025-05-26 02:10:51', '2025', 'nope', None])
+        convert_time_column(table, 'ts', 'epoch_seconds', source_tz_label='PST', errors=errors)
+        self.assertEqual(table.col('ts_epoch_seconds'), [1748250651, 1735718400, None, None])
+        self.assertEqual(errors, ['nope'])
+
+    def test_invalid(self):
+        table = self._table(['2025'])
+        for col, to in (('x', 'UTC.iso'), (2, 'UTC.iso'), ('ts', 'XYZ.iso')):
+            with self.assertRaises(ValueError):
+                convert_time_column(table, col, to)
+        convert_time_column(table, 'ts')
+        with self.assertRaises(ValueError):
+            convert_time_column(table, 'ts')
+
+    def test_numpy(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest('numpy not installed')
+        values = [1748250651123, 1748250652000, '1748250652999', 1]
+        for to in ['epoch_seconds', 'epoch_ms', 'epoch_micros', 'UTC.standard', 'UTC.micros', 'UTC.iso', 'PST.iso', 'IST.micros']:
+            table = self._table(values)
+            convert_time_column(table, 'ts', to, dest='numpy', numpy=True)
+            convert_time_column(table, 'ts', to, dest='python', numpy=False)
+            self.assertEqual(table.col('numpy'), table.col('python'), to)
+
+    def test_numpy_fractions(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest('numpy not installed')
+        rng = random.Random(0)
+        values = [1134103241.4853065, '1748250651.0000005', 1748250651.0000015, -1.5e-6]
+        values += [rng.randint(0, 2 * 10 ** 15) / 1e6 for _ in range(10000)]
+        for to in ['epoch_ms', 'epoch_micros', 'UTC.micros']:
+            table = self._table(values)
+            convert_time_column(table, 'ts', to, dest='numpy', numpy=True)
+            convert_time_column(table, 'ts', to, dest='python', numpy=False)
+            self.assertEqual(table.col('numpy'), table.col('python'), to)
+
 if __name__ == "__main__":
     unittest.main()
 
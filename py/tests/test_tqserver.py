@@ -0,0 +1,62 @@
+import os
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from bench.textquery import CsvFileSource
+from bench.tqserver import QueryServer, send_request
+
+class TestQueryServer(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'a.csv')
+        with open(self.path, 'w') as f:
+            f.write('k,v\na,1\nb,2\n')
+        self.socket_path = os.path.join(self.tmpdir.name, 'tq.sock')
+        self.server = QueryServer([CsvFileSource('t', self.path)], self.socket_path,
+                                  pool_size=2, interval=3600)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        while not os.path.exists(self.socket_path):
+            self.thread.join(0.01)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.thread.join()
+        self.tmpdir.cleanup()
+
+    def _query(self, query, **options):
+        return send_request(self.socket_path, {'query': query, **options}, timeout=10)
+
+    def test_query(self):
+        response = self._query('select * from t', csv=True)
+        self.assertTrue(response['ok'])
+        self.assertEqual(response['stdout'], 'k,v\na,1\nb,2')
+        self.assertEqual(response['stderr'], '')
+
+    def test_error(self):
+        response = self._query('select * from missing')
+        self.assertFalse(response['ok'])
+        self.assertIn('no such table', response['stderr'])
+
+    def test_read_only(self):
+        response = self._query("insert into t values ('c', 3)")
+        self.assertFalse(response['ok'])
+
+    def test_diagnostics(self):
+        response = self._query('select * from t', profile=True, explain=True)
+        self.assertIn('| query', response['stderr'])
+        self.assertIn('SCAN t', response['stderr'])
+
+    def test_reload_and_concurrent_clients(self):
+        with open(self.path, 'a') as f:
+            f.write('c,3\n')
+        self.server.refresh()
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            responses = list(pool.map(lambda _: self._query('select count(*) from t', csv=True), range(8)))
+        self.assertEqual({r['stdout'] for r in responses}, {'count(*)\n3'})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import io
+import os
+import tempfile
+import unittest
+
+from bench.data import DataTable
+from bench.textquery import InMemoryDb
+from bench.tqshell import Shell
+
+class TestShell(unittest.TestCase):
+
+    def setUp(self):
+        table = DataTable(["k", "v"])
+        table.append(["a", 1])
+        table.append(["b", 2])
+        self.db = InMemoryDb({"t": table})
+
+    def _run(self, script):
+        out = io.StringIO()
+        Shell(self.db, stdin=io.StringIO(script), stdout=out).run()
+        return out.getvalue()
+
+    def test_multiline_query(self):
+        out = self._run("select k\n  from t\n  where v > 1;\n")
+        self.assertEqual(out, "| k   |\n| --- |\n| b   |\n")
+
+    def test_unterminated_query_at_eof(self):
+        self.assertEqual(self._run("select count(*) as n from t"), "| n   |\n| --- |\n| 2   |\n")
+
+    def test_mode_and_timer(self):
+        out = self._run(".mode csv\n.timer on\nselect k from t;\n")
+        self.assertTrue(out.startswith("k\na\nb\nTime: query "))
+
+    def test_load_schema_drop(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'u.csv')
+            with open(path, 'w') as f:
+                f.write('x,y\n1,2\n')
+            out = self._run(f".mode csv\n.load u {path}\n.schema u\n.drop t\n.tables\n")
+        self.assertEqual(out.splitlines()[1:], ["name,type", "x,TEXT", "y,TEXT", "name", "u"])
+
+    def test_errors_continue(self):
+        out = self._run("select nope from t;\n.bogus\n.load x /does/not/exist\nselect 1 as one;\n")
+        lines = out.splitlines()
+        self.assertTrue(lines[0].startswith("Error: no such column"))
+        self.assertTrue(lines[1].startswith("Invalid command: .bogus"))
+        self.assertTrue(lines[2].startswith("Error: "))
+        self.assertEqual(lines[3:], ["| one |", "| --- |", "| 1   |"])
+
+    def test_statements_without_result(self):
+        out = self._run("create table u as select * from t;\ninsert into u values ('c', 3);\n"
+                        "update u set v = v + 1 where v > 1;\ndrop table t;\nselect sum(v) as s from u;\n")
+        self.assertEqual(out.splitlines(), ["OK", "1 rows changed", "2 rows changed", "OK",
+                                            "| s   |", "| --- |", "| 8   |"])
+
+    def test_quit(self):
+        self.assertEqual(self._run(".quit\nselect 1;\n"), "")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import random
+import unittest
+from datetime import datetime, timedelta, timezone
+
+import pytz
+
+from bench.tztable import ZoneTable, zone_table
+
+ZONES = ['UTC', 'Asia/Kolkata', 'America/Los_Angeles', 'Europe/London', 'Australia/Lord_Howe',
+         'America/St_Johns', 'Etc/GMT+5']
+
+FORMATS = {
+    'standard': "%Y-%m-%d %H:%M:%S",
+    'micros': "%Y-%m-%d %H:%M:%S.%f",
+    'iso': "%Y-%m-%dT%H:%M:%S%z",
+}
+
+def _from_epoch(seconds, micros=0):
+    return datetime(1970, 1, 1) + timedelta(seconds=seconds, microseconds=micros)
+
+class TestZoneTable(unittest.TestCase):
+
+    def test_cached(self):
+        self.assertIs(zone_table('Asia/Kolkata'), zone_table('Asia/Kolkata'))
+
+    def test_format_matches_pytz(self):
+        rng = random.Random(1)
+        for name in ZONES:
+            tz, table = pytz.timezone(name), zone_table(name)
+            # Around every transition, and at random instants
+            epochs = [t + d for t in table.transitions[1:] for d in (-3601, -1, 0, 1, 3600)]
+            epochs += [rng.randint(-3_000_000_000, 5_000_000_000) for _ in range(200)]
+            for epoch in epochs:
+                dt = _from_epoch(epoch, rng.randint(0, 999_999)).replace(tzinfo=timezone.utc)
+                for fmt_name, fmt in FORMATS.items():
+                    self.assertEqual(table.format(dt, fmt_name), dt.astimezone(tz).strftime(fmt), (name, dt))
+                self.assertEqual(table.local(dt), dt.astimezone(tz).replace(tzinfo=None))
+
+    def test_localize_matches_pytz(self):
+        for name in ZONES:
+            tz, table = pytz.timezone(name), zone_table(name)
+            for k in range(1, len(table.transitions)):
+                # Wall-clock times around the transition on both of its sides,
+                # covering the gaps and overlaps of DST changes
+                for offset in table.offsets[k - 1:k + 1]:
+                    for d in range(-5400, 5401, 1799):
+                        local = _from_epoch(table.transitions[k] + offset + d, 500)
+                        expected = tz.localize(local).astimezone(timezone.utc)
+                        self.assertEqual(table.localize(local), expected, (name, local))
+
+    def test_ambiguous_and_nonexistent(self):
+        table = zone_table('America/Los_Angeles')
+        # 01:30 happens twice on 2025-11-02: standard time (PST) is chosen
+        self.assertEqual(table.localize(datetime(2025, 11, 2, 1, 30)),
+                         datetime(2025, 11, 2, 9, 30, tzinfo=timezone.utc))
+        # 02:30 does not exist on 2025-03-09: read with the offset before (PST)
+        self.assertEqual(table.localize(datetime(2025, 3, 9, 2, 30)),
+                         datetime(2025, 3, 9, 10, 30, tzinfo=timezone.utc))
+
+    def test_offset_strs(self):
+        self.assertEqual(ZoneTable._offset_str(19800), '+0530')
+        self.assertEqual(ZoneTable._offset_str(-25200), '-0700')
+        self.assertEqual(ZoneTable._offset_str(-28378), '-075258')
+        self.assertEqual(ZoneTable._offset_str(0), '+0000')
+
+    def test_lookup(self):
+        try:
+            import numpy as np
+        except ImportError:
+            self.skipTest('numpy not installed')
+        table = zone_table('America/Los_Angeles')
+        epochs = [t + d for t in table.transitions[1:] for d in (-1, 0, 0.5)]
+        self.assertEqual(table.lookup(np, np.array(epochs)).tolist(), [table.index(int(e // 1)) for e in epochs])
+
+if __name__ == '__main__':
+    unittest.main()
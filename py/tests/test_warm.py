@@ -0,0 +1,116 @@
+import os
+import pty
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class TestWarmServer(unittest.TestCase):
+    """Runs the tools through a helper started with `python -m bench.warm`"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        cls.socket = os.path.join(cls.tmpdir.name, 'warm.sock')
+        cls.env = dict(os.environ, BENCH_WARM_SOCKET=cls.socket, tb=os.path.join(cls.tmpdir.name, 'tb'))
+        cls.env.pop('BENCH_WARM', None)
+        cls.server = subprocess.Popen([sys.executable, '-m', 'bench.warm'], cwd=ROOT, env=cls.env,
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + 30
+        while not os.path.exists(cls.socket):
+            if time.monotonic() > deadline or cls.server.poll() is not None:
+                cls.server.kill()
+                raise RuntimeError('The warm server did not start')
+            time.sleep(0.05)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.terminate()
+        cls.server.wait()
+        cls.tmpdir.cleanup()
+
+    def run_tool(self, argv, stdin='', cwd=ROOT, **env):
+        return subprocess.run([sys.executable] + argv, input=stdin, cwd=cwd, env=dict(self.env, **env),
+                              capture_output=True, text=True, timeout=60)
+
+    def assert_same(self, argv, stdin='', cwd=ROOT, **env):
+        warm = self.run_tool(argv, stdin, cwd, **env)
+        local = self.run_tool(argv, stdin, cwd, BENCH_WARM='0', **env)
+        self.assertEqual((warm.returncode, warm.stdout, warm.stderr),
+                         (local.returncode, local.stdout, local.stderr), argv)
+        return warm
+
+    def test_matches_in_process(self):
+        self.assert_same(['timestamp.py', '1748250651'])
+        self.assert_same(['timestamp.py', '--batch', '--fields', 'input,UTC.iso'], stdin='1748250651\nnope\n')
+        self.assert_same(['dfx.py', '--from', 'csv', '--to', 'md', '--tf-timestamp', '1'], stdin='ts\n1748250651\n')
+        self.assert_same(['textquery.py', 'select sum(a) from t'], stdin='a\n1\n2\n')
+        self.assertEqual(self.assert_same(['dfx.py', '--from', 'csv', '--to', 'xml']).returncode, 2)
+        self.assertEqual(self.assert_same(['timestamp.py', 'nope']).returncode, 1)
+
+    def test_forwarded(self):
+        argv = ['-X', 'importtime', 'dfx.py', '--from', 'csv', '--to', 'md']
+        self.assertNotIn('bench.data', self.run_tool(argv, 'a\n1\n').stderr)
+        self.assertIn('bench.data', self.run_tool(argv, 'a\n1\n', BENCH_WARM='0').stderr)
+
+    def test_environment_and_cwd(self):
+        with open(os.path.join(self.tmpdir.name, 'in.csv'), 'w') as f:
+            f.write('a\n1\n')
+        result = self.assert_same([os.path.join(ROOT, 'dfx.py'), '--from', 'csv', '--to', 'csv', 'in.csv'],
+                                  cwd=self.tmpdir.name)
+        self.assertEqual(result.stdout.strip(), 'a\n1')
+        result = self.assert_same(['timestamp.py', '--zones', 'JST', '--fields', 'JST.standard', '1748250651'],
+                                  TIMESTAMP_ZONES='JST=Asia/Tokyo')
+        self.assertIn('2025-05-26 18:10:51', result.stdout)
+
+    def test_exec(self):
+        # The editor replaces the client process, not the worker
+        editor = os.path.join(self.tmpdir.name, 'editor.sh')
+        with open(editor, 'w') as f:
+            f.write('#!/bin/sh\necho $$ "$@"\nexit 7\n')
+        os.chmod(editor, 0o755)
+        process = subprocess.Popen([sys.executable, 'tmpbuf.py', 'a'], cwd=ROOT, env=dict(self.env, EDITOR=editor),
+                                   stdout=subprocess.PIPE, text=True)
+        stdout, _ = process.communicate(timeout=60)
+        self.assertEqual(process.returncode, 7)
+        self.assertEqual(stdout.split()[0], str(process.pid))
+        self.assertTrue(stdout.strip().endswith(os.path.join(self.env['tb'], 'a')))
+
+    def test_terminal(self):
+        # Runs in-process with stdin or stdout on a terminal, leaving the helper serving
+        for stdio in ('stdin', 'stdout'):
+            master, slave = pty.openpty()
+            try:
+                options = {'stdin': subprocess.DEVNULL, 'stdout': subprocess.DEVNULL, stdio: slave}
+                result = subprocess.run([sys.executable, '-X', 'importtime', 'timestamp.py', '1748250651'],
+                                        cwd=ROOT, env=self.env, stderr=subprocess.PIPE, text=True,
+                                        timeout=60, **options)
+            finally:
+                os.close(slave)
+                os.close(master)
+            self.assertEqual(result.returncode, 0)
+            self.assertIn('bench.timestamp', result.stderr, stdio)
+        self.assertNotIn('bench.data', self.run_tool(['-X', 'importtime', 'timestamp.py', '1748250651']).stderr)
+
+    def test_idle_client(self):
+        # A client that sends nothing does not hold up the next one for long
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as idle:
+            idle.connect(self.socket)
+            result = self.run_tool(['-X', 'importtime', 'timestamp.py', '1748250651'])
+        self.assertEqual(result.returncode, 0)
+        self.assertNotIn('bench.data', result.stderr)
+
+    def test_fallback(self):
+        for path in [os.path.join(self.tmpdir.name, 'missing.sock'), os.path.join(ROOT, 'dfx.py')]:
+            result = self.run_tool(['-X', 'importtime', 'dfx.py', '--from', 'csv', '--to', 'csv'], 'a\n1\n',
+                                   BENCH_WARM_SOCKET=path)
+            self.assertEqual(result.returncode, 0)
+            self.assertEqual(result.stdout.strip(), 'a\n1')
+            self.assertIn('bench.data', result.stderr)
+
+if __name__ == '__main__':
+    unittest.main()
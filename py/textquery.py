@@ -1,22 +1,95 @@
 #!/usr/bin/python3
 
+if __name__ == "__main__":
+    # Runs in the warm helper instead, if started (see bench.warm), before the imports below
+    from bench.warm import forward
+    forward('textquery')
+
 import argparse
+import io
 import os
 import sys
-from bench.data import CsvFormat, MdFormat
-from bench.textquery import InMemoryDb
 
 def parse_args():
     parser = argparse.ArgumentParser(description="tq - TextQuery over CSVs using SQLite")
 
     # Optional multiple --table arguments
     parser.add_argument('--table', action='append', default=[],
-                        help='Specify table name(s) with --table=a:path/to/file.csv. Can be used multiple times.')
+                        help='Specify table name(s) with --table=a:path/to/file.csv. Can be used multiple times. '
+                             'The path may also be a glob pattern (quoted) or a directory: all matching CSV '
+                             'files are combined into one table.')
+
+    parser.add_argument('--source-column', action='store_true',
+                        help='Add a _source_file column with the file of each row')
 
     # Optional --csv flag
     parser.add_argument('--csv', action='store_true',
                         help='Output in CSV format')
 
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='Number of worker processes used to parse --table files (default: CPU count)')
+
+    parser.add_argument('--profile', action='store_true',
+                        help='Print per-stage timings (read, parse, infer, insert, query, render) to stderr')
+
+    parser.add_argument('--explain', action='store_true',
+                        help="Print SQLite's query plan (EXPLAIN QUERY PLAN) to stderr")
+
+    parser.add_argument('--stats-json', action='store_true',
+                        help='Print --profile/--explain output to stderr as JSON')
+
+    parser.add_argument('--serve', metavar='SOCKET', default=None,
+                        help='Load the --table files once and answer queries on this Unix socket')
+
+    parser.add_argument('--connect', metavar='SOCKET', default=None,
+                        help='Send the query to a server started with --serve')
+
+    parser.add_argument('--reload-interval', type=float, default=1.0,
+                        help='With --serve: seconds between checks for changed table files')
+
+    parser.add_argument('--pool-size', type=int, default=4,
+                        help='With --serve: number of read-only connections (concurrent queries)')
+
+    parser.add_argument('--udf', action='append', default=[], metavar='MODULE',
+                        help='Python module (dotted path) whose register(db) adds SQL functions. Can be used multiple times.')
+
+    parser.add_argument('--batch', metavar='FILE', default=None,
+                        help="Run all ';'-separated queries of FILE concurrently, printing results in order")
+
+    parser.add_argument('--batch-workers', type=int, default=4,
+                        help='With --batch: number of concurrent queries')
+
+    parser.add_argument('--cache', action='store_true',
+                        help='Reuse results of earlier runs of the same query on unchanged inputs')
+
+    parser.add_argument('--cache-dir', default=None,
+                        help='With --cache: cache directory (default: $XDG_CACHE_HOME/textquery)')
+
+    parser.add_argument('--cache-size', default='64M',
+                        help='With --cache: maximum cache size, e.g. 64M (default)')
+
+    parser.add_argument('--as-epoch', action='store_true',
+                        help='Store timestamp columns (e.g. 2025-06-11 19:53:31, naive ones taken as UTC) as indexed '
+                             'epoch seconds, with the original text in a <column>_text column')
+
+    parser.add_argument('--shards', type=int, nargs='?', const=os.cpu_count() or 1, default=None, metavar='N',
+                        help='Run aggregate queries (filter, group by, sum/count/min/max/avg) over one --table '
+                             'in N worker processes (default N: CPU count), each on a part of the rows. '
+                             'Other queries run as usual')
+
+    parser.add_argument('--max-memory', default=None, metavar='SIZE',
+                        help='Memory budget, e.g. 4G. Larger (or unknown-size stdin) input is loaded into a '
+                             'temporary on-disk database instead')
+
+    parser.add_argument('--follow', action='store_true',
+                        help='Keep watching the --table files; load appended records and rerun the query')
+
+    parser.add_argument('--interval', default='2s',
+                        help='With --follow: time between checks for changes, e.g. 500ms, 5s (default: 2s)')
+
+    parser.add_argument('-i', '--interactive', action='store_true',
+                        help='Load the --table files once and start an interactive SQL shell')
+
     # Optional default table name
     parser.add_argument('--default_table', type=str, default='T',
                         help='Default table name (for stdin input)')
@@ -27,31 +100,228 @@ def parse_args():
 
     return parser.parse_args()
 
-def main():
-    args = parse_args()
+def table_paths(args):
+    from bench.textquery import expand_csv_files
 
-    tables = {}
+    paths = {}
     for t in args.table:
         name, path = t.split(':', 1)
-        if not os.path.isfile(path):
+        if not os.path.isfile(path) and not expand_csv_files(path):
             print(f"Error: File '{path}' not found.")
             sys.exit(1)
-        
-        with open(path, "r", encoding="utf-8", newline='') as f:
-            table = CsvFormat.parse(f.read())
-            tables[name] = table
-
-    if len(tables) == 0:
-        # Use default table name for stdin input
-        default_table_name = args.default_table
-        table = CsvFormat.parse(sys.stdin.read(), parse_types=True)
-        tables[default_table_name] = table
-
-    db = InMemoryDb(tables)
+        paths[name] = path
+    return paths
+
+def table_files(paths):
+    """Files of each table; a plain file path stands for itself"""
+    from bench.textquery import expand_csv_files
+    return {name: [path] if os.path.isfile(path) else expand_csv_files(path) for name, path in paths.items()}
+
+def load_tables(args, db, paths, jobs):
+    from bench.textquery import CsvGlobSource, load_csv_files
+
+    single = {name: path for name, path in paths.items() if os.path.isfile(path) and not args.source_column}
+    # Several tables are parsed concurrently and inserted as they become ready
+    load_csv_files(db, single, max_workers=jobs, as_epoch=args.as_epoch)
+    for name, path in paths.items():
+        if name not in single:
+            CsvGlobSource(name, path, source_column=args.source_column, max_workers=jobs,
+                          parse_types=False, as_epoch=args.as_epoch).load(db)
+
+def main():
+    args = parse_args()
+
+    if args.connect:
+        run_client(args)
+        return
+
+    # Imported past argument parsing and the client, which do not need it
+    from bench.textquery import load_udfs, render_diagnostics, render_result
+
+    paths = table_paths(args)
+    if args.serve:
+        run_server(args, paths)
+        return
+    if args.interactive:
+        run_shell(args, paths)
+        return
+    if args.follow:
+        run_follow(args, paths)
+        return
+
     query = ' '.join(args.query_parts)
-    result_table = db.query(query)
-    output = CsvFormat.render(result_table) if args.csv else MdFormat.render(result_table)
+    stdin = sys.stdin.buffer
+    cache, cache_key = None, None
+    # Diagnostics describe an actual run, UDFs may not be deterministic
+    if args.cache and not (args.batch or args.profile or args.explain or args.udf):
+        cache, cache_key, stdin = open_cache(args, paths, query)
+        cached = cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            print(cached)
+            return
+
+    result_table, stats = run_sharded(args, paths, query) if args.shards else (None, None)
+    plan = None
+    if result_table is None:
+        db, jobs = create_db(args, paths, None if paths else stdin, shared=args.batch is not None)
+        load_udfs(db, args.udf)
+        load_tables(args, db, paths, jobs)
+
+        if len(paths) == 0:
+            # Use default table name for stdin input
+            db.load_csv(args.default_table, stdin, parse_types=True, as_epoch=args.as_epoch)
+
+        if args.batch:
+            run_batch(args, db)
+            return
+
+        plan = db.explain(query) if args.explain else None
+        result_table = db.query(query)
+        stats = db.stats
+
+    output = render_result(result_table, csv=args.csv, stats=stats)
     print(output)
+    if cache_key:
+        cache.put(cache_key, output)
+
+    diagnostics = render_diagnostics(stats if args.profile else None, plan, as_json=args.stats_json)
+    if diagnostics is not None:
+        print(diagnostics, file=sys.stderr)
+
+def run_sharded(args, paths, query):
+    """Returns (result, stats) of a map-reduce run, or (None, None) if the query must run in one process"""
+    from bench.shardquery import plan_query, run_sharded as run_plan
+    from bench.textquery import QueryStats, parse_size
+
+    if args.batch or args.explain or args.source_column or args.as_epoch:
+        return None, None
+    plan = plan_query(query)
+    if plan is None or plan.table not in paths:
+        return None, None
+    stats = QueryStats()
+    max_memory = parse_size(args.max_memory) if args.max_memory is not None else None
+    result = run_plan(plan, table_files(paths)[plan.table], args.shards, udfs=args.udf, stats=stats,
+                      max_memory=max_memory)
+    return result, stats
+
+def create_db(args, paths, stdin=None, shared=False):
+    """Returns the database for the inputs and the number of parse workers"""
+    from bench.textquery import InMemoryDb, input_size, open_db, parse_size
+
+    if args.max_memory is None:
+        return InMemoryDb({}, shared=shared), args.jobs
+    files = [f for table in table_files(paths).values() for f in table]
+    db, parallel = open_db(input_size(files, stdin), parse_size(args.max_memory), shared=shared)
+    return db, args.jobs if parallel else 1
+
+def open_cache(args, paths, query):
+    """Returns (cache, key or None if not cacheable, stdin stream to load)"""
+    from bench.resultcache import ResultCache, bytes_fingerprint, file_fingerprint
+    from bench.textquery import parse_size
+
+    stdin = sys.stdin.buffer
+    fingerprints = {name: '|'.join(file_fingerprint(f) for f in files) for name, files in table_files(paths).items()}
+    if len(paths) == 0:
+        data = stdin.read()
+        fingerprints[args.default_table] = bytes_fingerprint(data)
+        stdin = io.BytesIO(data)
+    cache = ResultCache(args.cache_dir, parse_size(args.cache_size))
+    return cache, cache.key(query, fingerprints, csv=args.csv, source_column=args.source_column,
+                            as_epoch=args.as_epoch), stdin
+
+def run_batch(args, db):
+    from bench.textquery import render_diagnostics, render_result, split_statements
+
+    with open(args.batch, 'r', encoding='utf-8') as f:
+        queries = split_statements(f.read())
+    plans = [db.explain(query) for query in queries] if args.explain else [None] * len(queries)
+    results = db.query_many(queries, max_workers=args.batch_workers)
+    outputs = [render_result(result, csv=args.csv, stats=db.stats) for result in results]
+    print('\n\n'.join(outputs))
+
+    for plan in plans:
+        diagnostics = render_diagnostics(None, plan, as_json=args.stats_json)
+        if diagnostics is not None:
+            print(diagnostics, file=sys.stderr)
+    if args.profile:
+        print(render_diagnostics(db.stats, None, as_json=args.stats_json), file=sys.stderr)
+
+def run_shell(args, paths):
+    from bench.textquery import load_udfs
+    from bench.tqshell import Shell
+
+    db, jobs = create_db(args, paths)
+    load_udfs(db, args.udf)
+    load_tables(args, db, paths, jobs)
+    Shell(db, csv=args.csv).run()
+
+def run_follow(args, paths):
+    from bench.textquery import csv_source, follow, load_udfs, parse_duration, render_result
+
+    if len(paths) == 0:
+        print("Error: --follow needs at least one --table file.")
+        sys.exit(1)
+    query = ' '.join(args.query_parts)
+    interval = parse_duration(args.interval)
+    db, _ = create_db(args, paths)
+    load_udfs(db, args.udf)
+    sources = [csv_source(name, path, source_column=args.source_column, max_workers=args.jobs, parse_types=False,
+                          as_epoch=args.as_epoch) for name, path in paths.items()]
+    redraw = sys.stdout.isatty()
+    try:
+        for _ in follow(db, sources, interval):
+            output = render_result(db.query(query), csv=args.csv)
+            if redraw:
+                # Clear the screen and draw the new result at the top
+                sys.stdout.write('\033[H\033[2J')
+                print(output, flush=True)
+            else:
+                print(output + '\n', flush=True)
+    except KeyboardInterrupt:
+        pass
+
+def run_server(args, paths):
+    import signal
+    from bench.textquery import csv_source, load_udfs
+    from bench.tqserver import QueryServer
+
+    if len(paths) == 0:
+        print("Error: --serve needs at least one --table file.")
+        sys.exit(1)
+    db, _ = create_db(args, paths, shared=True)
+    load_udfs(db, args.udf)
+    sources = [csv_source(name, path, source_column=args.source_column, max_workers=args.jobs, parse_types=False,
+                          as_epoch=args.as_epoch) for name, path in paths.items()]
+    server = QueryServer(sources, args.serve, pool_size=args.pool_size, interval=args.reload_interval, db=db)
+    print(f"Serving {', '.join(paths)} on {args.serve}", flush=True)
+    # Unwind (and remove the socket) on kill as well
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+def run_client(args):
+    from bench.tqserver import send_request
+
+    request = {
+        'query': ' '.join(args.query_parts),
+        'csv': args.csv,
+        'profile': args.profile,
+        'explain': args.explain,
+        'stats_json': args.stats_json,
+    }
+    try:
+        response = send_request(args.connect, request)
+    except OSError as e:
+        print(f"Error: cannot reach server at '{args.connect}': {e}")
+        sys.exit(1)
+    if response['stdout']:
+        print(response['stdout'])
+    if response['stderr']:
+        print(response['stderr'], file=sys.stderr)
+    if not response['ok']:
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -1,11 +1,17 @@
 #!/usr/bin/python3
 
+if __name__ == '__main__':
+    # Runs in the warm helper instead, if started (see bench.warm), before the imports below
+    from bench.warm import forward
+    forward('timestamp')
+
 import sys
 import argparse
-from bench.timestamp import parse_time, convert_time_output_to_data_table
-from bench.data import MdFormat, CsvFormat
+import itertools
 
-def main(args):
+DEFAULT_FIELDS = 'input,epoch_seconds,UTC.standard'
+
+def main(args=None):
     parser = argparse.ArgumentParser(
         description="Time utility to convert and display time in multiple formats and timezones."
     )
@@ -14,7 +20,8 @@ def main(args):
         "time_value",
         nargs="?",
         default=None,
-        help="Time input (e.g., epoch, '2025-05-26 23:34', '2025-05-26T23:34:40.123')"
+        help="Time input (e.g., epoch, '2025-05-26 23:34', '2025-05-26T23:34:40.123'). "
+             "With --batch: file with one input per line (default: stdin)"
     )
 
     parser.add_argument(
@@ -26,21 +33,77 @@ def main(args):
 
     parser.add_argument('--csv', action='store_true', help='Output in CSV format')
     parser.add_argument('--quick', action='store_true', help='Only output UTC time in standard format')
+    parser.add_argument('--zones', default=None,
+                        help='Comma-separated timezone labels to output (default: all configured, see '
+                             '$TIMESTAMP_ZONES and $TIMESTAMP_ZONES_FILE)')
+    parser.add_argument('--batch', action='store_true',
+                        help='Convert every line of the input file (or stdin), one output row per line')
+    parser.add_argument('--fields', default=None,
+                        help=f'Comma-separated output columns (default with --batch: {DEFAULT_FIELDS}). '
+                             'Available: input, epoch_seconds, epoch_ms, epoch_micros, <TZ>.<standard|micros|iso>')
 
-    args = parser.parse_args()
-    time_output = parse_time(args.time_value, args.timezone)
+    args = parser.parse_args(args)
+    # Imported once the arguments are valid: --help and usage errors need neither
+    from bench.timestamp import TimeFields, TimeParser, parse_time, convert_time_output_to_data_table
+    from bench.data import MdFormat, CsvFormat
 
-    table = convert_time_output_to_data_table(time_output)
+    if args.batch or args.fields:
+        try:
+            fields = TimeFields((args.fields or DEFAULT_FIELDS).split(','), args.timezone)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        if args.batch:
+            run_batch(args, fields)
+        else:
+            write_rows(fields, [fields.row(args.time_value)], args.csv)
+        return
+
+    # --quick only outputs UTC, whatever --zones selects
     if args.quick:
-        val = table.get(table.index(Category='UTC',Type='standard'))['Value']
-        print(val)
+        zones = [TimeParser.DEFAULT_TZ]
+    else:
+        zones = args.zones.split(',') if args.zones else None
+    try:
+        time_output = parse_time(args.time_value, args.timezone, zones=zones)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    if args.quick:
+        print(time_output.format(TimeParser.DEFAULT_TZ, 'standard'))
         return
 
+    table = convert_time_output_to_data_table(time_output)
+
     if args.csv:
         output = CsvFormat.render(table)
     else:
         output = MdFormat.render(table)
     print(output)
 
+def write_rows(fields, rows, csv, chunk_size=1000):
+    from bench.data import CsvWriter, MdWriter
+
+    writer = (CsvWriter if csv else MdWriter)(sys.stdout, fields.fields)
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            break
+        writer.write_rows(chunk)
+    writer.close()
+
+def run_batch(args, fields):
+    stream = sys.stdin if args.time_value in (None, '-') else open(args.time_value, 'r', encoding='utf-8')
+    errors = []
+    try:
+        values = (line.strip() for line in stream)
+        write_rows(fields, fields.convert((v for v in values if v), errors), args.csv)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    if errors:
+        print(f"Could not parse {len(errors)} value(s), e.g. '{errors[0]}'", file=sys.stderr)
+
 if __name__ == '__main__':
     main(sys.argv[1:])
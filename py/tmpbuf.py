@@ -1,22 +1,32 @@
 #!/usr/bin/env python3
+
+if __name__ == "__main__":
+    # Runs in the warm helper instead, if started (see bench.warm), before the imports below
+    from bench.warm import forward
+    forward('tb')
+
 import os
 import stat
 import sys
-import subprocess
 import re
 import argparse
 import string
 from pathlib import Path
-from bench.data import DataTable, MdFormat, TermColor
 
-# Check environment variable
-tb = os.environ.get("tb")
-if not tb:
-    print(TermColor.colorize(f'Env var "tb" is not set', 'red'))
-    sys.exit(1)
+# The buffer directory, from environment variable "tb" (see init_tb_path)
+tb_path = None
 
-tb_path = Path(tb)
-tb_path.mkdir(parents=True, exist_ok=True)
+def init_tb_path():
+    """Sets tb_path from env var "tb", creating the directory; exits if unset"""
+    global tb_path
+    tb = os.environ.get("tb")
+    if not tb:
+        from bench.data import TermColor
+        print(TermColor.colorize(f'Env var "tb" is not set', 'red'))
+        sys.exit(1)
+
+    tb_path = Path(tb)
+    tb_path.mkdir(parents=True, exist_ok=True)
 
 STANDARD_FILES = list(string.ascii_lowercase + string.digits)
 
@@ -53,6 +63,8 @@ def get_stats(fname, preview_len=50):
         return (0, "")
 
 def tb_stats():
+    from bench.data import DataTable, MdFormat
+
     table = DataTable(['Buffer', 'Bytes', 'Preview'])
     ctable = []
     for fname in STANDARD_FILES:
@@ -111,9 +123,12 @@ def open_editor(files, cd_to_base=True):
     if cd_to_base:
         cmd.append(f"+cd {str(tb_path)}")
     cmd += [os.path.join(tb_path, f) for f in files]
-    os.execvp(editor, cmd)
+    # Through bench.warm, for the editor to run in the user's terminal
+    from bench.warm import execvp
+    execvp(editor, cmd)
 
 def main():
+    init_tb_path()
     parser = argparse.ArgumentParser(
         description="Buffer manager utility.",
         usage="tb [-l|--list] [-i|--init] [-e|--empty] [-u|--used] [a-z0-9]"